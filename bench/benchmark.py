@@ -0,0 +1,361 @@
+"""
+Offline end-to-end benchmark of the compiled workflow.
+
+Every external service is replaced by a local stand-in: Custom Search,
+publisher pages and the chat and image models by bench.fake_services, S3
+and DynamoDB by moto's in-process mock. Each topic count runs in a fresh
+subprocess so peak memory is measured per run.
+
+    python -m bench.benchmark --topics 1,2,4,8 --output bench/results/HEAD.json
+    python -m bench.benchmark --topics 1,4 --set llm_latency=1.5 --compare bench/results/HEAD.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BUCKET_NAME = "bench-news"
+TABLE_NAME = "bench-articles"
+# keywords per benchmark topic, configured topics search one query per keyword
+TOPIC_KEYWORDS = ("market", "policy", "research", "industry")
+# every fake publisher page is served by one host, so the per-host fetch
+# limits are raised to emulate this many publishers unless set explicitly
+EMULATED_PUBLISHERS = 16
+# stage changes smaller than this many seconds are noise, never regressions
+MIN_STAGE_CHANGE = 0.05
+
+
+def _benchmark_environment(services_env: Dict[str, str], work_dir: str) -> Dict[str, str]:
+    env = dict(os.environ)
+    env.update(services_env)
+    env.update({
+        "AWS_ACCESS_KEY_ID": "bench",
+        "AWS_SECRET_ACCESS_KEY": "bench",
+        "AWS_REGION": "us-east-1",
+        "AWS_BUCKET_NAME": BUCKET_NAME,
+        "DYNAMODB_TABLE_NAME": TABLE_NAME,
+        # every run starts cold, a warm cache would measure the cache
+        "LLM_CACHE_ENABLED": "false",
+        "SEARCH_CACHE_BACKEND": "none",
+        "PAGE_CACHE_ENABLED": "false",
+        "CHECKPOINT_PATH": os.path.join(work_dir, "checkpoints.db"),
+        "METRICS_ENABLED": "true",
+        "METRICS_REPORT_DIR": "",
+        "METRICS_TEXTFILE": "",
+        "PYTHONPATH": os.pathsep.join(filter(None, [REPO_ROOT, os.environ.get("PYTHONPATH")])),
+    })
+    per_host = int(env.get("FETCH_MAX_PER_HOST", "4"))
+    env.setdefault("FETCH_MAX_CONCURRENCY", str(per_host * EMULATED_PUBLISHERS))
+    env["FETCH_MAX_PER_HOST"] = str(per_host * EMULATED_PUBLISHERS)
+    return env
+
+
+class _MemorySampler:
+    """Peak resident memory of this process and its worker processes, sampled every interval."""
+
+    def __init__(self, interval: float = 0.05):
+        import psutil
+        self._process = psutil.Process()
+        self._interval = interval
+        self._stop = threading.Event()
+        self.peak = 0
+        self._thread = threading.Thread(target=self._run, name="bench-memory", daemon=True)
+
+    def _run(self):
+        import psutil
+        while not self._stop.is_set():
+            total = 0
+            for process in [self._process] + self._process.children(recursive=True):
+                try:
+                    total += process.memory_info().rss
+                except psutil.Error:
+                    pass
+            self.peak = max(self.peak, total)
+            self._stop.wait(self._interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def _peak_rss_bytes() -> int:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _percentile(samples: List[float], q: float) -> Optional[float]:
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 4)
+
+
+def _stage_summary(report: dict) -> Dict[str, dict]:
+    """
+    Latency of every node across topics. A topic's stage latency is its
+    slowest call of the node, which for the draft_news fan-out is the
+    branch the combine step waits for.
+    """
+    samples: Dict[str, List[float]] = {}
+    queue_waits: Dict[str, List[float]] = {}
+    for topic in report.get("topics", {}).values():
+        for node, stats in topic["nodes"].items():
+            samples.setdefault(node, []).append(stats["max"])
+            if stats["queue_wait"]["max"] is not None:
+                queue_waits.setdefault(node, []).append(stats["queue_wait"]["max"])
+    return {node: {"p50": _percentile(values, 0.5), "p95": _percentile(values, 0.95),
+                   "max": round(max(values), 4), "queue_wait_p50": _percentile(queue_waits.get(node, []), 0.5)}
+            for node, values in samples.items()}
+
+
+def _register_topic(topic_id: str, name: str) -> str:
+    from config.topic import TOPICS, get_topic
+    if get_topic(topic_id) is None:
+        TOPICS.append({"id": topic_id, "name": name,
+                       "keywords": [f"{keyword} {topic_id}" for keyword in TOPIC_KEYWORDS]})
+    return topic_id
+
+
+def _create_aws_resources():
+    import boto3
+    boto3.client("s3", region_name="us-east-1").create_bucket(Bucket=BUCKET_NAME)
+    boto3.client("dynamodb", region_name="us-east-1").create_table(
+        TableName=TABLE_NAME,
+        KeySchema=[{"AttributeName": "topic_id", "KeyType": "HASH"},
+                   {"AttributeName": "date", "KeyType": "RANGE"}],
+        AttributeDefinitions=[{"AttributeName": "topic_id", "AttributeType": "S"},
+                              {"AttributeName": "date", "AttributeType": "S"}],
+        BillingMode="PAY_PER_REQUEST",
+    )
+
+
+def _unsaved_topics(results: Dict[str, dict]) -> Dict[str, str]:
+    """Topics that finished without an article in the fake table, with the reason."""
+    import boto3
+    client = boto3.client("dynamodb", region_name="us-east-1")
+    unsaved = {}
+    for topic_id, result in results.items():
+        if not result.get("save_success"):
+            unsaved[topic_id] = f"finished without saving an article (skipped: {result.get('skipped')})"
+        elif "Item" not in client.get_item(TableName=TABLE_NAME, Key={"topic_id": {"S": topic_id},
+                                                                     "date": {"S": result["run_date"]}}):
+            unsaved[topic_id] = "save_success is set but the article is not in the table"
+    return unsaved
+
+
+def run_child(topics: int, max_concurrency: Optional[int], warmup: bool) -> dict:
+    """Run the workflow for `topics` topics against the stand-ins, in this process."""
+    try:
+        from moto import mock_aws
+    except ImportError:
+        raise SystemExit("The benchmark needs moto for its S3 and DynamoDB stand-ins: "
+                         "pip install -r bench/requirements.txt")
+
+    with mock_aws():
+        _create_aws_resources()
+        # imported here so the settings are read from the benchmark environment
+        from config.setting import TOPIC_MAX_CONCURRENCY
+        from node.lg_runner import arun_topics
+
+        topic_ids = [_register_topic(f"bench-topic-{index}", f"Benchmark topic {index}") for index in range(topics)]
+        concurrency = max_concurrency or TOPIC_MAX_CONCURRENCY
+        if warmup:
+            # starts the extraction and image process pools and loads the tokenizer outside the timing
+            asyncio.run(arun_topics([_register_topic("bench-warmup", "Benchmark warmup")],
+                                    max_concurrency=1, checkpoint=False))
+
+        with _MemorySampler() as memory:
+            batch = asyncio.run(arun_topics(topic_ids, max_concurrency=concurrency))
+        # a graph that ends early (e.g. no page extracted) still "succeeds" in the runner
+        failed = {topic: repr(error) for topic, error in batch.failures.items()}
+        failed.update(_unsaved_topics(batch.results))
+
+    report = batch.report
+    succeeded = len(topic_ids) - len(failed)
+    return {
+        "topics": topics,
+        "max_concurrency": concurrency,
+        "elapsed_seconds": round(batch.elapsed, 4),
+        "topics_per_minute": round(succeeded / batch.elapsed * 60, 2) if batch.elapsed else None,
+        "succeeded": succeeded,
+        "failed": failed,
+        "extractions_succeeded": sum(topic.get("extractions", {}).get("success", 0)
+                                     for topic in report.get("topics", {}).values()),
+        "peak_rss_mb": round(_peak_rss_bytes() / 2 ** 20, 1),
+        "peak_total_rss_mb": round(memory.peak / 2 ** 20, 1),
+        "stages": _stage_summary(report),
+        "providers": {provider: {"calls": stats["count"], "p50": stats["p50"], "p95": stats["p95"],
+                                 "retries": stats["retries"], "throttled": stats["throttled"]}
+                      for provider, stats in report.get("providers", {}).items()},
+        "llm_tokens": report.get("llm_tokens", {}),
+    }
+
+
+def _run_in_subprocess(topics: int, env: Dict[str, str], args) -> dict:
+    command = [sys.executable, "-m", "bench.benchmark", "--child", "--topics", str(topics)]
+    if args.max_concurrency:
+        command += ["--max-concurrency", str(args.max_concurrency)]
+    if args.no_warmup:
+        command.append("--no-warmup")
+    if args.verbose:
+        command.append("--verbose")
+    completed = subprocess.run(command, cwd=REPO_ROOT, env=env, stdout=subprocess.PIPE,
+                               stderr=None if args.verbose else subprocess.PIPE, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(f"Benchmark run with {topics} topics failed:\n{(completed.stderr or '')[-4000:]}")
+    # the result is the last line, libraries may print before it
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def _version() -> dict:
+    def git(*command):
+        try:
+            return subprocess.run(["git", *command], cwd=REPO_ROOT, capture_output=True, text=True,
+                                  timeout=10).stdout.strip()
+        except (OSError, subprocess.SubprocessError):
+            return ""
+    return {"commit": git("rev-parse", "--short", "HEAD") or "unknown",
+            "dirty": bool(git("status", "--porcelain", "--untracked-files=no"))}
+
+
+def _print_run(run: dict):
+    print(f"\n{run['topics']} topics (max_concurrency={run['max_concurrency']}): "
+          f"{run['elapsed_seconds']:.2f}s, {run['topics_per_minute']} topics/min, "
+          f"peak rss {run['peak_rss_mb']} MB ({run['peak_total_rss_mb']} MB with workers), "
+          f"{run['succeeded']} succeeded, {len(run['failed'])} failed, "
+          f"{run['extractions_succeeded']} pages extracted")
+    for topic, reason in run["failed"].items():
+        print(f"  failed {topic}: {reason}")
+    print(f"  {'stage':<22}{'p50':>9}{'p95':>9}{'max':>9}{'wait p50':>10}")
+    for stage, stats in run["stages"].items():
+        wait = stats["queue_wait_p50"]
+        print(f"  {stage:<22}{stats['p50']:>9.3f}{stats['p95']:>9.3f}{stats['max']:>9.3f}"
+              f"{wait if wait is None else format(wait, '.3f'):>10}")
+
+
+def _change(new: Optional[float], old: Optional[float]) -> Optional[float]:
+    if new is None or not old:
+        return None
+    return (new - old) / old * 100
+
+
+def compare(result: dict, baseline: dict, threshold: float) -> List[str]:
+    """
+    Print the change of every run against the baseline run with the same topic
+    count, returns the regressions over threshold percent.
+    """
+    regressions = []
+    baseline_runs = {run["topics"]: run for run in baseline["runs"]}
+    print(f"\nCompared with {baseline['version']['commit']}:")
+    for run in result["runs"]:
+        old = baseline_runs.get(run["topics"])
+        if old is None:
+            continue
+        checks = [
+            # (name, new, old, a higher value is worse, smallest absolute change that counts)
+            ("topics/min", run["topics_per_minute"], old["topics_per_minute"], False, 0),
+            ("peak rss MB", run["peak_total_rss_mb"], old["peak_total_rss_mb"], True, 0),
+        ] + [(f"{stage} p50", stats["p50"], old["stages"].get(stage, {}).get("p50"), True, MIN_STAGE_CHANGE)
+             for stage, stats in run["stages"].items()]
+        print(f"  {run['topics']} topics:")
+        for name, new_value, old_value, higher_is_worse, min_change in checks:
+            change = _change(new_value, old_value)
+            if change is None:
+                continue
+            worse = change > threshold if higher_is_worse else change < -threshold
+            worse = worse and abs(new_value - old_value) >= min_change
+            print(f"    {name:<28}{old_value:>10}{new_value:>10}{change:>+9.1f}%{'  REGRESSION' if worse else ''}")
+            if worse:
+                regressions.append(f"{run['topics']} topics {name} {change:+.1f}%")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--topics", default="1,2,4,8",
+                        help="comma separated topic counts, one run each (default 1,2,4,8)")
+    parser.add_argument("--max-concurrency", type=int, default=0,
+                        help="graph tasks running at once, defaults to TOPIC_MAX_CONCURRENCY")
+    parser.add_argument("--set", action="append", default=[], metavar="FIELD=VALUE",
+                        help="override a bench.fake_services.BenchProfile field, e.g. llm_latency=1.5")
+    parser.add_argument("--output", help="write the results as JSON")
+    parser.add_argument("--compare", help="results JSON of an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=10.0,
+                        help="percent change reported as a regression by --compare (default 10)")
+    parser.add_argument("--no-warmup", action="store_true", help="measure the cold start of every run")
+    parser.add_argument("--verbose", action="store_true", help="show the workflow logs")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING,
+                        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', stream=sys.stderr)
+
+    if args.child:
+        result = run_child(int(args.topics), args.max_concurrency or None, not args.no_warmup)
+        print(json.dumps(result))
+        return 0
+
+    # imported here so --help works without the benchmark dependencies
+    from bench.fake_services import BenchProfile, FakeServices
+
+    profile = BenchProfile.from_overrides(dict(item.split("=", 1) for item in args.set))
+    topic_counts = [int(count) for count in args.topics.split(",") if count.strip()]
+    services = FakeServices(profile)
+    services.start()
+    runs = []
+    try:
+        for count in topic_counts:
+            with tempfile.TemporaryDirectory(prefix="news-bench-") as work_dir:
+                run = _run_in_subprocess(count, _benchmark_environment(services.environment(), work_dir), args)
+            _print_run(run)
+            runs.append(run)
+    finally:
+        services.stop()
+
+    result = {
+        "version": _version(),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "profile": profile.to_dict(),
+        "runs": runs,
+    }
+    if args.output:
+        if os.path.dirname(args.output):
+            os.makedirs(os.path.dirname(args.output), exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+        print(f"\nResults written to {args.output}")
+    # timings of a pipeline that wrote nothing are meaningless, fail instead of reporting them
+    broken = [run["topics"] for run in runs if run["failed"] or not run["extractions_succeeded"]]
+    if broken:
+        print(f"\nError: runs with {', '.join(map(str, broken))} topics had failed topics or extracted no page")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("profile") != result["profile"]:
+            print("\nWarning: the baseline was measured with a different profile")
+        if compare(result, baseline, args.threshold):
+            return 1
+    return 1 if broken else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,287 @@
+import asyncio
+import base64
+import hashlib
+import io
+import json
+import logging
+import random
+import threading
+from dataclasses import dataclass, asdict, fields
+from typing import Dict, Optional
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+# words of the generated pages and model responses
+VOCABULARY = (
+    "market report growth policy energy price investors analysts company government "
+    "research study results data network security launch update release quarter "
+    "revenue shares trading index federal central bank inflation rates election "
+    "campaign officials statement conference agreement talks border troops region "
+    "health patients treatment clinical trial doctors hospital insulin device "
+    "model training compute chips startup funding users platform service cloud "
+    "protocol token mining wallet exchange regulators approval fund court ruling "
+    "weather storm season travel city local residents community school students"
+).split()
+
+
+@dataclass
+class BenchProfile:
+    """
+    Latency and size distributions of the fake services.
+
+    Latencies and sizes are medians of a lognormal with the given sigma, drawn
+    from a random generator seeded by the request, so the same request always
+    gets the same response after the same delay.
+    """
+    seed: int = 0
+    # Custom Search
+    search_latency: float = 0.3
+    # publisher pages
+    page_latency: float = 0.2
+    page_latency_sigma: float = 0.6
+    page_paragraphs: int = 12
+    page_paragraphs_sigma: float = 0.5
+    paragraph_words: int = 60
+    # share of search results answered with a 404
+    page_error_rate: float = 0.05
+    # share of search results pointing at a page shared by every topic, exercises dedup
+    duplicate_rate: float = 0.1
+    # chat model: latency + latency_per_token * completion_tokens
+    llm_latency: float = 0.4
+    llm_latency_per_token: float = 0.005
+    llm_latency_sigma: float = 0.3
+    completion_tokens: int = 200
+    # image model
+    image_latency: float = 2.0
+    image_size: int = 1024
+
+    @classmethod
+    def from_overrides(cls, overrides: Dict[str, str]) -> "BenchProfile":
+        """Profile with the given fields replaced, values are parsed with the field's type."""
+        types = {field.name: field.type for field in fields(cls)}
+        unknown = set(overrides) - set(types)
+        if unknown:
+            raise ValueError(f"Unknown profile fields: {', '.join(sorted(unknown))}")
+        return cls(**{name: types[name](value) for name, value in overrides.items()})
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+def _rng(profile: BenchProfile, *parts) -> random.Random:
+    digest = hashlib.sha256(":".join(map(str, (profile.seed,) + parts)).encode()).digest()
+    return random.Random(int.from_bytes(digest[:8], "big"))
+
+
+def _words(rng: random.Random, count: int) -> str:
+    return " ".join(rng.choices(VOCABULARY, k=max(1, count)))
+
+
+class FakeServices:
+    """
+    Local stand-ins for Custom Search, the publisher pages and the
+    OpenAI-compatible chat and image APIs, served by one aiohttp app on its
+    own thread and event loop.
+    """
+
+    def __init__(self, profile: BenchProfile, host: str = "127.0.0.1", port: int = 0):
+        self.profile = profile
+        self.host = host
+        self.port = port
+        self.base_url: Optional[str] = None
+        self.requests: Dict[str, int] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._runner: Optional[web.AppRunner] = None
+        self._thread: Optional[threading.Thread] = None
+        self._images: Dict[int, bytes] = {}
+
+    def _app(self) -> web.Application:
+        app = web.Application(client_max_size=16 * 1024 * 1024)
+        app.router.add_get("/customsearch/v1", self._search)
+        app.router.add_get("/pages/{page_id}", self._page)
+        app.router.add_post("/v1/chat/completions", self._chat)
+        app.router.add_post("/v1/images/generations", self._image_generation)
+        app.router.add_get("/images/{name}", self._image_file)
+        return app
+
+    def _count(self, kind: str):
+        self.requests[kind] = self.requests.get(kind, 0) + 1
+
+    async def _search(self, request: web.Request) -> web.Response:
+        self._count("search")
+        profile = self.profile
+        query = request.query.get("q", "")
+        start = int(request.query.get("start", "1"))
+        num = int(request.query.get("num", "10"))
+        rng = _rng(profile, "search", query, start)
+        await asyncio.sleep(profile.search_latency * rng.lognormvariate(0, 0.3))
+        query_id = hashlib.sha256(query.encode()).hexdigest()[:10]
+        items = []
+        for offset in range(num):
+            if rng.random() < profile.duplicate_rate:
+                page_id = f"shared-{rng.randrange(3)}"
+            else:
+                page_id = f"{query_id}-{start + offset}"
+            items.append({
+                "title": f"{query} {start + offset}",
+                "link": f"{self.base_url}/pages/{page_id}",
+                "snippet": _words(rng, 20),
+            })
+        return web.json_response({"items": items})
+
+    async def _page(self, request: web.Request) -> web.Response:
+        self._count("page")
+        profile = self.profile
+        page_id = request.match_info["page_id"]
+        rng = _rng(profile, "page", page_id)
+        await asyncio.sleep(profile.page_latency * rng.lognormvariate(0, profile.page_latency_sigma))
+        if rng.random() < profile.page_error_rate:
+            return web.Response(status=404)
+        paragraphs = max(1, round(profile.page_paragraphs * rng.lognormvariate(0, profile.page_paragraphs_sigma)))
+        body = "".join(f"<p>{_words(rng, profile.paragraph_words)}.</p>" for _ in range(paragraphs))
+        html = (f"<html><head><title>{page_id}</title></head><body><nav>Home News Sport</nav>"
+                f"<article><h1>{_words(rng, 8)}</h1>{body}</article>"
+                f"<footer>Copyright</footer></body></html>")
+        return web.Response(text=html, content_type="text/html")
+
+    def _completion_text(self, rng: random.Random) -> str:
+        # roughly four tokens per three words
+        return _words(rng, self.profile.completion_tokens * 3 // 4)
+
+    def _llm_delay(self, rng: random.Random) -> float:
+        profile = self.profile
+        return ((profile.llm_latency + profile.llm_latency_per_token * profile.completion_tokens)
+                * rng.lognormvariate(0, profile.llm_latency_sigma))
+
+    async def _chat(self, request: web.Request) -> web.StreamResponse:
+        self._count("chat")
+        body = await request.json()
+        prompt = "\n".join(message["content"] for message in body.get("messages", [])
+                           if isinstance(message.get("content"), str))
+        rng = _rng(self.profile, "chat", body.get("model"), prompt)
+        delay = self._llm_delay(rng)
+        text = self._completion_text(rng)
+        usage = {"prompt_tokens": len(prompt) // 4, "completion_tokens": self.profile.completion_tokens,
+                 "total_tokens": len(prompt) // 4 + self.profile.completion_tokens}
+        message = {"role": "assistant", "content": text}
+        if body.get("tools"):
+            # structured output: every string argument of the requested function gets the text
+            function = body["tools"][0]["function"]
+            properties = function.get("parameters", {}).get("properties", {})
+            arguments = {name: text for name, schema in properties.items() if schema.get("type", "string") == "string"}
+            message = {"role": "assistant", "content": None, "tool_calls": [{
+                "id": "call_0", "type": "function",
+                "function": {"name": function["name"], "arguments": json.dumps(arguments)},
+            }]}
+        if body.get("stream") and not body.get("tools"):
+            return await self._stream_chat(request, body, text, delay, usage)
+        await asyncio.sleep(delay)
+        return web.json_response({
+            "id": "chatcmpl-bench", "object": "chat.completion", "created": 0, "model": body.get("model"),
+            "choices": [{"index": 0, "message": message, "finish_reason": "stop"}],
+            "usage": usage,
+        })
+
+    async def _stream_chat(self, request, body, text, delay, usage) -> web.StreamResponse:
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        words = text.split(" ")
+        step = 8
+        chunks = [" ".join(words[i:i + step]) + " " for i in range(0, len(words), step)]
+        # a third of the delay before the first token, the rest spread over the chunks
+        await asyncio.sleep(delay / 3)
+
+        def event(payload):
+            return ("data: " + json.dumps({"id": "chatcmpl-bench", "object": "chat.completion.chunk",
+                                           "created": 0, "model": body.get("model"), **payload}) + "\n\n").encode()
+
+        for chunk in chunks:
+            await asyncio.sleep(delay * 2 / 3 / len(chunks))
+            await response.write(event({"choices": [{"index": 0, "delta": {"content": chunk},
+                                                     "finish_reason": None}]}))
+        await response.write(event({"choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}))
+        if body.get("stream_options", {}).get("include_usage"):
+            await response.write(event({"choices": [], "usage": usage}))
+        await response.write(b"data: [DONE]\n\n")
+        return response
+
+    def _image_bytes(self) -> bytes:
+        # noise compresses as badly as a photo, so uploads and re-encoding cost what they would
+        size = self.profile.image_size
+        if size not in self._images:
+            from PIL import Image
+            rng = _rng(self.profile, "image", size)
+            image = Image.frombytes("RGB", (size, size), rng.randbytes(size * size * 3))
+            buffer = io.BytesIO()
+            image.save(buffer, "PNG")
+            self._images[size] = buffer.getvalue()
+        return self._images[size]
+
+    async def _image_generation(self, request: web.Request) -> web.Response:
+        self._count("image")
+        body = await request.json()
+        rng = _rng(self.profile, "image", body.get("prompt"))
+        await asyncio.sleep(self.profile.image_latency * rng.lognormvariate(0, 0.2))
+        if body.get("response_format") == "b64_json":
+            data = {"b64_json": base64.b64encode(self._image_bytes()).decode()}
+        else:
+            data = {"url": f"{self.base_url}/images/generated.png"}
+        return web.json_response({"created": 0, "data": [data]})
+
+    async def _image_file(self, request: web.Request) -> web.Response:
+        self._count("image_download")
+        return web.Response(body=self._image_bytes(), content_type="image/png")
+
+    def start(self) -> str:
+        """Start serving on a background thread, returns the base URL."""
+        ready = threading.Event()
+        errors = []
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self._loop)
+            try:
+                self._runner = web.AppRunner(self._app(), access_log=None)
+                self._loop.run_until_complete(self._runner.setup())
+                site = web.TCPSite(self._runner, self.host, self.port)
+                self._loop.run_until_complete(site.start())
+                self.port = self._runner.addresses[0][1]
+                self.base_url = f"http://{self.host}:{self.port}"
+            except Exception as e:
+                errors.append(e)
+                return
+            finally:
+                ready.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=run, name="bench-fake-services", daemon=True)
+        self._thread.start()
+        ready.wait()
+        if errors:
+            raise errors[0]
+        # render the image before the first run instead of inside its timing
+        self._image_bytes()
+        logger.info(f"Fake services listening on {self.base_url}")
+        return self.base_url
+
+    def stop(self):
+        if self._loop is None:
+            return
+        future = asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop)
+        future.result(timeout=10)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=10)
+        self._loop = None
+
+    def environment(self) -> Dict[str, str]:
+        """Environment pointing the workflow at these services."""
+        return {
+            "GOOGLE_API_BASE_URL": f"{self.base_url}/customsearch/v1",
+            "DEEPSEEK_API_BASE": f"{self.base_url}/v1",
+            "OPENAI_BASE_URL": f"{self.base_url}/v1",
+            "GOOGLE_API_KEY": "bench",
+            "GOOGLE_CSE_ID": "bench",
+            "DEEPSEEK_API_KEY": "bench",
+            "OPENAI_API_KEY": "bench",
+        }
@@ -0,0 +1,71 @@
+import argparse
+import json
+import logging
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List
+
+logger = logging.getLogger(__name__)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULES = ["config.setting", "node.lg_llm", "utils.pic_generator", "node.lg_node", "node.lg_graph", "node.lg_runner"]
+
+_TIMER = ("import time, importlib; t = time.perf_counter(); importlib.import_module({module!r}); "
+          "print(time.perf_counter() - t)")
+
+
+def _run(args: List[str]) -> subprocess.CompletedProcess:
+    env = dict(os.environ, PYTHONPATH=ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    return subprocess.run([sys.executable, *args], cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+
+
+def time_import(module: str, repeat: int) -> List[float]:
+    """Seconds to import module in `repeat` fresh interpreters."""
+    return [float(_run(["-c", _TIMER.format(module=module)]).stdout) for _ in range(repeat)]
+
+
+def slowest_imports(module: str, top: int) -> List[Dict]:
+    """The top imports by self time under `python -X importtime`, in seconds."""
+    entries = []
+    for line in _run(["-X", "importtime", "-c", f"import {module}"]).stderr.splitlines():
+        parts = line.split("|")
+        if len(parts) != 3 or not parts[0].startswith("import time:") or "self" in parts[0]:
+            continue
+        entries.append({"module": parts[2].strip(),
+                        "self": int(parts[0].split(":")[1]) / 1e6,
+                        "cumulative": int(parts[1]) / 1e6})
+    return sorted(entries, key=lambda entry: entry["self"], reverse=True)[:top]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Import time of the workflow modules, each in a fresh interpreter.")
+    parser.add_argument("--modules", default=",".join(MODULES), help="comma separated modules")
+    parser.add_argument("--repeat", type=int, default=5, help="imports per module, the median is reported")
+    parser.add_argument("--top", type=int, default=5, help="slowest imports listed per module, 0 for none")
+    parser.add_argument("--output", help="write the results as JSON")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    results = {}
+    for module in args.modules.split(","):
+        samples = time_import(module, args.repeat)
+        results[module] = {"median": round(statistics.median(samples), 4),
+                           "min": round(min(samples), 4),
+                           "slowest": slowest_imports(module, args.top) if args.top else []}
+        logger.info(f"{module:<24} median {results[module]['median'] * 1000:7.1f} ms"
+                    f"  min {results[module]['min'] * 1000:7.1f} ms")
+        for entry in results[module]["slowest"]:
+            logger.info(f"    {entry['self'] * 1000:7.1f} ms self  {entry['cumulative'] * 1000:7.1f} ms total"
+                        f"  {entry['module']}")
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump({"python": sys.version.split()[0], "repeat": args.repeat, "modules": results}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -3,22 +3,46 @@ from dotenv import load_dotenv,find_dotenv
 import logging
 
 
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 
+# logged at debug: importing the settings should not write to stderr
 if load_dotenv(find_dotenv(),override=True):
-    logger.info("find .env file")
+    logger.debug("find .env file")
 else:
-    logger.warning("not find .env file")
+    logger.debug("not find .env file")
+
+# Logging, applied by entry points through configure_logging, library modules only create loggers
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+
+
+def configure_logging(level: str = LOG_LEVEL):
+    """Configure the root logger, for scripts such as `python -m node.lg_runner`."""
+    logging.basicConfig(level=level, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 
 # LLM
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 DEEPSEEK_API_KEY = os.getenv("DEEPSEEK_API_KEY")
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", ".cache/llm.db")
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "10000"))
 
 # Search
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 GOOGLE_CSE_ID = os.getenv("GOOGLE_CSE_ID")
+# Custom Search endpoint, overridden by the offline benchmark in bench/
+GOOGLE_API_BASE_URL = os.getenv("GOOGLE_API_BASE_URL", "https://www.googleapis.com/customsearch/v1")
+SEARCH_RESULTS_PER_QUERY = int(os.getenv("SEARCH_RESULTS_PER_QUERY", "2"))
+SEARCH_PAGES_PER_QUERY = int(os.getenv("SEARCH_PAGES_PER_QUERY", "1"))
+SEARCH_MAX_REQUESTS = int(os.getenv("SEARCH_MAX_REQUESTS", "6"))
+SEARCH_MAX_WORKERS = int(os.getenv("SEARCH_MAX_WORKERS", "4"))
+# "memory", "sqlite" or "none"
+SEARCH_CACHE_BACKEND = os.getenv("SEARCH_CACHE_BACKEND", "sqlite")
+SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", "3600"))
+SEARCH_CACHE_PATH = os.getenv("SEARCH_CACHE_PATH", ".cache/search.db")
+# entries of the memory backend, the least recently used are evicted beyond it
+SEARCH_CACHE_MAX_ENTRIES = int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "1024"))
 
 
 # AWS
@@ -27,6 +51,151 @@ AWS_SECRET_ACCESS_KEY = os.getenv("AWS_SECRET_ACCESS_KEY")
 AWS_REGION = os.getenv("AWS_REGION")
 AWS_BUCKET_NAME = os.getenv("AWS_BUCKET_NAME")
 DYNAMODB_TABLE_NAME = os.getenv("DYNAMODB_TABLE_NAME")
+# connections per shared boto3 client, should cover the threads using it
+AWS_MAX_POOL_CONNECTIONS = int(os.getenv("AWS_MAX_POOL_CONNECTIONS", "50"))
+# botocore attempts per call, 1 leaves retries to utils.rate_limit
+AWS_MAX_ATTEMPTS = int(os.getenv("AWS_MAX_ATTEMPTS", "1"))
+
+# OpenAI client connection pool, shared by the image description, title and image calls
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "20"))
+OPENAI_MAX_KEEPALIVE = int(os.getenv("OPENAI_MAX_KEEPALIVE", "10"))
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "120"))
+
+# Image generation: "b64_json" uploads the returned bytes directly, "url" streams a download
+IMAGE_RESPONSE_FORMAT = os.getenv("IMAGE_RESPONSE_FORMAT", "b64_json")
+# S3 managed transfer, parts are uploaded concurrently above the threshold
+S3_MULTIPART_THRESHOLD = int(os.getenv("S3_MULTIPART_THRESHOLD", str(8 * 1024 * 1024)))
+S3_MULTIPART_CHUNKSIZE = int(os.getenv("S3_MULTIPART_CHUNKSIZE", str(8 * 1024 * 1024)))
+S3_MAX_CONCURRENCY = int(os.getenv("S3_MAX_CONCURRENCY", "4"))
+
+# Image post-processing: re-encode the generated image and render thumbnails
+IMAGE_PROCESSING_ENABLED = os.getenv("IMAGE_PROCESSING_ENABLED", "true").lower() == "true"
+# "webp" or "jpeg"
+IMAGE_FORMAT = os.getenv("IMAGE_FORMAT", "webp")
+IMAGE_QUALITY = int(os.getenv("IMAGE_QUALITY", "80"))
+IMAGE_THUMBNAIL_WIDTHS = [int(w) for w in os.getenv("IMAGE_THUMBNAIL_WIDTHS", "256,512").split(",") if w.strip()]
+# "process", "thread" or "inline"
+IMAGE_EXECUTOR = os.getenv("IMAGE_EXECUTOR", "process")
+IMAGE_MAX_WORKERS = int(os.getenv("IMAGE_MAX_WORKERS", "0")) or None
+
+# Web fetch
+FETCH_MAX_CONNECTIONS = int(os.getenv("FETCH_MAX_CONNECTIONS", "100"))
+FETCH_MAX_PER_HOST = int(os.getenv("FETCH_MAX_PER_HOST", "4"))
+FETCH_DNS_CACHE_TTL = int(os.getenv("FETCH_DNS_CACHE_TTL", "300"))
+FETCH_KEEPALIVE_TIMEOUT = float(os.getenv("FETCH_KEEPALIVE_TIMEOUT", "30"))
+FETCH_TIMEOUT = float(os.getenv("FETCH_TIMEOUT", "30"))
+
+# Page cache
+PAGE_CACHE_ENABLED = os.getenv("PAGE_CACHE_ENABLED", "true").lower() == "true"
+PAGE_CACHE_DIR = os.getenv("PAGE_CACHE_DIR", ".cache/pages")
+PAGE_CACHE_TTL = float(os.getenv("PAGE_CACHE_TTL", str(6 * 3600)))
+PAGE_CACHE_MAX_BYTES = int(os.getenv("PAGE_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+
+# Content extraction: "process", "thread" or "inline"
+EXTRACT_EXECUTOR = os.getenv("EXTRACT_EXECUTOR", "process")
+EXTRACT_MAX_WORKERS = int(os.getenv("EXTRACT_MAX_WORKERS", "0")) or None
+
+# Pipeline
+PIPELINE_STREAMING = os.getenv("PIPELINE_STREAMING", "false").lower() == "true"
+
+# Relevance trimming of each source before drafting
+TRIM_ENABLED = os.getenv("TRIM_ENABLED", "true").lower() == "true"
+TRIM_TOKEN_BUDGET = int(os.getenv("TRIM_TOKEN_BUDGET", "1500"))
+
+# Combine: drafts are combined in groups of at most COMBINE_TOKEN_BUDGET tokens
+COMBINE_TOKEN_BUDGET = int(os.getenv("COMBINE_TOKEN_BUDGET", "6000"))
+COMBINE_MAX_DEPTH = int(os.getenv("COMBINE_MAX_DEPTH", "4"))
+TOKENIZER_ENCODING = os.getenv("TOKENIZER_ENCODING", "cl100k_base")
+
+# Near-duplicate source detection
+DEDUP_ENABLED = os.getenv("DEDUP_ENABLED", "true").lower() == "true"
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.8"))
+DEDUP_NUM_PERM = int(os.getenv("DEDUP_NUM_PERM", "128"))
+DEDUP_SHINGLE_SIZE = int(os.getenv("DEDUP_SHINGLE_SIZE", "5"))
+
+# Incremental runs: skip topics whose article of the day is already complete and
+# sources already used by an earlier article of the topic, see utils/seen_urls.py
+INCREMENTAL_ENABLED = os.getenv("INCREMENTAL_ENABLED", "false").lower() == "true"
+SEEN_URLS_PATH = os.getenv("SEEN_URLS_PATH", ".cache/seen_urls.db")
+SEEN_URLS_RETENTION_DAYS = float(os.getenv("SEEN_URLS_RETENTION_DAYS", "30"))
+# days of stored articles whose web_links are merged into the index before each run
+INCREMENTAL_LOOKBACK_DAYS = int(os.getenv("INCREMENTAL_LOOKBACK_DAYS", "7"))
+# fewer new sources than this end the run without a new article
+INCREMENTAL_MIN_NEW_SOURCES = int(os.getenv("INCREMENTAL_MIN_NEW_SOURCES", "1"))
+
+# Rate limiting and retries of outbound calls, see utils/rate_limit.py
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+# per-host fetch limiters kept at once, the least recently used are dropped
+RATE_LIMIT_MAX_SCOPES = int(os.getenv("RATE_LIMIT_MAX_SCOPES", "256"))
+RETRY_MAX_ATTEMPTS = int(os.getenv("RETRY_MAX_ATTEMPTS", "5"))
+RETRY_BASE_DELAY = float(os.getenv("RETRY_BASE_DELAY", "0.5"))
+RETRY_MAX_DELAY = float(os.getenv("RETRY_MAX_DELAY", "30"))
+
+
+def _provider_limits(provider, rps, tpm, concurrency):
+    # <PROVIDER>_RPS, <PROVIDER>_TPM and <PROVIDER>_MAX_CONCURRENCY, 0 means unlimited rate
+    prefix = provider.upper()
+    return {
+        "requests_per_second": float(os.getenv(f"{prefix}_RPS", str(rps))) or None,
+        "tokens_per_minute": float(os.getenv(f"{prefix}_TPM", str(tpm))) or None,
+        "max_concurrency": int(os.getenv(f"{prefix}_MAX_CONCURRENCY", str(concurrency))),
+    }
+
+
+RATE_LIMITS = {
+    "google_cse": _provider_limits("google_cse", 10, 0, 8),
+    "deepseek": _provider_limits("deepseek", 0, 0, 32),
+    "openai": _provider_limits("openai", 0, 0, 16),
+    # per publisher host
+    "fetch": _provider_limits("fetch", 0, 0, 4),
+    "s3": _provider_limits("s3", 0, 0, 50),
+    "dynamodb": _provider_limits("dynamodb", 0, 0, 50),
+}
+
+# Metrics, see utils/metrics.py
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+# directory of the JSON report written after every batch, empty to skip
+METRICS_REPORT_DIR = os.getenv("METRICS_REPORT_DIR", "")
+# Prometheus textfile rewritten after every batch, empty to skip
+METRICS_TEXTFILE = os.getenv("METRICS_TEXTFILE", "")
+# port of the /metrics endpoint served by the daemon, 0 to disable
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+
+# Runner
+TOPIC_MAX_CONCURRENCY = int(os.getenv("TOPIC_MAX_CONCURRENCY", "5"))
+
+# Daemon, see node/lg_daemon.py
+# seconds between the scheduled runs of a topic
+DAEMON_INTERVAL = float(os.getenv("DAEMON_INTERVAL", str(24 * 3600)))
+# topics running at the same time
+DAEMON_WORKERS = int(os.getenv("DAEMON_WORKERS", str(TOPIC_MAX_CONCURRENCY)))
+# retries of a failed run, the delay doubles from DAEMON_RETRY_BACKOFF up to DAEMON_RETRY_BACKOFF_MAX seconds
+DAEMON_MAX_RETRIES = int(os.getenv("DAEMON_MAX_RETRIES", "3"))
+DAEMON_RETRY_BACKOFF = float(os.getenv("DAEMON_RETRY_BACKOFF", "60"))
+DAEMON_RETRY_BACKOFF_MAX = float(os.getenv("DAEMON_RETRY_BACKOFF_MAX", "1800"))
+# seconds after which a run is cancelled and counted as failed, 0 for no limit
+DAEMON_RUN_TIMEOUT = float(os.getenv("DAEMON_RUN_TIMEOUT", "3600"))
+
+# Checkpointing: the runner saves the graph state after every node so a failed
+# run resumes from the last successful node, see node/lg_checkpoint.py
+CHECKPOINT_ENABLED = os.getenv("CHECKPOINT_ENABLED", "true").lower() == "true"
+CHECKPOINT_PATH = os.getenv("CHECKPOINT_PATH", ".cache/checkpoints.db")
+# serialized values at least this large are stored once, compressed, outside the checkpoints
+CHECKPOINT_BLOB_MIN_BYTES = int(os.getenv("CHECKPOINT_BLOB_MIN_BYTES", "4096"))
+CHECKPOINT_RETENTION_DAYS = float(os.getenv("CHECKPOINT_RETENTION_DAYS", "7"))
+
+# Fan-out policy of the fetch and draft stages, 0 disables a setting:
+# *_QUORUM proceeds once that many members succeeded, *_DEADLINE (seconds
+# after the first member started) proceeds with whatever finished,
+# *_HEDGE_PERCENTILE (0-1) re-issues members
+# slower than that percentile of recent latencies
+FETCH_QUORUM = int(os.getenv("FETCH_QUORUM", "0")) or None
+FETCH_DEADLINE = float(os.getenv("FETCH_DEADLINE", "0")) or None
+FETCH_HEDGE_PERCENTILE = float(os.getenv("FETCH_HEDGE_PERCENTILE", "0")) or None
+DRAFT_QUORUM = int(os.getenv("DRAFT_QUORUM", "0")) or None
+DRAFT_DEADLINE = float(os.getenv("DRAFT_DEADLINE", "0")) or None
+DRAFT_HEDGE_PERCENTILE = float(os.getenv("DRAFT_HEDGE_PERCENTILE", "0")) or None
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "5"))
 
 
 missing_vars = []
@@ -1,4 +1,4 @@
-from typing import List, Dict
+from typing import List, Dict, Optional
 
 TOPICS: List[Dict[str, any]] = [
     {
@@ -26,4 +26,12 @@ TOPICS: List[Dict[str, any]] = [
         "name": "AI",
         "keywords": ["AI", "artificial intelligence", "machine learning"]
     }
-]
\ No newline at end of file
+]
+
+
+def get_topic(topic_id: str) -> Optional[Dict[str, any]]:
+    """Return the TOPICS entry with the given id, None for ad hoc topics."""
+    for topic in TOPICS:
+        if topic["id"] == topic_id:
+            return topic
+    return None
@@ -0,0 +1,332 @@
+# from ..config.setting import CHECKPOINT_PATH, CHECKPOINT_BLOB_MIN_BYTES, CHECKPOINT_RETENTION_DAYS
+from config.setting import CHECKPOINT_PATH, CHECKPOINT_BLOB_MIN_BYTES, CHECKPOINT_RETENTION_DAYS
+from .lg_node import current_date, tz
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import ChannelVersions, Checkpoint, CheckpointMetadata, CheckpointTuple
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+from langgraph.checkpoint.sqlite import SqliteSaver
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+from contextlib import asynccontextmanager, closing
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, AsyncIterator, List, Optional, Sequence, Tuple
+import aiosqlite
+import asyncio
+import hashlib
+import importlib.metadata
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+logger = logging.getLogger(__name__)
+
+# a value offloaded to the blob table is replaced by {BLOB_REF: [type, digest]}
+BLOB_REF = "__checkpoint_blob__"
+# writes stored in the blob table are saved with this type prefix and the digest as value
+BLOB_TYPE_PREFIX = "blob:"
+_KNOWN_DIGESTS_MAX = 10000
+# CheckpointSerializer rewrites the "channel_values" and "pending_sends" fields
+# of the checkpoint dicts the savers pass to dumps_typed. That is the layout of
+# checkpoint format v1 as written by langgraph-checkpoint-sqlite 2.0.x, pinned
+# in requirements.txt; other versions are refused instead of silently storing
+# unreadable or unshrunk checkpoints
+CHECKPOINT_FORMAT_VERSION = 1
+SUPPORTED_SQLITE_SAVER = "2.0."
+
+
+def _check_saver_version():
+    version = importlib.metadata.version("langgraph-checkpoint-sqlite")
+    if not version.startswith(SUPPORTED_SQLITE_SAVER):
+        raise RuntimeError(f"CheckpointSerializer supports langgraph-checkpoint-sqlite "
+                           f"{SUPPORTED_SQLITE_SAVER}x, found {version}; check its checkpoint layout "
+                           f"and update SUPPORTED_SQLITE_SAVER")
+
+
+def thread_id(topic: str, date: Optional[str] = None) -> str:
+    """Checkpoint thread of a topic's run on a date, one thread per (topic, date)."""
+    return f"{topic}:{date or current_date()}"
+
+
+def thread_config(topic: str, date: Optional[str] = None, **config) -> dict:
+    """RunnableConfig selecting the checkpoint thread of (topic, date)."""
+    configurable = {**config.pop("configurable", {}), "thread_id": thread_id(topic, date)}
+    return {**config, "configurable": configurable}
+
+
+class BlobStore:
+    """
+    Content-addressed, zlib-compressed values shared by all checkpoints.
+
+    The sqlite savers rewrite every channel value into every checkpoint, so
+    fields such as websites_content or news_image_bytes would be copied once
+    per node. Stored here under their sha256 they are written once per run
+    and each checkpoint only carries the digest.
+    """
+
+    def __init__(self, path: str = CHECKPOINT_PATH + ".blobs"):
+        # a separate database: the async saver keeps its write transaction open
+        # between put_writes and the next checkpoint, which would lock out a
+        # second writer of the checkpoint database
+        self.path = path
+        self._lock = threading.Lock()
+        # digests this process already wrote, an unchanged channel only refreshes used_at
+        self._known = set()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS checkpoint_blobs (
+                    digest TEXT PRIMARY KEY,
+                    data BLOB NOT NULL,
+                    used_at REAL NOT NULL
+                )
+            """)
+
+    def put(self, data: bytes) -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        if digest in self._known:
+            # every checkpoint referencing the blob keeps it alive, see prune
+            with self._lock, self._conn:
+                updated = self._conn.execute("UPDATE checkpoint_blobs SET used_at = ? WHERE digest = ?",
+                                             (time.time(), digest)).rowcount
+            if updated:
+                return digest
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO checkpoint_blobs (digest, data, used_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(digest) DO UPDATE SET used_at = excluded.used_at",
+                (digest, zlib.compress(data), time.time())
+            )
+            if len(self._known) >= _KNOWN_DIGESTS_MAX:
+                self._known.clear()
+            self._known.add(digest)
+        return digest
+
+    def get(self, digest: str) -> bytes:
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM checkpoint_blobs WHERE digest = ?", (digest,)).fetchone()
+        if row is None:
+            raise KeyError(f"Checkpoint blob {digest} is missing from {self.path}")
+        return zlib.decompress(row[0])
+
+    def prune(self, retention_days: float = CHECKPOINT_RETENTION_DAYS):
+        """Drop the blobs not used by any checkpoint written in the last retention_days."""
+        cutoff = time.time() - retention_days * 24 * 3600
+        with self._lock, self._conn:
+            deleted = self._conn.execute("DELETE FROM checkpoint_blobs WHERE used_at < ?", (cutoff,)).rowcount
+            self._known.clear()
+        if deleted:
+            logger.info(f"Pruned {deleted} checkpoint blobs older than {retention_days} days")
+
+
+def prune_threads(path: str = CHECKPOINT_PATH, retention_days: float = CHECKPOINT_RETENTION_DAYS):
+    """Drop the checkpoint threads of dates older than retention_days."""
+    if not os.path.exists(path):
+        return
+    cutoff = (datetime.now(tz) - timedelta(days=retention_days)).date().isoformat()
+    with closing(sqlite3.connect(path)) as conn, conn:
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        for table in ("checkpoints", "writes"):
+            if table in tables:
+                # thread ids end with the ISO date, see thread_id
+                conn.execute(f"DELETE FROM {table} WHERE substr(thread_id, -10) < ?", (cutoff,))
+
+
+class CheckpointSerializer(JsonPlusSerializer):
+    """
+    JsonPlusSerializer that moves values of at least min_bytes serialized
+    bytes into a BlobStore, both channel values inside checkpoints and
+    pending writes.
+
+    Relies on the checkpoint layout of langgraph-checkpoint-sqlite 2.0.x,
+    construction fails on other versions and serializing fails on checkpoints
+    of another format version.
+    """
+
+    def __init__(self, blobs: BlobStore, min_bytes: int = CHECKPOINT_BLOB_MIN_BYTES):
+        _check_saver_version()
+        super().__init__()
+        self.blobs = blobs
+        self.min_bytes = min_bytes
+
+    def _offload(self, value):
+        type_, data = super().dumps_typed(value)
+        if len(data) < self.min_bytes:
+            return value
+        return {BLOB_REF: [type_, self.blobs.put(data)]}
+
+    def _restore(self, value):
+        if isinstance(value, dict) and len(value) == 1 and BLOB_REF in value:
+            type_, digest = value[BLOB_REF]
+            return super().loads_typed((type_, self.blobs.get(digest)))
+        return value
+
+    @staticmethod
+    def _is_checkpoint(obj) -> bool:
+        if not (isinstance(obj, dict) and "channel_values" in obj):
+            return False
+        if obj.get("v") != CHECKPOINT_FORMAT_VERSION:
+            raise RuntimeError(f"Unsupported checkpoint format version {obj.get('v')!r}, "
+                               f"CheckpointSerializer handles version {CHECKPOINT_FORMAT_VERSION}")
+        return True
+
+    def offload_checkpoint(self, checkpoint: dict) -> dict:
+        """Copy of a checkpoint with its large channel values and sends replaced by blob references."""
+        checkpoint = dict(checkpoint)
+        checkpoint["channel_values"] = {k: self._offload(v) for k, v in checkpoint["channel_values"].items()}
+        checkpoint["pending_sends"] = [self._offload(v) for v in checkpoint.get("pending_sends", [])]
+        return checkpoint
+
+    def restore_checkpoint(self, checkpoint: dict) -> dict:
+        """Replace the blob references of a loaded checkpoint with their values, in place."""
+        if self._is_checkpoint(checkpoint):
+            checkpoint["channel_values"] = {k: self._restore(v) for k, v in checkpoint["channel_values"].items()}
+            checkpoint["pending_sends"] = [self._restore(v) for v in checkpoint.get("pending_sends", [])]
+        return checkpoint
+
+    def dumps_typed(self, obj) -> Tuple[str, bytes]:
+        if self._is_checkpoint(obj):
+            return super().dumps_typed(self.offload_checkpoint(obj))
+        type_, data = super().dumps_typed(obj)
+        if len(data) >= self.min_bytes:
+            return BLOB_TYPE_PREFIX + type_, self.blobs.put(data).encode()
+        return type_, data
+
+    def loads_typed(self, data: Tuple[str, bytes]):
+        type_, payload = data
+        if type_.startswith(BLOB_TYPE_PREFIX):
+            return super().loads_typed((type_[len(BLOB_TYPE_PREFIX):], self.blobs.get(payload.decode())))
+        return self.restore_checkpoint(super().loads_typed(data))
+
+
+@dataclass
+class SerializedValue:
+    """A pending write already serialized by CheckpointSerializer, possibly into a blob reference."""
+    type_: str
+    data: bytes
+
+
+class _DeferredSerializer(JsonPlusSerializer):
+    """
+    Serializer of AsyncCheckpointSaver: checkpoints arrive with their blobs
+    already offloaded and writes as SerializedValue, blob-typed writes are
+    loaded as SerializedValue and resolved later in a worker thread.
+    """
+
+    def dumps_typed(self, obj) -> Tuple[str, bytes]:
+        if isinstance(obj, SerializedValue):
+            return obj.type_, obj.data
+        return super().dumps_typed(obj)
+
+    def loads_typed(self, data: Tuple[str, bytes]):
+        type_, payload = data
+        if type_.startswith(BLOB_TYPE_PREFIX):
+            return SerializedValue(type_, payload)
+        return super().loads_typed(data)
+
+
+class AsyncCheckpointSaver(AsyncSqliteSaver):
+    """
+    AsyncSqliteSaver that moves values into the BlobStore like CheckpointSerializer
+    does for SqliteSaver, but hashes, compresses and stores them in a worker
+    thread so a superstep carrying image bytes does not stall the event loop.
+    """
+
+    def __init__(self, conn: aiosqlite.Connection, blob_serde: CheckpointSerializer):
+        super().__init__(conn, serde=_DeferredSerializer())
+        self.blob_serde = blob_serde
+
+    def _restore_tuple(self, checkpoint_tuple: CheckpointTuple) -> CheckpointTuple:
+        writes = [
+            (task_id, channel, self.blob_serde.loads_typed((value.type_, value.data))
+             if isinstance(value, SerializedValue) else value)
+            for task_id, channel, value in checkpoint_tuple.pending_writes or []
+        ]
+        return checkpoint_tuple._replace(checkpoint=self.blob_serde.restore_checkpoint(checkpoint_tuple.checkpoint),
+                                         pending_writes=writes)
+
+    def _serialize_writes(self, writes: Sequence[Tuple[str, Any]]) -> List[Tuple[str, SerializedValue]]:
+        return [(channel, SerializedValue(*self.blob_serde.dumps_typed(value))) for channel, value in writes]
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        checkpoint_tuple = await super().aget_tuple(config)
+        if checkpoint_tuple is None:
+            return None
+        return await asyncio.to_thread(self._restore_tuple, checkpoint_tuple)
+
+    async def alist(self, config: Optional[RunnableConfig], **kwargs) -> AsyncIterator[CheckpointTuple]:
+        async for checkpoint_tuple in super().alist(config, **kwargs):
+            yield await asyncio.to_thread(self._restore_tuple, checkpoint_tuple)
+
+    async def aput(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata,
+                   new_versions: ChannelVersions) -> RunnableConfig:
+        checkpoint = await asyncio.to_thread(self.blob_serde.offload_checkpoint, checkpoint)
+        return await super().aput(config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config: RunnableConfig, writes: Sequence[Tuple[str, Any]], task_id: str,
+                          task_path: str = "") -> None:
+        writes = await asyncio.to_thread(self._serialize_writes, writes)
+        await super().aput_writes(config, writes, task_id, task_path)
+
+
+_blobs: Optional[BlobStore] = None
+_saver: Optional[SqliteSaver] = None
+_init_lock = threading.Lock()
+
+
+def get_blob_store() -> BlobStore:
+    """Return the process-wide blob store, pruning old checkpoints when it is opened."""
+    global _blobs
+    with _init_lock:
+        if _blobs is None:
+            prune_threads()
+            _blobs = BlobStore()
+            _blobs.prune()
+            logger.info(f"Checkpoint store initialized at {CHECKPOINT_PATH}, "
+                        f"offloading values over {CHECKPOINT_BLOB_MIN_BYTES} bytes")
+        return _blobs
+
+
+def get_checkpointer() -> SqliteSaver:
+    """Return the process-wide SqliteSaver used by synchronous graph runs."""
+    global _saver
+    blobs = get_blob_store()
+    with _init_lock:
+        if _saver is None:
+            conn = sqlite3.connect(CHECKPOINT_PATH, check_same_thread=False)
+            _saver = SqliteSaver(conn, serde=CheckpointSerializer(blobs))
+        return _saver
+
+
+@asynccontextmanager
+async def open_async_checkpointer() -> AsyncIterator[AsyncCheckpointSaver]:
+    """
+    AsyncCheckpointSaver for graph runs on the current event loop.
+
+    aiosqlite connections belong to the loop that opened them, so unlike
+    get_checkpointer this is opened per batch and closed afterwards.
+    """
+    blobs = get_blob_store()
+    async with aiosqlite.connect(CHECKPOINT_PATH) as conn:
+        yield AsyncCheckpointSaver(conn, CheckpointSerializer(blobs))
+
+
+def clear_thread(saver: SqliteSaver, thread: str):
+    """Delete every checkpoint of a thread so the next run starts from START."""
+    with saver.cursor() as cur:
+        cur.execute("DELETE FROM checkpoints WHERE thread_id = ?", (thread,))
+        cur.execute("DELETE FROM writes WHERE thread_id = ?", (thread,))
+
+
+async def aclear_thread(saver: AsyncSqliteSaver, thread: str):
+    """clear_thread for an AsyncSqliteSaver."""
+    await saver.setup()
+    async with saver.lock:
+        await saver.conn.execute("DELETE FROM checkpoints WHERE thread_id = ?", (thread,))
+        await saver.conn.execute("DELETE FROM writes WHERE thread_id = ?", (thread,))
+        await saver.conn.commit()
@@ -0,0 +1,263 @@
+# from ..config.setting import (CHECKPOINT_ENABLED, DAEMON_INTERVAL, DAEMON_WORKERS, DAEMON_MAX_RETRIES,
+#                               DAEMON_RETRY_BACKOFF, DAEMON_RETRY_BACKOFF_MAX, DAEMON_RUN_TIMEOUT,
+#                               METRICS_ENABLED, METRICS_PORT, configure_logging)
+# from ..config.topic import TOPICS
+# from .lg_graph import chain
+# from .lg_checkpoint import open_async_checkpointer, thread_config
+# from .lg_node import current_date
+# from .lg_runner import _astart_or_resume, _publish_report
+# from ..utils.http_client import close_fetch_client
+# from ..utils.pic_generator import close_async_client
+# from ..utils.metrics import run_report, mark_submitted, serve_metrics
+from config.setting import (CHECKPOINT_ENABLED, DAEMON_INTERVAL, DAEMON_WORKERS, DAEMON_MAX_RETRIES,
+                            DAEMON_RETRY_BACKOFF, DAEMON_RETRY_BACKOFF_MAX, DAEMON_RUN_TIMEOUT,
+                            METRICS_ENABLED, METRICS_PORT, configure_logging)
+from config.topic import TOPICS
+from .lg_graph import chain
+from .lg_checkpoint import open_async_checkpointer, thread_config
+from .lg_node import current_date
+from .lg_runner import _astart_or_resume, _publish_report
+from utils.http_client import close_fetch_client
+from utils.pic_generator import close_async_client
+from utils.metrics import run_report, mark_submitted, serve_metrics
+from contextlib import AsyncExitStack
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+import argparse
+import asyncio
+import logging
+import math
+import random
+import signal
+import time
+
+logger = logging.getLogger(__name__)
+
+# seconds between two checks for due topics
+DISPATCH_TICK = 1.0
+
+
+@dataclass
+class TopicSchedule:
+    topic_id: str
+    # monotonic time of the current scheduled slot, the next slot is one interval later
+    slot: float
+    # monotonic time the topic is dispatched next, later than slot while retrying
+    next_run: float
+    # failed attempts of the current slot
+    failures: int = 0
+    # queued or running, a topic is never dispatched twice at the same time
+    running: bool = False
+    # no further runs, set by --once after the first slot
+    done: bool = False
+
+
+class TopicDaemon:
+    """
+    Long-running scheduler of the topics.
+
+    Every topic is run once per interval by a bounded pool of workers on one
+    event loop, so the compiled graph, the checkpointer, the HTTP sessions
+    and the LLM and image clients stay warm between runs. A topic is not
+    dispatched again while its previous run is queued or running; a slot
+    missed because a run took longer than the interval is skipped. Failed
+    runs are retried with exponential backoff and resume from their last
+    checkpoint.
+    """
+
+    def __init__(self, topic_ids: Optional[List[str]] = None,
+                 interval: float = DAEMON_INTERVAL,
+                 workers: int = DAEMON_WORKERS,
+                 max_retries: int = DAEMON_MAX_RETRIES,
+                 retry_backoff: float = DAEMON_RETRY_BACKOFF,
+                 retry_backoff_max: float = DAEMON_RETRY_BACKOFF_MAX,
+                 run_timeout: float = DAEMON_RUN_TIMEOUT,
+                 checkpoint: bool = CHECKPOINT_ENABLED,
+                 once: bool = False):
+        """
+        Args:
+            topic_ids: topic ids to schedule, defaults to every topic in config.topic.TOPICS
+            interval: seconds between the scheduled runs of a topic
+            workers: maximum number of topics running at the same time
+            max_retries: retries of a failed run before waiting for the next slot
+            retry_backoff: delay before the first retry in seconds, doubled for every further retry
+            retry_backoff_max: upper bound of the retry delay in seconds
+            run_timeout: seconds after which a run is cancelled and counted as failed, 0 for no limit
+            checkpoint: save runs with the checkpointer of node/lg_checkpoint.py and resume them on retry
+            once: run every topic's first slot, with retries, then stop
+        """
+        if topic_ids is None:
+            topic_ids = [topic["id"] for topic in TOPICS]
+        self.interval = interval
+        self.workers = workers
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.retry_backoff_max = retry_backoff_max
+        self.run_timeout = run_timeout
+        self.checkpoint = checkpoint
+        self.once = once
+        now = time.monotonic()
+        # keep order but schedule each topic only once
+        self.schedules: Dict[str, TopicSchedule] = {
+            topic_id: TopicSchedule(topic_id, slot=now, next_run=now) for topic_id in dict.fromkeys(topic_ids)
+        }
+        self._stop: Optional[asyncio.Event] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker_tasks: List[asyncio.Task] = []
+
+    def stop(self):
+        """Stop dispatching and let the running topics finish, a second call cancels them."""
+        if self._stop is None:
+            return
+        if self._stop.is_set():
+            logger.warning("Cancelling the running topics, they resume from their checkpoints on the next start")
+            for task in self._worker_tasks:
+                task.cancel()
+            return
+        logger.info("Stopping daemon after the running topics finish")
+        self._stop.set()
+
+    def _backoff(self, failures: int) -> float:
+        # full delay doubles per failure, jitter keeps topics that failed together from retrying together
+        delay = min(self.retry_backoff_max, self.retry_backoff * 2 ** (failures - 1))
+        return delay * random.uniform(0.5, 1.0)
+
+    def _advance(self, schedule: TopicSchedule):
+        """Move a topic to its next slot after a success or its last retry."""
+        schedule.failures = 0
+        if self.once:
+            schedule.done = True
+            schedule.next_run = math.inf
+            return
+        now = time.monotonic()
+        slot = schedule.slot + self.interval
+        if slot <= now:
+            skipped = int((now - slot) // self.interval) + 1
+            logger.warning(f"Topic {schedule.topic_id} overran its interval, skipping {skipped} slot(s)")
+            slot += skipped * self.interval
+        schedule.slot = schedule.next_run = slot
+
+    async def _run_topic(self, graph, saver, topic_id: str) -> dict:
+        mark_submitted(topic_id)
+        if saver is None:
+            return await graph.ainvoke({"topic": topic_id})
+        date = current_date()
+        config = thread_config(topic_id, date)
+        # a retry continues from the last node the failed attempt finished
+        return await graph.ainvoke(await _astart_or_resume(graph, saver, topic_id, date, config), config)
+
+    async def _attempt(self, graph, saver, schedule: TopicSchedule):
+        topic_id = schedule.topic_id
+        start = time.perf_counter()
+        with run_report(f"daemon-{topic_id}-{time.strftime('%Y%m%dT%H%M%S')}") as report:
+            try:
+                result = await asyncio.wait_for(self._run_topic(graph, saver, topic_id), self.run_timeout or None)
+            except Exception as e:
+                error = str(e) or type(e).__name__
+            else:
+                error = None
+        _publish_report(report)
+
+        elapsed = time.perf_counter() - start
+        if error is None:
+            skipped = f" (skipped: {result['skipped']})" if result.get("skipped") else ""
+            logger.info(f"Topic {topic_id} finished in {elapsed:.1f}s{skipped}")
+            self._advance(schedule)
+            return
+        schedule.failures += 1
+        if schedule.failures <= self.max_retries:
+            delay = self._backoff(schedule.failures)
+            logger.warning(f"Topic {topic_id} failed after {elapsed:.1f}s (attempt {schedule.failures}), "
+                           f"retrying in {delay:.0f}s: {error}")
+            schedule.next_run = time.monotonic() + delay
+        else:
+            logger.error(f"Topic {topic_id} failed {schedule.failures} times, giving up until its next slot: {error}")
+            self._advance(schedule)
+
+    async def _worker(self, graph, saver):
+        while True:
+            schedule = await self._queue.get()
+            try:
+                await self._attempt(graph, saver, schedule)
+            finally:
+                schedule.running = False
+                self._queue.task_done()
+
+    async def _dispatch(self):
+        while not self._stop.is_set():
+            now = time.monotonic()
+            for schedule in self.schedules.values():
+                if not schedule.running and schedule.next_run <= now:
+                    schedule.running = True
+                    self._queue.put_nowait(schedule)
+            if self.once and all(schedule.done for schedule in self.schedules.values()):
+                return
+            try:
+                await asyncio.wait_for(self._stop.wait(), DISPATCH_TICK)
+            except asyncio.TimeoutError:
+                pass
+
+    async def arun(self):
+        """Schedule the topics until stop() is called, or until every topic ran once with once."""
+        self._stop = asyncio.Event()
+        self._queue = asyncio.Queue()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, self.stop)
+            except (NotImplementedError, RuntimeError):
+                # no signal handlers on Windows or off the main thread, KeyboardInterrupt still stops the loop
+                pass
+
+        logger.info(f"Starting daemon for {len(self.schedules)} topics: interval={self.interval:.0f}s, "
+                    f"workers={self.workers}, checkpoint={self.checkpoint}")
+        try:
+            async with AsyncExitStack() as stack:
+                saver = await stack.enter_async_context(open_async_checkpointer()) if self.checkpoint else None
+                graph = chain.builder.compile(checkpointer=saver) if saver is not None else chain
+                self._worker_tasks = [asyncio.create_task(self._worker(graph, saver), name=f"daemon-worker-{i}")
+                                      for i in range(self.workers)]
+                await self._dispatch()
+                # queued topics are dropped, running ones finish unless stop() is called again
+                while not self._queue.empty():
+                    self._queue.get_nowait().running = False
+                    self._queue.task_done()
+                await asyncio.wait([asyncio.ensure_future(self._queue.join()), *self._worker_tasks],
+                                   return_when=asyncio.FIRST_COMPLETED)
+                for task in self._worker_tasks:
+                    task.cancel()
+                await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        finally:
+            for sig in (signal.SIGINT, signal.SIGTERM):
+                try:
+                    loop.remove_signal_handler(sig)
+                except (NotImplementedError, RuntimeError):
+                    pass
+            await close_fetch_client()
+            await close_async_client()
+        logger.info("Daemon stopped")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command line entry point: python -m node.lg_daemon [topic ...]"""
+    parser = argparse.ArgumentParser(description="Run the news workflow for every topic on a schedule.")
+    parser.add_argument("topics", nargs="*", help="topic ids, defaults to every topic in config.topic.TOPICS")
+    parser.add_argument("--interval", type=float, default=DAEMON_INTERVAL,
+                        help="seconds between the scheduled runs of a topic")
+    parser.add_argument("--workers", type=int, default=DAEMON_WORKERS,
+                        help="maximum number of topics running at the same time")
+    parser.add_argument("--no-checkpoint", action="store_true", help="neither save nor resume checkpoints")
+    parser.add_argument("--once", action="store_true", help="run every topic once, with retries, then exit")
+    args = parser.parse_args(argv)
+
+    configure_logging()
+    if METRICS_ENABLED and METRICS_PORT:
+        serve_metrics(METRICS_PORT)
+    daemon = TopicDaemon(args.topics or None, interval=args.interval, workers=args.workers,
+                         checkpoint=not args.no_checkpoint, once=args.once)
+    asyncio.run(daemon.arun())
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
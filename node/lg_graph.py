@@ -0,0 +1,136 @@
+from .lg_state import State, WriterState
+from .lg_node import web_search, web_parse, draft_news, combine_news, assign_writer, generate_news_image_node, generate_news_title, save_news_text, save_news_image
+from .lg_node import save_image_to_s3
+from .lg_node import aweb_search, aweb_parse, adraft_news, acombine_news, agenerate_news_image_node, agenerate_news_title, asave_news_text, asave_news_image
+from .lg_node import asave_image_to_s3
+from .lg_node import stream_draft_news, astream_draft_news
+from .lg_node import dedup_sources
+from .lg_node import draft_all_news, adraft_all_news
+from .lg_node import process_news_image, aprocess_news_image
+from .lg_node import check_published, acheck_published, filter_sources, afilter_sources
+from utils.fanout import DRAFT_POLICY
+from utils.metrics import track_node
+from config.setting import PIPELINE_STREAMING, DEDUP_ENABLED, IMAGE_PROCESSING_ENABLED, METRICS_ENABLED
+from config.setting import INCREMENTAL_ENABLED
+from langchain_core.runnables import RunnableLambda
+from langgraph.graph import StateGraph, START, END
+
+
+def _node(func, afunc=None) -> RunnableLambda:
+    """
+    Wrap a sync node and its async twin so both chain.invoke and chain.ainvoke work.
+
+    With METRICS_ENABLED every call is timed by utils.metrics.track_node, which
+    also labels the tokens, bytes and extractions recorded inside with the topic.
+    """
+    if not METRICS_ENABLED:
+        return RunnableLambda(func, afunc=afunc, name=func.__name__)
+
+    def timed(state, config):
+        with track_node(state, config):
+            return func(state)
+
+    if afunc is None:
+        return RunnableLambda(timed, name=func.__name__)
+
+    async def atimed(state, config):
+        with track_node(state, config):
+            return await afunc(state)
+
+    return RunnableLambda(timed, afunc=atimed, name=func.__name__)
+
+
+def _unless_skipped(next_node: str):
+    """Route to next_node, or to END once an incremental check skipped the topic."""
+    def route(state: State):
+        return END if state.get("skipped") else next_node
+    return route
+
+
+def build_workflow(streaming: bool = PIPELINE_STREAMING, dedup: bool = DEDUP_ENABLED,
+                   quorum_drafts: bool = DRAFT_POLICY.active,
+                   process_images: bool = IMAGE_PROCESSING_ENABLED,
+                   incremental: bool = INCREMENTAL_ENABLED) -> StateGraph:
+    """
+    Build the news generation workflow graph.
+
+    Args:
+        streaming: draft every page as soon as it is extracted instead of
+                   waiting for all pages before fanning out to draft_news
+        dedup: drop near-duplicate pages before they reach draft_news, the
+               streaming node checks pages as they arrive when DEDUP_ENABLED is set
+        quorum_drafts: draft all pages in a single draft_all_news node that
+                       applies the DRAFT_* quorum, deadline and hedging, since
+                       the Send fan-out always waits for every draft_news branch
+        process_images: re-encode the generated image and render thumbnails
+                        before uploading, instead of storing the original bytes
+        incremental: end the run before searching when the topic's article of
+                     the day is already complete, and drop the sources earlier
+                     articles used before parsing, ending the run when fewer
+                     than INCREMENTAL_MIN_NEW_SOURCES are new
+    """
+    workflow = StateGraph(State)
+
+    if incremental:
+        workflow.add_node("check_published", _node(check_published, acheck_published))
+    workflow.add_node("web_search", _node(web_search, aweb_search))
+    if incremental:
+        workflow.add_node("filter_sources", _node(filter_sources, afilter_sources))
+    if streaming:
+        workflow.add_node("stream_draft_news", _node(stream_draft_news, astream_draft_news))
+    else:
+        workflow.add_node("web_parse", _node(web_parse, aweb_parse))
+        if dedup:
+            workflow.add_node("dedup_sources", _node(dedup_sources))
+        if quorum_drafts:
+            workflow.add_node("draft_all_news", _node(draft_all_news, adraft_all_news))
+        else:
+            workflow.add_node("draft_news", _node(draft_news, adraft_news), input=WriterState)
+    workflow.add_node("combine_news", _node(combine_news, acombine_news))
+    workflow.add_node("generate_news_image", _node(generate_news_image_node, agenerate_news_image_node))
+    if process_images:
+        workflow.add_node("process_news_image", _node(process_news_image, aprocess_news_image))
+    workflow.add_node("save_image_to_s3", _node(save_image_to_s3, asave_image_to_s3))
+    workflow.add_node("generate_news_title", _node(generate_news_title, agenerate_news_title))
+    workflow.add_node("save_news_text", _node(save_news_text, asave_news_text))
+    workflow.add_node("save_news_image", _node(save_news_image, asave_news_image))
+
+    parse = "stream_draft_news" if streaming else "web_parse"
+    if incremental:
+        workflow.add_edge(START, "check_published")
+        workflow.add_conditional_edges("check_published", _unless_skipped("web_search"), ["web_search", END])
+        workflow.add_edge("web_search", "filter_sources")
+        workflow.add_conditional_edges("filter_sources", _unless_skipped(parse), [parse, END])
+    else:
+        workflow.add_edge(START, "web_search")
+        workflow.add_edge("web_search", parse)
+    if streaming:
+        workflow.add_edge("stream_draft_news", "combine_news")
+    else:
+        if dedup:
+            workflow.add_edge("web_parse", "dedup_sources")
+        parsed = "dedup_sources" if dedup else "web_parse"
+        if quorum_drafts:
+            workflow.add_edge(parsed, "draft_all_news")
+            workflow.add_edge("draft_all_news", "combine_news")
+        else:
+            workflow.add_conditional_edges(parsed, assign_writer, ["draft_news"])
+            workflow.add_edge("draft_news", "combine_news")
+
+    # each branch persists its own fields, the article is flagged complete once both landed
+    workflow.add_edge("combine_news", "generate_news_image")
+    if process_images:
+        workflow.add_edge("generate_news_image", "process_news_image")
+        workflow.add_edge("process_news_image", "save_image_to_s3")
+    else:
+        workflow.add_edge("generate_news_image", "save_image_to_s3")
+    workflow.add_edge("save_image_to_s3", "save_news_image")
+    workflow.add_edge("save_news_image", END)
+    workflow.add_edge("combine_news", "generate_news_title")
+    workflow.add_edge("generate_news_title", "save_news_text")
+    workflow.add_edge("save_news_text", END)
+
+    return workflow
+
+
+chain = build_workflow().compile()
@@ -1,11 +1,166 @@
-#from ..config.setting import OPENAI_API_KEY,DEEPSEEK_API_KEY
-from config.setting import OPENAI_API_KEY,DEEPSEEK_API_KEY
-from langchain_deepseek import ChatDeepSeek
+#from ..config.setting import OPENAI_API_KEY,DEEPSEEK_API_KEY,METRICS_ENABLED
+from config.setting import OPENAI_API_KEY,DEEPSEEK_API_KEY,METRICS_ENABLED
+from utils.llm_cache import get_llm_cache, make_key
+from utils.metrics import record_tokens
+from utils.rate_limit import call, acall
+from utils.tokens import count_tokens
+from typing import TYPE_CHECKING, Callable, Optional
 from pydantic import BaseModel, Field
+import asyncio
+import threading
+
+if TYPE_CHECKING:
+    from langchain_deepseek import ChatDeepSeek
+
 class draft(BaseModel):
     draft: str = Field(None, description="Draft of the news article.")
 
-llm = ChatDeepSeek(model="deepseek-chat", api_key=DEEPSEEK_API_KEY)
-llm_reasoning = ChatDeepSeek(model="deepseek-reasoner", api_key=DEEPSEEK_API_KEY)
 
-writer_llm = llm.with_structured_output(draft)
\ No newline at end of file
+# The clients are built on first use: importing langchain_deepseek takes most
+# of a second, which short-lived processes that never call the LLM should not pay.
+_models = {}
+_models_lock = threading.RLock()
+
+def _model(name: str, build: Callable):
+    with _models_lock:
+        if name not in _models:
+            _models[name] = build()
+        return _models[name]
+
+def get_llm() -> "ChatDeepSeek":
+    """deepseek-chat client shared by every call in the process."""
+    def build():
+        from langchain_deepseek import ChatDeepSeek
+        # retries are done by utils.rate_limit, which also sees the 429s
+        return ChatDeepSeek(model="deepseek-chat", api_key=DEEPSEEK_API_KEY, max_retries=0)
+    return _model("llm", build)
+
+def get_reasoning_llm() -> "ChatDeepSeek":
+    """deepseek-reasoner client shared by every call in the process."""
+    def build():
+        from langchain_deepseek import ChatDeepSeek
+        return ChatDeepSeek(model="deepseek-reasoner", api_key=DEEPSEEK_API_KEY, max_retries=0)
+    return _model("llm_reasoning", build)
+
+def get_writer_llm():
+    """get_llm() with draft as structured output."""
+    return _model("writer_llm", lambda: get_llm().with_structured_output(draft))
+
+def _writer_with_usage():
+    # the raw message next to the parsed draft carries the token usage
+    return _model("writer_with_usage", lambda: get_llm().with_structured_output(draft, include_raw=True))
+
+def __getattr__(name: str):
+    # llm, llm_reasoning and writer_llm used to be built at import
+    getters = {"llm": get_llm, "llm_reasoning": get_reasoning_llm, "writer_llm": get_writer_llm}
+    if name in getters:
+        return getters[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# Cached invocation, see utils/llm_cache.py. Structured drafts are stored as
+# JSON and validated back into draft on a hit. Misses go through the
+# "deepseek" rate limiter, which retries transient errors.
+
+# completion tokens assumed per call when drawing from the token bucket
+COMPLETION_TOKENS_ESTIMATE = 1024
+
+def _estimate_tokens(prompt: str) -> int:
+    return count_tokens(prompt) + COMPLETION_TOKENS_ESTIMATE
+
+def _record_usage(call_site: str, message):
+    usage = getattr(message, "usage_metadata", None)
+    if usage:
+        record_tokens("deepseek", call_site, usage.get("input_tokens", 0), usage.get("output_tokens", 0))
+
+def _parsed_draft(call_site: str, result: dict) -> draft:
+    _record_usage(call_site, result["raw"])
+    if result.get("parsing_error") is not None:
+        raise result["parsing_error"]
+    return result["parsed"]
+
+def _cache_key(model: "ChatDeepSeek", prompt: str, schema: dict = None) -> str:
+    params = {"temperature": model.temperature, "max_tokens": model.max_tokens, "top_p": model.top_p}
+    if schema is not None:
+        params["structured_output"] = schema
+    return make_key(model.model_name, params, prompt)
+
+def _writer_key(prompt: str) -> str:
+    return _cache_key(get_llm(), prompt, draft.model_json_schema())
+
+def invoke_writer(prompt: str, call_site: str = "draft_news") -> draft:
+    """writer_llm.invoke behind the LLM response cache."""
+    cache = get_llm_cache()
+    key = _writer_key(prompt)
+    cached = cache.get(call_site, key) if cache is not None else None
+    if cached is not None:
+        return draft.model_validate_json(cached)
+    result = _parsed_draft(call_site, call("deepseek", _writer_with_usage().invoke, prompt,
+                                           tokens=_estimate_tokens(prompt)))
+    if cache is not None and result is not None:
+        cache.put(call_site, key, result.model_dump_json())
+    return result
+
+async def ainvoke_writer(prompt: str, call_site: str = "draft_news") -> draft:
+    """writer_llm.ainvoke behind the LLM response cache."""
+    cache = get_llm_cache()
+    key = _writer_key(prompt)
+    cached = await asyncio.to_thread(cache.get, call_site, key) if cache is not None else None
+    if cached is not None:
+        return draft.model_validate_json(cached)
+    result = _parsed_draft(call_site, await acall("deepseek", _writer_with_usage().ainvoke, prompt,
+                                                  tokens=_estimate_tokens(prompt)))
+    if cache is not None and result is not None:
+        await asyncio.to_thread(cache.put, call_site, key, result.model_dump_json())
+    return result
+
+def invoke_llm(prompt: str, call_site: str) -> str:
+    """llm.invoke behind the LLM response cache, returns the message content."""
+    cache = get_llm_cache()
+    key = _cache_key(get_llm(), prompt)
+    cached = cache.get(call_site, key) if cache is not None else None
+    if cached is not None:
+        return cached
+    message = call("deepseek", get_llm().invoke, prompt, tokens=_estimate_tokens(prompt))
+    _record_usage(call_site, message)
+    content = message.content
+    if cache is not None:
+        cache.put(call_site, key, content)
+    return content
+
+async def _astream(prompt: str, on_text: Callable[[str], None], call_site: str) -> str:
+    # a retried stream starts over, so on_text sees the text of the new attempt
+    chunks = []
+    # streamed responses only carry token usage in a final chunk when asked for
+    kwargs = {"stream_options": {"include_usage": True}} if METRICS_ENABLED else {}
+    async for chunk in get_llm().astream(prompt, **kwargs):
+        _record_usage(call_site, chunk)
+        if chunk.content:
+            chunks.append(chunk.content)
+            on_text("".join(chunks))
+    return "".join(chunks)
+
+async def ainvoke_llm(prompt: str, call_site: str, on_text: Optional[Callable[[str], None]] = None) -> str:
+    """
+    llm.ainvoke behind the LLM response cache, returns the message content.
+
+    With on_text the response is streamed and on_text is called with the
+    text generated so far after every chunk, so callers can start work that
+    only needs the beginning of the response.
+    """
+    cache = get_llm_cache()
+    key = _cache_key(get_llm(), prompt)
+    cached = await asyncio.to_thread(cache.get, call_site, key) if cache is not None else None
+    if cached is not None:
+        if on_text is not None:
+            on_text(cached)
+        return cached
+    if on_text is None:
+        message = await acall("deepseek", get_llm().ainvoke, prompt, tokens=_estimate_tokens(prompt))
+        _record_usage(call_site, message)
+        content = message.content
+    else:
+        content = await acall("deepseek", _astream, prompt, on_text, call_site, tokens=_estimate_tokens(prompt))
+    if cache is not None:
+        await asyncio.to_thread(cache.put, call_site, key, content)
+    return content
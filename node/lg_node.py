@@ -1,88 +1,264 @@
-# from ..utils.web_search import search
-# from ..utils.web_parse import fetch_and_extract
-# from ..utils.pic_generator import generate_news_image, generate_title
+# from ..utils.web_search import search_topic, asearch_topic
+# from ..utils.web_parse import fetch_and_extract, iter_fetch_and_extract
+# from ..utils.http_client import close_fetch_client
+# from ..utils.dedup import dedup_texts, NearDuplicateIndex
+# from ..utils.tokens import pack_by_tokens
+# from ..utils.passage_rank import trim_to_budget
+# from ..utils.fanout import Fanout, DRAFT_POLICY
+# from ..utils.pic_generator import generate_news_image, generate_title, agenerate_news_image, agenerate_title, prefetch, discard_prefetches
+# from ..utils.image_processing import process_image, aprocess_image, download_image, sniff_image_type
 # from ..utils.s3_api import S3Handler
 # from ..utils.dynamodb_api import DynamoDBHandler
+# from ..utils.seen_urls import get_seen_urls
 # from .lg_state import State, WriterState
-# from .lg_llm import writer_llm,llm
-from utils.web_search import search
-from utils.web_parse import fetch_and_extract
-from utils.pic_generator import generate_news_image, generate_title
+# from .lg_llm import invoke_writer, ainvoke_writer, invoke_llm, ainvoke_llm
+from utils.web_search import search_topic, asearch_topic
+from utils.web_parse import fetch_and_extract, iter_fetch_and_extract
+from utils.http_client import close_fetch_client
+from utils.dedup import dedup_texts, NearDuplicateIndex
+from utils.tokens import pack_by_tokens
+from utils.passage_rank import trim_to_budget
+from utils.fanout import Fanout, DRAFT_POLICY
+from utils.pic_generator import generate_news_image, generate_title, agenerate_news_image, agenerate_title, prefetch, discard_prefetches
+from utils.image_processing import process_image, aprocess_image, download_image, sniff_image_type
 from utils.s3_api import S3Handler
 from utils.dynamodb_api import DynamoDBHandler
+from utils.seen_urls import get_seen_urls
 from .lg_state import State, WriterState
-from .lg_llm import writer_llm,llm
+from .lg_llm import invoke_writer, ainvoke_writer, invoke_llm, ainvoke_llm
 from langgraph.constants import Send
 from datetime import datetime, timezone, timedelta
+from urllib.parse import urlsplit
+from typing import Dict, List, Optional, Tuple
 
 import asyncio
-import nest_asyncio
+import logging
+import posixpath
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 
-from config.topic import TOPICS
+from config.topic import TOPICS, get_topic
+from config.setting import DEDUP_ENABLED, DEDUP_THRESHOLD, COMBINE_TOKEN_BUDGET, COMBINE_MAX_DEPTH
+from config.setting import TRIM_ENABLED, TRIM_TOKEN_BUDGET
+from config.setting import IMAGE_RESPONSE_FORMAT
+from config.setting import INCREMENTAL_LOOKBACK_DAYS, INCREMENTAL_MIN_NEW_SOURCES
+
+logger = logging.getLogger(__name__)
 
 tz = timezone(timedelta(hours=8))
-today_date = datetime.now(tz).date().isoformat()
+
+def current_date() -> str:
+    """
+    Today's article date in the news timezone.
+
+    Computed per run rather than once at import, so a long-lived worker
+    dates each article by the day its run started.
+    """
+    return datetime.now(tz).date().isoformat()
+
+def _run_id(state: State) -> str:
+    return state.get("run_id") or uuid.uuid4().hex
+
+def _run_date(state: State) -> str:
+    # fixed when the run starts, so a run resumed from a checkpoint after midnight keeps its date
+    return state.get("run_date") or current_date()
 
 def web_search(state: State):
     """Search the web for the topic."""
-    try:
-        results = search("news about " + state["topic"])
-    except Exception as e:
-        raise e
+    results = search_topic(state["topic"])
 
-    return {"websites_links": [result.link for result in results]}
+    return {"websites_links": [result.link for result in results], "run_id": _run_id(state),
+            "run_date": _run_date(state)}
 
 
-def web_parse(state: State):
-    """Parse the web content."""
-    nest_asyncio.apply()
-    
+# Incremental runs, see build_workflow(incremental=True): check_published ends the
+# run before searching when the article of the day is already complete, and
+# filter_sources drops the search results used by earlier articles of the topic.
+
+def _published(article: Optional[dict]) -> bool:
+    if not article:
+        return False
+    # save_article writes the whole article at once and has no parts
+    return bool(article.get("complete")) or ("parts" not in article and bool(article.get("content")))
+
+def _published_update(state: State, date: str, article: Optional[dict]) -> dict:
+    update = {"run_id": _run_id(state), "run_date": date}
+    if _published(article):
+        logger.info(f"Article {state['topic']}/{date} is already published, skipping the topic")
+        update["skipped"] = "published"
+    return update
+
+def check_published(state: State):
+    """Skip the topic when its article of the run date is already complete."""
+    date = _run_date(state)
+    return _published_update(state, date, DynamoDBHandler().get_article(state["topic"], date))
+
+def _lookback_keys(topic: str, date: str) -> List[Tuple[str, str]]:
+    day = datetime.fromisoformat(date).date()
+    return [(topic, (day - timedelta(days=i)).isoformat()) for i in range(1, INCREMENTAL_LOOKBACK_DAYS + 1)]
+
+def _stored_links(web_links) -> List[str]:
+    # save_news_text stores the links newline separated, save_article as a list
+    if isinstance(web_links, str):
+        return [link for link in web_links.split("\n") if link]
+    return list(web_links or [])
+
+def _new_sources_update(state: State, articles: Dict[Tuple[str, str], dict]) -> dict:
+    topic = state["topic"]
+    index = get_seen_urls()
+    # the index also covers articles written by other processes or before it existed
+    for (_, date), article in articles.items():
+        if _published(article):
+            index.add(topic, _stored_links(article.get("web_links")), date)
+    links = state["websites_links"]
+    seen = index.seen(topic, links)
+    new_links = [link for link in links if link not in seen]
+    logger.info(f"{topic}: {len(new_links)} new sources, {len(seen)} already used by earlier articles")
+    update = {"websites_links": new_links, "sources_seen": len(seen)}
+    if len(new_links) < INCREMENTAL_MIN_NEW_SOURCES:
+        logger.info(f"{topic}: fewer than {INCREMENTAL_MIN_NEW_SOURCES} new sources, not writing a new article")
+        update["skipped"] = "no_new_sources"
+    return update
+
+def filter_sources(state: State):
+    """Drop the search results that an earlier article of the topic already used."""
+    articles = DynamoDBHandler().get_articles(_lookback_keys(state["topic"], _run_date(state)))
+    return _new_sources_update(state, articles)
+
+def _used_links(state: State) -> List[str]:
+    """Links whose content reached the writer, without failed fetches and dropped duplicates."""
+    contents = state.get("websites_content") or []
+    return [link for link, content in zip(state["websites_links"], contents) if content is not None]
+
+def _record_sources(state: State, item: Optional[dict]):
+    # only runs that went through filter_sources keep the index up to date
+    if item is not None and state.get("sources_seen") is not None:
+        get_seen_urls().add(state["topic"], _used_links(state), _run_date(state))
+
+
+async def _close_fetch_client_after(coro):
+    # the sync path runs on a throwaway loop, so close that loop's session before it goes away
     try:
-        contents = asyncio.run(fetch_and_extract(state["websites_links"]))
+        return await coro
+    finally:
+        await close_fetch_client()
+
+def _run_sync(coro_fn, *args):
+    """Run an async helper from a sync node on its own event loop."""
+    try:
+        asyncio.get_running_loop()
     except RuntimeError:
-        loop = asyncio.get_event_loop()
-        contents = loop.run_until_complete(fetch_and_extract(state["websites_links"]))
+        return asyncio.run(_close_fetch_client_after(coro_fn(*args)))
+    # called from a thread that already runs a loop (e.g. a notebook), so the
+    # helper gets its own loop on another thread instead of nesting loops
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, _close_fetch_client_after(coro_fn(*args))).result()
+
+def web_parse(state: State):
+    """Parse the web content."""
+    contents = _run_sync(fetch_and_extract, state["websites_links"])
 
     #print(contents)
     return {"websites_content": contents}
 
-def draft_news(state: WriterState):
-    """Draft the news."""
+def dedup_sources(state: State):
+    """Drop near-duplicate pages so each story is drafted only once."""
+    contents, clusters = dedup_texts(state["websites_content"], DEDUP_THRESHOLD)
+    return {"websites_content": contents,
+            "duplicates_dropped": sum(len(members) for members in clusters.values())}
+
+def _trim(topic: str, website_content: str, website_link: str = None):
+    """Keep the passages most relevant to the topic within TRIM_TOKEN_BUDGET tokens."""
+    if not TRIM_ENABLED:
+        return website_content, None
+    topic_config = get_topic(topic)
+    query_terms = [topic_config["name"], *topic_config.get("keywords", [])] if topic_config else [topic]
+    trimmed, trim_stats = trim_to_budget(website_content, query_terms, TRIM_TOKEN_BUDGET)
+    return trimmed, {"url": website_link, **trim_stats}
+
+def _draft(topic: str, website_content: str):
+    # transient errors were already retried by the "deepseek" limiter, drop this source
     try:
-        draft = writer_llm.invoke(f"Draft a news article about {state['topic']} based on the following content: {state['website_content']}")
-        return {"websites_draft": [draft.draft]}
+        draft = invoke_writer(f"Draft a news article about {topic} based on the following content: {website_content}")
+        return draft.draft
     except Exception as e:
-        return {"websites_draft": [None]}
+        logger.error(f"Failed to draft a source for {topic}, skipping it: {type(e).__name__}: {str(e)}")
+        return None
+
+def draft_news(state: WriterState):
+    """Draft the news."""
+    content, trim_stats = _trim(state["topic"], state["website_content"], state.get("website_link"))
+    return {"websites_draft": [_draft(state["topic"], content)],
+            "trim_stats": [trim_stats] if trim_stats else []}
     
 
+def _combine_prompt(drafts):
+    website_draft = "\n".join(drafts)
+    return f"Combine the following news articles into a single news article: {website_draft}"
+
+def _combine_tree(drafts):
+    """Combine budget-sized groups of drafts in parallel, level by level, until one group is left."""
+    level = drafts
+    for depth in range(COMBINE_MAX_DEPTH):
+        groups = pack_by_tokens(level, COMBINE_TOKEN_BUDGET)
+        if len(groups) <= 1:
+            break
+        logger.info(f"combine level {depth}: {len(level)} drafts in {len(groups)} groups")
+        with ThreadPoolExecutor(max_workers=len(groups)) as executor:
+            level = list(executor.map(lambda group: invoke_llm(_combine_prompt(group), "combine_news_partial"), groups))
+    else:
+        logger.warning(f"combine did not fit the token budget after {COMBINE_MAX_DEPTH} levels")
+    return invoke_llm(_combine_prompt(level), "combine_news")
+
 def combine_news(state: State):
     """Combine the news."""
+    websites_draft = [s for s in state["websites_draft"] if s is not None]
+    combined_draft = _combine_tree(websites_draft)
 
-    # Format completed section to str to use as context for final sections
-    #print("debug:" ,"inside combine_news")
-    state["websites_draft"] = [s for s in state["websites_draft"] if s is not None]
-    website_draft = "\n".join(state["websites_draft"])[:10000]
-    #:" ,website_draft)
-    combined_draft = llm.invoke(f"Combine the following news articles into a single news article: {website_draft}")
-
-    return {"combined_draft": combined_draft.content}
+    return {"combined_draft": combined_draft}
 
 def assign_writer(state: State):
     """Assign a worker to each section in the plan"""
     # Kick off section writing in parallel via Send() API
-    return [Send("draft_news", {"website_content": wc, "topic": state["topic"]}) for wc in state["websites_content"] if wc != None]
+    return [Send("draft_news", {"website_content": wc, "website_link": link, "topic": state["topic"]})
+            for link, wc in zip(state["websites_links"], state["websites_content"]) if wc != None]
+
+def _image_update(image):
+    # b64_json returns the image itself, url a temporary link to download
+    if isinstance(image, bytes):
+        return {"news_image_bytes": image}
+    return {"news_image": image}
 
 def generate_news_image_node(state: State):
     """Generate a news image."""
-    image_url = generate_news_image(state["combined_draft"])
-    return {"news_image": image_url}
+    image = generate_news_image(state["combined_draft"], IMAGE_RESPONSE_FORMAT)
+    return _image_update(image)
+
+def process_news_image(state: State):
+    """Re-encode the generated image and render its thumbnails in the image worker pool."""
+    image_bytes = state.get("news_image_bytes") or download_image(state.get("news_image"))
+    return {"image_variants": process_image(image_bytes)}
+
+def _image_key_prefix(state: State) -> str:
+    return f"images/{state['topic']}/{_run_date(state)}"
+
+def _url_image_key(state: State) -> str:
+    # the extension of the generated image's URL, the content type comes from the download
+    extension = posixpath.splitext(urlsplit(state.get("news_image") or "").path)[1].lower()
+    return _image_key_prefix(state) + (extension if extension in (".png", ".jpg", ".jpeg", ".webp") else ".jpg")
 
 def save_image_to_s3(state: State):
     """Save the news to S3."""
-    s3_key = f"images/{state['topic']}/{today_date}.jpg"
     s3_handler = S3Handler()
-    s3_url = s3_handler.upload_image(state["news_image"], s3_key,today_date)
-    print("test1",s3_url)
+    if state.get("image_variants"):
+        urls = s3_handler.upload_variants(state["image_variants"], _image_key_prefix(state))
+        return {"s3_image_url": urls.get("full"), "s3_image_variants": urls}
+    if state.get("news_image_bytes"):
+        extension, content_type = sniff_image_type(state["news_image_bytes"])
+        s3_url = s3_handler.upload_image_bytes(state["news_image_bytes"], f"{_image_key_prefix(state)}.{extension}",
+                                               content_type=content_type)
+    else:
+        s3_url = s3_handler.upload_image(state.get("news_image"), _url_image_key(state), _run_date(state))
     return {"s3_image_url": s3_url}
 
 
@@ -91,26 +267,222 @@ def generate_news_title(state: State):
     title = generate_title(state["combined_draft"])
     return {"news_title": title}
 
-def save_news_to_dynamodb(state: State):
-    db_handler = DynamoDBHandler()
-    import time
-    time.sleep(5)
-    
-    # 使用get方法提供默认值
-    s3_image_url = state.get('s3_image_url')
-    topic_name = [i["name"]  for i in TOPICS if i["id"] == state["topic"] ]
-    #print("debug: s3_image_url =", s3_image_url)
-    
-    save_success = db_handler.save_article(
-        topic_id=state["topic"],
-        topic_name=topic_name,
-        date=today_date,
-        title=state["news_title"],
-        content=state['combined_draft'],
-        web_links="\n".join(state['websites_links']),
-        image_url=s3_image_url  
+def _text_fields(state: State) -> dict:
+    return {
+        "topic_id": state["topic"],
+        "topic_name": [i["name"] for i in TOPICS if i["id"] == state["topic"]],
+        "date": _run_date(state),
+        "title": state["news_title"],
+        "content": state["combined_draft"],
+        "web_links": "\n".join(_used_links(state)),
+        "run_id": state["run_id"],
+    }
+
+def save_news_text(state: State):
+    """Save the title and content as soon as they are ready, without waiting for the image."""
+    item = DynamoDBHandler().save_article_text(**_text_fields(state))
+    _record_sources(state, item)
+    return {"save_success": item is not None, "article_complete": bool(item and item.get("complete"))}
+
+def save_news_image(state: State):
+    """Save the image url of the article."""
+    item = DynamoDBHandler().save_article_image(
+        topic_id=state["topic"], date=_run_date(state), image_url=state.get("s3_image_url"), run_id=state["run_id"],
+        image_variants=state.get("s3_image_variants")
     )
-    return {"save_success": save_success}
+    return {"image_saved": item is not None, "article_complete": bool(item and item.get("complete"))}
+
+
+# Async versions of the nodes, used when the graph runs with chain.ainvoke / astream.
+# They share the caller's event loop instead of blocking a worker thread per call.
+
+async def aweb_search(state: State):
+    """Search the web for the topic."""
+    results = await asearch_topic(state["topic"])
+
+    return {"websites_links": [result.link for result in results], "run_id": _run_id(state),
+            "run_date": _run_date(state)}
+
+
+async def acheck_published(state: State):
+    """Skip the topic when its article of the run date is already complete."""
+    date = _run_date(state)
+    return _published_update(state, date, await DynamoDBHandler().aget_article(state["topic"], date))
+
+
+async def afilter_sources(state: State):
+    """Drop the search results that an earlier article of the topic already used."""
+    articles = await DynamoDBHandler().aget_articles(_lookback_keys(state["topic"], _run_date(state)))
+    # the seen-URL index is sqlite, keep its reads and writes off the loop
+    return await asyncio.to_thread(_new_sources_update, state, articles)
+
+
+async def aweb_parse(state: State):
+    """Parse the web content."""
+    contents = await fetch_and_extract(state["websites_links"])
+
+    return {"websites_content": contents}
+
+async def _adraft(topic: str, website_content: str):
+    # transient errors were already retried by the "deepseek" limiter, drop this source
+    try:
+        draft = await ainvoke_writer(f"Draft a news article about {topic} based on the following content: {website_content}")
+        return draft.draft
+    except Exception as e:
+        logger.error(f"Failed to draft a source for {topic}, skipping it: {type(e).__name__}: {str(e)}")
+        return None
+
+async def adraft_news(state: WriterState):
+    """Draft the news."""
+    content, trim_stats = _trim(state["topic"], state["website_content"], state.get("website_link"))
+    return {"websites_draft": [await _adraft(state["topic"], content)],
+            "trim_stats": [trim_stats] if trim_stats else []}
+
+
+async def _draft_all(state: State, adraft_fn):
+    drafts = Fanout(DRAFT_POLICY, "draft")
+    all_trim_stats = []
+    for link, website_content in zip(state["websites_links"], state["websites_content"]):
+        if website_content is None:
+            continue
+        content, trim_stats = _trim(state["topic"], website_content, link)
+        if trim_stats:
+            all_trim_stats.append(trim_stats)
+        drafts.submit(lambda content=content: adraft_fn(state["topic"], content))
+
+    return {"websites_draft": await drafts.wait(), "trim_stats": all_trim_stats}
+
+async def adraft_all_news(state: State):
+    """Draft every page in one node, proceeding once the DRAFT_* quorum or deadline is met."""
+    return await _draft_all(state, _adraft)
+
+def draft_all_news(state: State):
+    """Draft every page in one node, proceeding once the DRAFT_* quorum or deadline is met."""
+    return _run_sync(_draft_all, state, _draft_in_thread)
+
+
+async def _stream_draft(state: State, adraft_fn):
+    urls = state["websites_links"]
+    contents = [None] * len(urls)
+    drafts = Fanout(DRAFT_POLICY, "draft")
+    # pages arrive one by one, so the first copy of a story is the one drafted
+    duplicate_index = NearDuplicateIndex(DEDUP_THRESHOLD) if DEDUP_ENABLED else None
+    duplicates_dropped = 0
+    all_trim_stats = []
+
+    # one slow publisher no longer holds back the drafts of the others
+    async for index, url, content in iter_fetch_and_extract(urls):
+        if content is None:
+            continue
+        if duplicate_index is not None and duplicate_index.add(index, content) is not None:
+            duplicates_dropped += 1
+            continue
+        contents[index] = content
+        content, trim_stats = _trim(state["topic"], content, url)
+        if trim_stats:
+            all_trim_stats.append(trim_stats)
+        drafts.submit(lambda content=content: adraft_fn(state["topic"], content))
 
+    return {"websites_content": contents, "websites_draft": await drafts.wait(),
+            "duplicates_dropped": duplicates_dropped, "trim_stats": all_trim_stats}
 
+async def astream_draft_news(state: State):
+    """Parse the web content and draft each page as soon as it is extracted."""
+    return await _stream_draft(state, _adraft)
 
+async def _draft_in_thread(topic: str, website_content: str):
+    return await asyncio.to_thread(_draft, topic, website_content)
+
+def stream_draft_news(state: State):
+    """Parse the web content and draft each page as soon as it is extracted."""
+    # the LLM clients keep their async connections on the graph's loop, so the
+    # sync path drafts in threads instead of on its throwaway loop
+    return _run_sync(_stream_draft, state, _draft_in_thread)
+
+
+async def _acombine_tree(drafts):
+    """Async version of _combine_tree, the groups of a level are combined concurrently."""
+    level = drafts
+    for depth in range(COMBINE_MAX_DEPTH):
+        groups = pack_by_tokens(level, COMBINE_TOKEN_BUDGET)
+        if len(groups) <= 1:
+            break
+        logger.info(f"combine level {depth}: {len(level)} drafts in {len(groups)} groups")
+        level = list(await asyncio.gather(
+            *[ainvoke_llm(_combine_prompt(group), "combine_news_partial") for group in groups]))
+    else:
+        logger.warning(f"combine did not fit the token budget after {COMBINE_MAX_DEPTH} levels")
+    # the image description and title only read the start of the article,
+    # so they start while the rest of it is still streaming
+    started = []
+    streamed = ""
+
+    def on_text(partial_text):
+        nonlocal streamed
+        if not partial_text.startswith(streamed):
+            # the rate limiter retried the stream, the failed attempt's prefixes are stale
+            discard_prefetches(started)
+            started.clear()
+        streamed = partial_text
+        started.extend(prefetch(partial_text))
+
+    try:
+        combined = await ainvoke_llm(_combine_prompt(level), "combine_news", on_text=on_text)
+    except BaseException:
+        discard_prefetches(started)
+        raise
+    final_keys = prefetch(combined, final=True)
+    discard_prefetches([key for key in started if key not in final_keys])
+    return combined
+
+async def acombine_news(state: State):
+    """Combine the news."""
+    websites_draft = [s for s in state["websites_draft"] if s is not None]
+    combined_draft = await _acombine_tree(websites_draft)
+
+    return {"combined_draft": combined_draft}
+
+async def agenerate_news_image_node(state: State):
+    """Generate a news image."""
+    image = await agenerate_news_image(state["combined_draft"], IMAGE_RESPONSE_FORMAT)
+    return _image_update(image)
+
+async def aprocess_news_image(state: State):
+    """Re-encode the generated image and render its thumbnails in the image worker pool."""
+    image_bytes = state.get("news_image_bytes") or await asyncio.to_thread(download_image, state.get("news_image"))
+    return {"image_variants": await aprocess_image(image_bytes)}
+
+async def asave_image_to_s3(state: State):
+    """Save the news to S3."""
+    s3_handler = S3Handler()
+    if state.get("image_variants"):
+        urls = await s3_handler.aupload_variants(state["image_variants"], _image_key_prefix(state))
+        return {"s3_image_url": urls.get("full"), "s3_image_variants": urls}
+    if state.get("news_image_bytes"):
+        extension, content_type = sniff_image_type(state["news_image_bytes"])
+        s3_url = await s3_handler.aupload_image_bytes(state["news_image_bytes"],
+                                                      f"{_image_key_prefix(state)}.{extension}",
+                                                      content_type=content_type)
+    else:
+        s3_url = await s3_handler.aupload_image(state.get("news_image"), _url_image_key(state), _run_date(state))
+    return {"s3_image_url": s3_url}
+
+
+async def agenerate_news_title(state: State):
+    """Generate a news title."""
+    title = await agenerate_title(state["combined_draft"])
+    return {"news_title": title}
+
+async def asave_news_text(state: State):
+    """Save the title and content as soon as they are ready, without waiting for the image."""
+    item = await DynamoDBHandler().asave_article_text(**_text_fields(state))
+    await asyncio.to_thread(_record_sources, state, item)
+    return {"save_success": item is not None, "article_complete": bool(item and item.get("complete"))}
+
+async def asave_news_image(state: State):
+    """Save the image url of the article."""
+    item = await DynamoDBHandler().asave_article_image(
+        topic_id=state["topic"], date=_run_date(state), image_url=state.get("s3_image_url"), run_id=state["run_id"],
+        image_variants=state.get("s3_image_variants")
+    )
+    return {"image_saved": item is not None, "article_complete": bool(item and item.get("complete"))}
@@ -0,0 +1,212 @@
+# from ..config.setting import TOPIC_MAX_CONCURRENCY, CHECKPOINT_ENABLED, METRICS_REPORT_DIR, METRICS_TEXTFILE, configure_logging
+# from ..config.topic import TOPICS
+# from .lg_graph import chain
+# from .lg_checkpoint import open_async_checkpointer, aclear_thread, thread_config
+# from .lg_node import current_date
+# from ..utils.http_client import close_fetch_client
+# from ..utils.pic_generator import close_async_client
+# from ..utils.metrics import run_report, mark_submitted, write_prometheus
+from config.setting import TOPIC_MAX_CONCURRENCY, CHECKPOINT_ENABLED, METRICS_REPORT_DIR, METRICS_TEXTFILE, configure_logging
+from config.topic import TOPICS
+from .lg_graph import chain
+from .lg_checkpoint import open_async_checkpointer, aclear_thread, thread_config
+from .lg_node import current_date
+from utils.http_client import close_fetch_client
+from utils.pic_generator import close_async_client
+from utils.metrics import run_report, mark_submitted, write_prometheus
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+import argparse
+import asyncio
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class BatchRunResult:
+    # final graph state of every topic that finished
+    results: Dict[str, dict] = field(default_factory=dict)
+    # exception raised by every topic that failed
+    failures: Dict[str, BaseException] = field(default_factory=dict)
+    # wall clock time of the whole batch in seconds
+    elapsed: float = 0.0
+    # per-topic and per-provider latency, tokens and bytes, see utils.metrics.RunReport
+    report: dict = field(default_factory=dict)
+
+
+def _publish_report(report) -> dict:
+    """Write the run report and the Prometheus textfile where configured, returns the report."""
+    summary = report.to_dict()
+    if METRICS_REPORT_DIR:
+        path = os.path.join(METRICS_REPORT_DIR, f"{report.name}.json")
+        report.write(path)
+        logger.info(f"Run report written to {path}")
+    if METRICS_TEXTFILE:
+        write_prometheus(METRICS_TEXTFILE)
+    return summary
+
+
+async def _astart_or_resume(graph, saver, topic_id: str, date: str, config: dict) -> Optional[dict]:
+    """Graph input of a topic: None resumes an unfinished checkpoint, otherwise a fresh run."""
+    snapshot = await graph.aget_state(config)
+    if snapshot.next:
+        logger.info(f"Resuming topic {topic_id} from its checkpoint before {', '.join(snapshot.next)}")
+        return None
+    if snapshot.values:
+        # the topic already finished today, a new run starts from START on a clean thread
+        await aclear_thread(saver, config["configurable"]["thread_id"])
+    return {"topic": topic_id, "run_date": date}
+
+
+async def _abatch(topic_ids: List[str], max_concurrency: int, checkpoint: bool) -> list:
+    """Graph outputs of the topics in order, the exception for a topic that failed."""
+    # return_exceptions keeps one failing topic from cancelling the others
+    for topic_id in topic_ids:
+        mark_submitted(topic_id)
+    if checkpoint:
+        date = current_date()
+        async with open_async_checkpointer() as saver:
+            graph = chain.builder.compile(checkpointer=saver)
+            configs = [thread_config(topic_id, date, max_concurrency=max_concurrency) for topic_id in topic_ids]
+            inputs = [await _astart_or_resume(graph, saver, topic_id, date, config)
+                      for topic_id, config in zip(topic_ids, configs)]
+            return await graph.abatch(inputs, config=configs, return_exceptions=True)
+    return await chain.abatch(
+        [{"topic": topic_id} for topic_id in topic_ids],
+        config={"max_concurrency": max_concurrency},
+        return_exceptions=True,
+    )
+
+
+async def arun_topics(topic_ids: Optional[List[str]] = None,
+                      max_concurrency: int = TOPIC_MAX_CONCURRENCY,
+                      checkpoint: bool = CHECKPOINT_ENABLED) -> BatchRunResult:
+    """
+    Run the workflow for several topics concurrently.
+
+    With checkpoint the state is saved after every node under the thread
+    (topic, date), and a topic whose run failed earlier today continues from
+    its last successful node instead of searching and drafting again.
+
+    Args:
+        topic_ids: topic ids to run, defaults to every topic in config.topic.TOPICS
+        max_concurrency: maximum number of graph tasks running at the same time
+        checkpoint: save and resume runs with the checkpointer of node/lg_checkpoint.py
+
+    Returns:
+        BatchRunResult with per-topic results and failures
+    """
+    if topic_ids is None:
+        topic_ids = [topic["id"] for topic in TOPICS]
+    # keep order but run each topic only once
+    topic_ids = list(dict.fromkeys(topic_ids))
+
+    batch_result = BatchRunResult()
+    if not topic_ids:
+        logger.warning("No topics provided for batch run")
+        return batch_result
+
+    logger.info(f"Starting batch run for {len(topic_ids)} topics with max_concurrency={max_concurrency}")
+    start = time.perf_counter()
+
+    report_name = time.strftime("run-%Y%m%dT%H%M%S")
+    try:
+        with run_report(report_name) as report:
+            outputs = await _abatch(topic_ids, max_concurrency, checkpoint)
+    finally:
+        await close_fetch_client()
+        await close_async_client()
+
+    for topic_id, output in zip(topic_ids, outputs):
+        if isinstance(output, BaseException):
+            logger.error(f"Topic {topic_id} failed: {str(output)}")
+            batch_result.failures[topic_id] = output
+        else:
+            batch_result.results[topic_id] = output
+
+    batch_result.elapsed = time.perf_counter() - start
+    batch_result.report = _publish_report(report)
+    # incremental runs end early without a new article, see build_workflow(incremental=True)
+    skipped = sum(1 for output in batch_result.results.values() if output.get("skipped"))
+    logger.info(f"Completed batch run in {batch_result.elapsed:.1f}s: "
+                f"{len(batch_result.results)} successful ({skipped} skipped), {len(batch_result.failures)} failed")
+    return batch_result
+
+
+def run_topics(topic_ids: Optional[List[str]] = None,
+               max_concurrency: int = TOPIC_MAX_CONCURRENCY,
+               checkpoint: bool = CHECKPOINT_ENABLED) -> BatchRunResult:
+    """
+    Blocking wrapper around arun_topics for scripts and notebooks.
+
+    Called from a thread that already runs an event loop, e.g. a Jupyter cell,
+    the batch runs on its own loop in a worker thread and the calling loop is
+    blocked until it finishes; use `await arun_topics(...)` there to keep it free.
+    """
+    batch = arun_topics(topic_ids, max_concurrency=max_concurrency, checkpoint=checkpoint)
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(batch)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, batch).result()
+
+
+async def aresume_topic(topic_id: str, date: Optional[str] = None) -> Optional[dict]:
+    """
+    Continue an unfinished run of a topic from its last checkpoint.
+
+    Nodes that already succeeded are not run again, so a failed save does not
+    repeat the search, drafts, combine, image and title.
+
+    Args:
+        topic_id: topic of the run
+        date: date of the run (YYYY-MM-DD), defaults to today
+
+    Returns:
+        final graph state, None if the topic has no unfinished run on that date
+    """
+    config = thread_config(topic_id, date)
+    try:
+        async with open_async_checkpointer() as saver:
+            graph = chain.builder.compile(checkpointer=saver)
+            snapshot = await graph.aget_state(config)
+            if not snapshot.next:
+                logger.warning(f"No unfinished run of topic {topic_id} to resume "
+                               f"({config['configurable']['thread_id']})")
+                return None
+            logger.info(f"Resuming topic {topic_id} before {', '.join(snapshot.next)}")
+            return await graph.ainvoke(None, config)
+    finally:
+        await close_fetch_client()
+        await close_async_client()
+
+
+def resume_topic(topic_id: str, date: Optional[str] = None) -> Optional[dict]:
+    """
+    Blocking wrapper around aresume_topic.
+    """
+    return asyncio.run(aresume_topic(topic_id, date))
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command line entry point: python -m node.lg_runner [topic ...]"""
+    parser = argparse.ArgumentParser(description="Run the news workflow for several topics.")
+    parser.add_argument("topics", nargs="*", help="topic ids, defaults to every topic in config.topic.TOPICS")
+    parser.add_argument("--max-concurrency", type=int, default=TOPIC_MAX_CONCURRENCY,
+                        help="maximum number of graph tasks running at the same time")
+    parser.add_argument("--no-checkpoint", action="store_true", help="neither save nor resume checkpoints")
+    args = parser.parse_args(argv)
+
+    configure_logging()
+    batch_result = run_topics(args.topics or None, max_concurrency=args.max_concurrency,
+                              checkpoint=not args.no_checkpoint)
+    return 1 if batch_result.failures else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
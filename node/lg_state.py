@@ -1,28 +1,52 @@
-from typing import TypedDict, Annotated, List
+from typing import TypedDict, Annotated, Dict, List
 import operator
 from .lg_llm import draft
 
 class State(TypedDict):
     # get topic from user input
     topic: str
+    # id of this run, shared by the partial dynamodb writes of both branches
+    run_id: str
+    # article date of this run, also the date of its checkpoint thread
+    run_date: str
     # search news about specific topic
     websites_links: List[str]
+    # search results dropped because an earlier article of the topic used them (incremental runs)
+    sources_seen: int
+    # why an incremental run ended early: "published" or "no_new_sources"
+    skipped: str
     # parse the content of the websites
     websites_content: List[str]
+    # number of near-duplicate pages not sent to the writer
+    duplicates_dropped: int
     # draft the news for each website if successly parse
     websites_draft: Annotated[List[draft], operator.add]
+    # token counts of each source before and after relevance trimming
+    trim_stats: Annotated[List[dict], operator.add]
     # combined draft
     combined_draft: str
     # image url
     news_image: str
+    # image data when the generator returns it inline (IMAGE_RESPONSE_FORMAT=b64_json)
+    news_image_bytes: bytes
+    # re-encoded image and its thumbnails (utils.image_processing.ImageVariant)
+    image_variants: list
     # s3 image url
     s3_image_url: str
+    # s3 url of every image variant by name ("full", "w256", ...)
+    s3_image_variants: Dict[str, str]
     # news title
     news_title: str
-    # save news to dynamodb
+    # title and content saved to dynamodb
     save_success: bool
+    # image url saved to dynamodb
+    image_saved: bool
+    # both parts of the article landed, set by whichever branch finishes last
+    article_complete: Annotated[bool, operator.or_]
     
 class WriterState(TypedDict):
     topic: str
     website_content: str
-    websites_draft: Annotated[List[draft], operator.add]
\ No newline at end of file
+    website_link: str
+    websites_draft: Annotated[List[draft], operator.add]
+    trim_stats: Annotated[List[dict], operator.add]
\ No newline at end of file
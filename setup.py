@@ -7,7 +7,7 @@ with open('requirements.txt') as f:
 setup(
     name="news_agent",
     version="0.1",
-    packages=find_packages(),
+    packages=find_packages(exclude=["bench", "bench.*"]),
     install_requires=requirements,
     description="An automated news generation system using AI",
     author="de ren",
@@ -0,0 +1,60 @@
+import asyncio
+import time
+
+import aiosqlite
+import pytest
+from langgraph.checkpoint.base import empty_checkpoint
+
+from node.lg_checkpoint import AsyncCheckpointSaver, BlobStore, CheckpointSerializer
+
+
+def _used_at(blobs: BlobStore, digest: str) -> float:
+    return blobs._conn.execute("SELECT used_at FROM checkpoint_blobs WHERE digest = ?", (digest,)).fetchone()[0]
+
+
+def test_known_blob_refreshes_used_at(tmp_path):
+    blobs = BlobStore(str(tmp_path / "blobs.db"))
+    digest = blobs.put(b"x" * 100)
+    first = _used_at(blobs, digest)
+    time.sleep(0.01)
+
+    assert blobs.put(b"x" * 100) == digest
+    assert _used_at(blobs, digest) > first
+
+
+def test_unknown_checkpoint_format_fails(tmp_path):
+    serde = CheckpointSerializer(BlobStore(str(tmp_path / "blobs.db")), min_bytes=10)
+    checkpoint = {"v": 2, "channel_values": {"content": "x" * 100}, "pending_sends": []}
+
+    with pytest.raises(RuntimeError):
+        serde.dumps_typed(checkpoint)
+
+
+def test_checkpoint_values_round_trip(tmp_path):
+    serde = CheckpointSerializer(BlobStore(str(tmp_path / "blobs.db")), min_bytes=10)
+    checkpoint = {"v": 1, "channel_values": {"content": "x" * 100, "topic": "AI"}, "pending_sends": []}
+
+    assert serde.loads_typed(serde.dumps_typed(checkpoint)) == checkpoint
+
+
+def test_async_saver_round_trip(tmp_path):
+    blobs = BlobStore(str(tmp_path / "blobs.db"))
+    image = b"\x89PNG" + bytes(range(256)) * 64
+    checkpoint = empty_checkpoint()
+    checkpoint["channel_values"] = {"news_image_bytes": image, "topic": "AI"}
+
+    async def scenario():
+        async with aiosqlite.connect(str(tmp_path / "checkpoints.db")) as conn:
+            saver = AsyncCheckpointSaver(conn, CheckpointSerializer(blobs, min_bytes=1024))
+            config = await saver.aput({"configurable": {"thread_id": "AI:2026-10-18", "checkpoint_ns": ""}},
+                                      checkpoint, {}, {})
+            await saver.aput_writes(config, [("news_image_bytes", image), ("topic", "AI")], "task")
+            return await saver.aget_tuple(config), [item async for item in saver.alist(config)]
+
+    loaded, listed = asyncio.run(scenario())
+
+    assert loaded.checkpoint["channel_values"] == {"news_image_bytes": image, "topic": "AI"}
+    assert [value for _, _, value in loaded.pending_writes] == [image, "AI"]
+    assert listed[0].checkpoint["channel_values"]["news_image_bytes"] == image
+    # the image is stored once, shared by the checkpoint and the write
+    assert blobs._conn.execute("SELECT COUNT(*) FROM checkpoint_blobs").fetchone()[0] == 1
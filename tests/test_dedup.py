@@ -0,0 +1,28 @@
+from utils.dedup import dedup_texts
+
+STORY = ("The central bank raised interest rates by a quarter point on Tuesday, citing persistent "
+         "inflation in services and a tight labour market, and signalled that further increases "
+         "remain possible if price growth does not slow in the coming months. ")
+OTHER = ("A new open source language model was released this week with weights available for "
+         "research and commercial use, and early benchmarks show it matching larger systems on "
+         "reasoning tasks while running on a single consumer graphics card. ")
+
+
+def test_keeps_the_longest_copy_of_each_near_duplicate_group():
+    short_copy = STORY * 3
+    long_copy = STORY * 3 + "Analysts expect markets to react calmly."
+    texts = [short_copy, OTHER * 3, None, long_copy]
+
+    kept, clusters = dedup_texts(texts, threshold=0.8)
+
+    assert kept == [None, OTHER * 3, None, long_copy]
+    assert clusters == {3: [0]}
+
+
+def test_distinct_texts_keep_their_order():
+    texts = ["", OTHER, STORY]
+
+    kept, clusters = dedup_texts(texts)
+
+    assert kept == texts
+    assert clusters == {}
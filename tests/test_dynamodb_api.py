@@ -0,0 +1,130 @@
+import asyncio
+
+import pytest
+
+from utils import rate_limit
+from utils.dynamodb_api import DynamoDBHandler
+from utils.rate_limit import ProviderLimits, RateLimiter
+
+
+class FlakyClient:
+    """batch_write_item/batch_get_item that leave the last item unprocessed on the first call."""
+
+    def __init__(self):
+        self.writes = []
+        self.reads = []
+
+    def batch_write_item(self, RequestItems):
+        items = RequestItems["articles"]
+        self.writes.append(len(items))
+        if len(self.writes) == 1:
+            return {"UnprocessedItems": {"articles": items[-1:]}}
+        return {}
+
+    def batch_get_item(self, RequestItems):
+        keys = RequestItems["articles"]["Keys"]
+        self.reads.append(len(keys))
+        responses = [{**key, "title": {"S": "t"}} for key in keys]
+        if len(self.reads) == 1:
+            return {"Responses": {"articles": responses[:-1]},
+                    "UnprocessedKeys": {"articles": {"Keys": keys[-1:]}}}
+        return {"Responses": {"articles": responses}}
+
+
+def _handler(monkeypatch):
+    monkeypatch.setattr(rate_limit, "backoff_delay", lambda attempt, retry_after=None: 0)
+    monkeypatch.setitem(rate_limit._limiters, "dynamodb", RateLimiter("dynamodb", ProviderLimits()))
+    handler = DynamoDBHandler.__new__(DynamoDBHandler)
+    handler.client = FlakyClient()
+    handler.table_name = "articles"
+    return handler
+
+
+def _articles(n):
+    return [{"topic_id": f"t{i}", "topic_name": "T", "date": "2026-10-18", "title": "title",
+             "content": "content", "web_links": []} for i in range(n)]
+
+
+def test_unprocessed_items_are_resent(monkeypatch):
+    handler = _handler(monkeypatch)
+
+    assert handler.save_articles(_articles(3))
+    assert handler.client.writes == [3, 1]
+    assert rate_limit.get_limiter("dynamodb").concurrency.limit < ProviderLimits().max_concurrency
+
+
+def test_async_unprocessed_items_are_resent(monkeypatch):
+    handler = _handler(monkeypatch)
+
+    assert asyncio.run(handler.asave_articles(_articles(3)))
+    assert handler.client.writes == [3, 1]
+
+
+def test_unprocessed_keys_are_reread(monkeypatch):
+    handler = _handler(monkeypatch)
+    keys = [(f"t{i}", "2026-10-18") for i in range(3)]
+
+    assert set(handler.get_articles(keys)) == set(keys)
+    assert handler.client.reads == [3, 1]
+    handler.client.reads.clear()
+    assert set(asyncio.run(handler.aget_articles(keys))) == set(keys)
+    assert handler.client.reads == [3, 1]
+
+
+def _table_handler(monkeypatch):
+    import boto3
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "test")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "test")
+    handler = DynamoDBHandler.__new__(DynamoDBHandler)
+    handler.client = boto3.client("dynamodb", region_name="us-east-1")
+    handler.table_name = "articles"
+    handler.client.create_table(
+        TableName="articles",
+        KeySchema=[{"AttributeName": "topic_id", "KeyType": "HASH"}, {"AttributeName": "date", "KeyType": "RANGE"}],
+        AttributeDefinitions=[{"AttributeName": "topic_id", "AttributeType": "S"},
+                              {"AttributeName": "date", "AttributeType": "S"}],
+        BillingMode="PAY_PER_REQUEST",
+    )
+    return handler
+
+
+def _save_text(handler, run_id, title):
+    return handler.save_article_text(topic_id="AI", topic_name="AI", date="2026-10-18", title=title,
+                                     content="content", web_links=[], run_id=run_id)
+
+
+def _save_image(handler, run_id, image_url=None, image_variants=None):
+    return handler.save_article_image(topic_id="AI", date="2026-10-18", image_url=image_url,
+                                      run_id=run_id, image_variants=image_variants)
+
+
+def test_rerun_without_image_drops_the_previous_image(monkeypatch):
+    moto = pytest.importorskip("moto")
+    with moto.mock_aws():
+        handler = _table_handler(monkeypatch)
+        _save_text(handler, "run-1", "first")
+        assert _save_image(handler, "run-1", "https://s3/first.webp", {"full": "https://s3/first.webp"})["complete"]
+
+        # text first, then a failed image step
+        _save_text(handler, "run-2", "second")
+        item = _save_image(handler, "run-2")
+        assert item["complete"] and item["title"] == "second"
+        assert "image_url" not in item and "image_variants" not in item
+
+        # a failed image step first, then the text
+        _save_image(handler, "run-3")
+        item = _save_text(handler, "run-3", "third")
+        assert item["complete"] and "image_url" not in item
+
+
+def test_rerun_keeps_its_own_image(monkeypatch):
+    moto = pytest.importorskip("moto")
+    with moto.mock_aws():
+        handler = _table_handler(monkeypatch)
+        _save_image(handler, "run-1", "https://s3/first.webp", {"full": "https://s3/first.webp"})
+        _save_text(handler, "run-1", "first")
+
+        _save_image(handler, "run-2", "https://s3/second.webp")
+        item = _save_text(handler, "run-2", "second")
+        assert item["complete"] and item["image_url"] == "https://s3/second.webp"
+        assert "image_variants" not in item
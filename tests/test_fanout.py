@@ -0,0 +1,88 @@
+import asyncio
+
+from utils import fanout
+from utils.fanout import Fanout, FanoutPolicy, run_fanout
+
+
+def _member(result, delay, log=None):
+    async def member():
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            if log is not None:
+                log.append(result)
+            raise
+        return result
+    return member
+
+
+def test_quorum_returns_early_and_cancels_stragglers(monkeypatch):
+    monkeypatch.setattr(fanout, "_trackers", {})
+    cancelled = []
+    factories = [_member("a", 0), _member("b", 0.01), _member("c", 60, cancelled)]
+
+    results = asyncio.run(asyncio.wait_for(run_fanout(factories, FanoutPolicy(quorum=2), "test"), 5))
+
+    assert results == ["a", "b", None]
+    assert cancelled == ["c"]
+
+
+def test_failed_members_do_not_count_towards_the_quorum(monkeypatch):
+    monkeypatch.setattr(fanout, "_trackers", {})
+
+    async def boom():
+        raise RuntimeError("fetch failed")
+
+    factories = [boom, _member(None, 0), _member("c", 0.02)]
+
+    assert asyncio.run(run_fanout(factories, FanoutPolicy(quorum=1), "test")) == [None, None, "c"]
+
+
+def test_deadline_keeps_what_finished(monkeypatch):
+    monkeypatch.setattr(fanout, "_trackers", {})
+    factories = [_member("a", 0), _member("b", 60)]
+
+    results = asyncio.run(asyncio.wait_for(run_fanout(factories, FanoutPolicy(deadline=0.05), "test"), 5))
+
+    assert results == ["a", None]
+
+
+def test_deadline_starts_at_the_first_submit(monkeypatch):
+    monkeypatch.setattr(fanout, "_trackers", {})
+
+    async def scenario():
+        drafts = Fanout(FanoutPolicy(deadline=0.1), "test")
+        # e.g. fetching the pages before the first draft starts
+        await asyncio.sleep(0.15)
+        drafts.submit(_member("a", 0.02))
+        return await drafts.wait()
+
+    assert asyncio.run(scenario()) == ["a"]
+
+
+def test_straggler_is_hedged_and_the_duplicate_wins(monkeypatch):
+    monkeypatch.setattr(fanout, "_trackers", {})
+    tracker = fanout.get_tracker("test")
+    for _ in range(5):
+        tracker.record(0.01)
+    calls = []
+
+    def flaky():
+        calls.append(len(calls))
+        # the first attempt hangs, the hedged duplicate answers at once
+        return _member("slow" if len(calls) == 1 else "fast", 60 if len(calls) == 1 else 0)()
+
+    async def scenario():
+        drafts = Fanout(FanoutPolicy(hedge_percentile=0.9, hedge_min_samples=5), "test")
+        drafts.submit(flaky)
+        return await asyncio.wait_for(drafts.wait(), 5), drafts.hedged
+
+    assert asyncio.run(scenario()) == (["fast"], 1)
+    assert len(calls) == 2
+
+
+def test_get_tracker_is_shared_by_name(monkeypatch):
+    monkeypatch.setattr(fanout, "_trackers", {})
+
+    assert fanout.get_tracker("fetch") is fanout.get_tracker("fetch")
+    assert fanout.get_tracker("fetch") is not fanout.get_tracker("draft")
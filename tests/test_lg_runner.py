@@ -0,0 +1,24 @@
+import asyncio
+
+from node import lg_runner
+from node.lg_runner import BatchRunResult, run_topics
+
+
+def test_run_topics_inside_a_running_loop(monkeypatch):
+    loops = []
+
+    async def fake_batch(topic_ids, max_concurrency, checkpoint):
+        loops.append(asyncio.get_running_loop())
+        return BatchRunResult(results={topic: {} for topic in topic_ids})
+
+    monkeypatch.setattr(lg_runner, "arun_topics", fake_batch)
+
+    async def notebook_cell():
+        # what a Jupyter cell calling run_topics does
+        return asyncio.get_running_loop(), run_topics(["AI"])
+
+    cell_loop, batch = asyncio.run(notebook_cell())
+
+    assert list(batch.results) == ["AI"]
+    assert loops[0] is not cell_loop
+    assert list(run_topics(["bitcoin"]).results) == ["bitcoin"]
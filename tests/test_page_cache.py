@@ -0,0 +1,39 @@
+import os
+
+from utils.page_cache import PageCache, content_hash
+
+
+def _files(cache: PageCache):
+    return sorted(name for _, _, names in os.walk(os.path.join(cache.cache_dir, "blobs")) for name in names)
+
+
+def test_extractions_count_towards_the_size_budget(tmp_path):
+    cache = PageCache(str(tmp_path), ttl=60, max_bytes=250)
+    first = cache.put("https://example.com/a", "a" * 100)
+    cache.put_text(first, "x" * 100)
+    second = cache.put("https://example.com/b", "b" * 100)
+
+    # 300 bytes with the extraction, so the older page goes together with its text
+    assert _files(cache) == [f"{second}.html"]
+    assert cache.lookup("https://example.com/a") is None
+    assert cache.get_text(first) is None
+
+
+def test_refetching_the_same_body_keeps_its_size(tmp_path):
+    cache = PageCache(str(tmp_path), ttl=60, max_bytes=1000)
+    digest = cache.put("https://example.com/a", "a" * 100)
+    cache.put_text(digest, "x" * 50)
+    cache.put("https://example.com/a?utm_source=feed", "a" * 100)
+    cache.put_text(digest, "x" * 50)
+
+    assert digest == content_hash("a" * 100)
+    assert cache._conn.execute("SELECT size FROM blobs WHERE content_hash = ?", (digest,)).fetchone()[0] == 150
+
+
+def test_orphaned_extraction_is_evicted(tmp_path):
+    cache = PageCache(str(tmp_path), ttl=60, max_bytes=150)
+    # extracted from a body that was never stored in the cache
+    cache.put_text(content_hash("orphan"), "x" * 100)
+    cache.put("https://example.com/b", "b" * 100)
+
+    assert _files(cache) == [f"{content_hash('b' * 100)}.html"]
@@ -0,0 +1,23 @@
+from utils.passage_rank import trim_to_budget
+from utils.tokens import count_tokens
+
+RELEVANT = "The new chip doubles AI inference speed for large language models."
+FILLER = "The weather in the city stayed mild and the local team won again on Sunday."
+
+
+def test_text_under_budget_is_returned_unchanged():
+    text = f"{FILLER}\n\n{RELEVANT}\n"
+
+    trimmed, stats = trim_to_budget(text, ["AI"], 1000)
+
+    assert trimmed == text
+    assert stats["original_tokens"] == stats["trimmed_tokens"] == count_tokens(text)
+
+
+def test_relevant_passages_are_kept_in_order():
+    text = "\n".join([FILLER] * 10 + [RELEVANT, FILLER, RELEVANT.replace("chip", "GPU")])
+
+    trimmed, stats = trim_to_budget(text, ["AI", "chip"], 2 * count_tokens(RELEVANT) + 2)
+
+    assert trimmed == "\n".join([RELEVANT, RELEVANT.replace("chip", "GPU")])
+    assert stats["trimmed_tokens"] < stats["original_tokens"]
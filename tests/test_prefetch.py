@@ -0,0 +1,59 @@
+import asyncio
+
+from node import lg_node
+from utils import pic_generator
+
+
+def test_failed_stream_attempt_prefetches_are_discarded(monkeypatch):
+    started = []
+
+    async def fake_title(text):
+        started.append(text)
+        await asyncio.sleep(10)
+
+    async def fake_stream(prompt, call_site, on_text=None):
+        # first attempt fails after streaming a prefix, the retry streams another text
+        for text in ("stale draft", "fresh draft"):
+            on_text(text[:3])
+            on_text(text[:7])
+        on_text("fresh draft")
+        return "fresh draft"
+
+    monkeypatch.setattr(pic_generator, "_PREFETCHABLE", {"generate_title": (5, fake_title)})
+    monkeypatch.setattr(lg_node, "ainvoke_llm", fake_stream)
+
+    async def combine():
+        combined = await lg_node._acombine_tree(["draft"])
+        await asyncio.sleep(0)
+        tasks = {key[2]: task for key, task in pic_generator._inflight.items()
+                 if key[0] is asyncio.get_running_loop()}
+        pic_generator.discard_prefetches(list(pic_generator._inflight))
+        return combined, tasks
+
+    combined, tasks = asyncio.run(combine())
+
+    assert combined == "fresh draft"
+    # the stale prefix was cancelled before its call ran
+    assert [text[:5] for text in started] == ["fresh"]
+    assert [text[:5] for text in tasks] == ["fresh"]
+
+
+def test_prefetches_are_discarded_when_the_stream_fails(monkeypatch):
+    async def fake_title(text):
+        await asyncio.sleep(10)
+
+    async def failing_stream(prompt, call_site, on_text=None):
+        on_text("partial draft")
+        raise RuntimeError("stream failed")
+
+    monkeypatch.setattr(pic_generator, "_PREFETCHABLE", {"generate_title": (5, fake_title)})
+    monkeypatch.setattr(lg_node, "ainvoke_llm", failing_stream)
+
+    async def combine():
+        try:
+            await lg_node._acombine_tree(["draft"])
+        except RuntimeError:
+            pass
+        return [key for key in pic_generator._inflight if key[0] is asyncio.get_running_loop()]
+
+    assert asyncio.run(combine()) == []
@@ -0,0 +1,87 @@
+import asyncio
+from collections import OrderedDict
+
+from utils import rate_limit
+from utils.rate_limit import ProviderLimits, RateLimiter
+
+
+def test_cancelled_acall_releases_its_slot():
+    limiter = RateLimiter("test", ProviderLimits(max_concurrency=2))
+
+    async def scenario():
+        started = asyncio.Event()
+
+        async def slow():
+            started.set()
+            await asyncio.sleep(60)
+
+        for _ in range(2):
+            started.clear()
+            task = asyncio.create_task(limiter.acall(slow))
+            await started.wait()
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        assert limiter.concurrency.in_flight == 0
+
+        async def fast():
+            return "ok"
+
+        # with the slots leaked this would wait forever
+        return await asyncio.wait_for(limiter.acall(fast), timeout=1)
+
+    assert asyncio.run(scenario()) == "ok"
+    assert limiter.concurrency.in_flight == 0
+
+
+def test_failed_call_releases_its_slot():
+    limiter = RateLimiter("test", ProviderLimits(max_concurrency=1), max_attempts=1)
+
+    def fail():
+        raise ValueError("boom")
+
+    for _ in range(3):
+        try:
+            limiter.call(fail)
+        except ValueError:
+            pass
+    assert limiter.concurrency.in_flight == 0
+    assert limiter.call(lambda: "ok") == "ok"
+
+
+class TooManyRequests(Exception):
+    status_code = 429
+    headers = {"Retry-After": "5"}
+
+
+def test_retry_after_pauses_providers_without_a_request_bucket():
+    limiter = RateLimiter("test", ProviderLimits(), max_attempts=1)
+
+    def throttled():
+        raise TooManyRequests()
+
+    try:
+        limiter.call(throttled)
+    except TooManyRequests:
+        pass
+    assert limiter.requests is None
+    assert 4 < limiter._reserve(0) <= 5
+
+
+def test_scoped_limiters_are_bounded(monkeypatch):
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_MAX_SCOPES", 2)
+    monkeypatch.setattr(rate_limit, "_scoped_limiters", OrderedDict())
+
+    first = rate_limit.get_limiter("fetch:a.example")
+    busy = rate_limit.get_limiter("fetch:b.example")
+    busy.concurrency.acquire()
+    assert rate_limit.get_limiter("fetch:a.example") is first
+    rate_limit.get_limiter("fetch:c.example")
+    rate_limit.get_limiter("fetch:d.example")
+
+    # idle hosts are dropped least recently used first, the busy one is kept
+    assert list(rate_limit._scoped_limiters) == ["fetch:b.example", "fetch:d.example"]
+    assert rate_limit.get_limiter("fetch:b.example") is busy
+    assert rate_limit.get_limiter("google_cse") is rate_limit.get_limiter("google_cse")
@@ -0,0 +1,55 @@
+import time
+
+from node import lg_node
+from utils.seen_urls import SeenUrlIndex
+
+
+def _update(monkeypatch, tmp_path, links, articles, min_new=1):
+    index = SeenUrlIndex(str(tmp_path / "seen.db"))
+    monkeypatch.setattr(lg_node, "get_seen_urls", lambda: index)
+    monkeypatch.setattr(lg_node, "INCREMENTAL_MIN_NEW_SOURCES", min_new)
+    return lg_node._new_sources_update({"topic": "AI", "websites_links": links}, articles)
+
+
+def test_published_sources_match_in_canonical_form(monkeypatch, tmp_path):
+    articles = {("AI", "2026-10-17"): {"complete": True,
+                                       "web_links": "https://Example.com/a?utm_source=feed#top\nhttps://example.com/b"}}
+    links = ["https://example.com/a", "https://example.com/c?id=1&utm_medium=x"]
+
+    update = _update(monkeypatch, tmp_path, links, articles)
+
+    assert update["websites_links"] == ["https://example.com/c?id=1&utm_medium=x"]
+    assert update["sources_seen"] == 1
+    assert "skipped" not in update
+
+
+def test_unpublished_articles_do_not_mark_sources(monkeypatch, tmp_path):
+    articles = {("AI", "2026-10-17"): {"parts": {"text"}, "complete": False, "web_links": "https://example.com/a"}}
+
+    update = _update(monkeypatch, tmp_path, ["https://example.com/a"], articles)
+
+    assert update["websites_links"] == ["https://example.com/a"]
+    assert update["sources_seen"] == 0
+
+
+def test_too_few_new_sources_skip_the_topic(monkeypatch, tmp_path):
+    articles = {("AI", "2026-10-17"): {"complete": True, "web_links": ["https://example.com/a"]}}
+    links = ["https://example.com/a", "https://example.com/b"]
+
+    assert "skipped" not in _update(monkeypatch, tmp_path, links, articles, min_new=1)
+    assert _update(monkeypatch, tmp_path, links, articles, min_new=2)["skipped"] == "no_new_sources"
+
+
+def test_entries_past_retention_are_dropped_on_open(tmp_path):
+    path = str(tmp_path / "seen.db")
+    index = SeenUrlIndex(path, retention_days=7)
+    index.add("AI", ["https://example.com/new"], "2026-10-17")
+    with index._conn:
+        index._conn.execute("INSERT INTO seen_urls (topic_id, url, date, stored_at) VALUES (?, ?, ?, ?)",
+                            ("AI", "https://example.com/old", "2026-10-01", time.time() - 8 * 24 * 3600))
+
+    reopened = SeenUrlIndex(path, retention_days=7)
+
+    assert reopened.seen("AI", ["https://example.com/new", "https://example.com/old"]) == {"https://example.com/new"}
+    # other topics never match
+    assert reopened.seen("bitcoin", ["https://example.com/new"]) == set()
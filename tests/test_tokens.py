@@ -0,0 +1,56 @@
+from node import lg_node
+from utils.tokens import count_tokens, pack_by_tokens, split_by_tokens
+
+PARAGRAPH = "Markets rallied after the announcement. Analysts expect more gains this quarter."
+
+
+def test_split_respects_the_budget():
+    text = "\n\n".join([PARAGRAPH] * 20) + "\n" + " ".join(["word"] * 500)
+
+    chunks = split_by_tokens(text, 40)
+
+    assert len(chunks) > 1
+    assert all(count_tokens(chunk) <= 40 for chunk in chunks)
+    assert " ".join(chunks).split() == text.split()
+
+
+def test_pack_keeps_order_and_budget():
+    texts = [PARAGRAPH * n for n in (1, 3, 2, 8, 1)]
+
+    groups = pack_by_tokens(texts, 60)
+
+    assert all(sum(count_tokens(text) for text in group) <= 60 for group in groups)
+    assert " ".join(" ".join(group) for group in groups).split() == " ".join(texts).split()
+
+
+def _fake_llm(calls, summary):
+    def invoke(prompt, call_site):
+        calls.append(call_site)
+        return summary(prompt)
+    return invoke
+
+
+def test_combine_tree_handles_one_oversized_draft(monkeypatch):
+    calls = []
+    monkeypatch.setattr(lg_node, "COMBINE_TOKEN_BUDGET", 100)
+    monkeypatch.setattr(lg_node, "invoke_llm", _fake_llm(calls, lambda prompt: "short summary"))
+
+    combined = lg_node._combine_tree([" ".join([PARAGRAPH] * 50)])
+
+    assert combined == "short summary"
+    assert calls[-1] == "combine_news"
+    assert calls.count("combine_news_partial") > 1
+
+
+def test_combine_tree_stops_when_drafts_do_not_shrink(monkeypatch):
+    calls = []
+    monkeypatch.setattr(lg_node, "COMBINE_TOKEN_BUDGET", 100)
+    monkeypatch.setattr(lg_node, "COMBINE_MAX_DEPTH", 3)
+    # every partial combine is as long as its input, so the level never fits
+    monkeypatch.setattr(lg_node, "invoke_llm", _fake_llm(calls, lambda prompt: PARAGRAPH * 10))
+
+    combined = lg_node._combine_tree([" ".join([PARAGRAPH] * 50)])
+
+    assert combined == PARAGRAPH * 10
+    assert calls.count("combine_news") == 1
+    assert calls[-1] == "combine_news"
@@ -0,0 +1,37 @@
+from urllib.parse import quote
+
+from utils.url_utils import canonicalize_url, resolve_redirector
+from utils.web_search import SearchResult, merge_results, plan_requests
+
+
+def test_canonical_url_drops_tracking_parameters():
+    url = "HTTPS://News.Example.com:443/story?utm_source=x&id=7&fbclid=abc&a=1#comments"
+
+    assert canonicalize_url(url) == "https://news.example.com/story?a=1&id=7"
+    assert canonicalize_url("http://example.com:8080") == "http://example.com:8080/"
+
+
+def test_google_redirector_is_unwrapped():
+    target = "https://example.com/a?b=1&c=2"
+
+    assert resolve_redirector(f"https://www.google.com/url?q={quote(target, safe='')}&sa=U") == target
+    assert resolve_redirector("https://www.google.com/search?q=news") == "https://www.google.com/search?q=news"
+
+
+def test_first_pages_are_planned_before_deeper_pages():
+    plan = plan_requests(["a", "b", "c"], num_results=10, pages=2, max_requests=4)
+
+    assert plan == [("a", 1), ("b", 1), ("c", 1), ("a", 11)]
+
+
+def test_merge_dedups_across_keywords():
+    first = [SearchResult("A", "https://example.com/a?utm_source=x", "1"),
+             SearchResult("B", "https://example.com/b", "2")]
+    second = [SearchResult("A again", "https://www.google.com/url?q=https://example.com/a", "3"),
+              SearchResult("C", "https://example.com/c", "4"),
+              SearchResult("empty", "", "5")]
+
+    merged = merge_results([first, second])
+
+    assert [result.title for result in merged] == ["A", "B", "C"]
+    assert merged[0].link == "https://example.com/a?utm_source=x"
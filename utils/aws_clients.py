@@ -0,0 +1,44 @@
+import threading
+import logging
+# from ..config.setting import AWS_ACCESS_KEY_ID,AWS_SECRET_ACCESS_KEY,AWS_REGION
+# from ..config.setting import AWS_MAX_POOL_CONNECTIONS, AWS_MAX_ATTEMPTS
+from config.setting import AWS_ACCESS_KEY_ID,AWS_SECRET_ACCESS_KEY,AWS_REGION
+from config.setting import AWS_MAX_POOL_CONNECTIONS, AWS_MAX_ATTEMPTS
+
+logger = logging.getLogger(__name__)
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_aws_client(service: str):
+    """
+    Return the process-wide boto3 client of a service.
+
+    boto3 clients are thread-safe once created, but creating them is not, so
+    creation is serialized and every caller reuses the same client and its
+    connection pool of AWS_MAX_POOL_CONNECTIONS connections. boto3 is only
+    imported with the first client.
+    """
+    with _clients_lock:
+        if service not in _clients:
+            import boto3
+            from botocore.config import Config
+            session = boto3.session.Session(
+                aws_access_key_id=AWS_ACCESS_KEY_ID,
+                aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
+                region_name=AWS_REGION
+            )
+            _clients[service] = session.client(service, config=Config(
+                max_pool_connections=AWS_MAX_POOL_CONNECTIONS,
+                retries={"max_attempts": AWS_MAX_ATTEMPTS, "mode": "standard"}
+            ))
+            logger.info(f"Created shared {service} client in region {AWS_REGION}, "
+                        f"pool size {AWS_MAX_POOL_CONNECTIONS}")
+        return _clients[service]
+
+
+def reset_aws_clients():
+    """Drop the shared clients, e.g. after the credentials changed."""
+    with _clients_lock:
+        _clients.clear()
@@ -0,0 +1,129 @@
+import logging
+import re
+import zlib
+from collections import defaultdict
+from typing import Dict, Hashable, List, Optional, Tuple
+import numpy as np
+# from ..config.setting import DEDUP_THRESHOLD, DEDUP_NUM_PERM, DEDUP_SHINGLE_SIZE
+from config.setting import DEDUP_THRESHOLD, DEDUP_NUM_PERM, DEDUP_SHINGLE_SIZE
+
+logger = logging.getLogger(__name__)
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+
+
+def _lsh_params(threshold: float, num_perm: int) -> Tuple[int, int]:
+    """Pick (bands, rows) whose LSH S-curve turns closest to the threshold."""
+    best = (1, num_perm)
+    best_error = float("inf")
+    for rows in range(1, num_perm + 1):
+        bands = num_perm // rows
+        error = abs((1 / bands) ** (1 / rows) - threshold)
+        if error < best_error:
+            best, best_error = (bands, rows), error
+    return best
+
+
+class MinHasher:
+    """MinHash signatures over word shingles, vectorized over all permutations."""
+
+    def __init__(self, num_perm: int = DEDUP_NUM_PERM, shingle_size: int = DEDUP_SHINGLE_SIZE, seed: int = 1):
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        generator = np.random.RandomState(seed)
+        self._a = generator.randint(1, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+        self._b = generator.randint(0, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+
+    def signature(self, text: str) -> Optional[np.ndarray]:
+        """MinHash signature of a text, None if it has no words."""
+        tokens = re.findall(r"\w+", text.lower())
+        if not tokens:
+            return None
+        size = min(self.shingle_size, len(tokens))
+        shingles = {" ".join(tokens[i:i + size]) for i in range(len(tokens) - size + 1)}
+        hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles),
+                             dtype=np.uint64, count=len(shingles))
+        # (a * h + b) mod p for every shingle and permutation at once
+        permuted = np.bitwise_and((np.outer(hashes, self._a) + self._b) % _MERSENNE_PRIME, _MAX_HASH)
+        return permuted.min(axis=0)
+
+
+def estimate_jaccard(sig_a: np.ndarray, sig_b: np.ndarray) -> float:
+    """Estimated Jaccard similarity of two MinHash signatures."""
+    return float(np.count_nonzero(sig_a == sig_b)) / len(sig_a)
+
+
+class NearDuplicateIndex:
+    """
+    LSH index of representative documents.
+
+    add() returns the key of an already indexed document whose estimated
+    Jaccard similarity reaches the threshold, or indexes the new document as
+    a representative and returns None. It works incrementally, so pages can
+    be checked as they arrive.
+    """
+
+    def __init__(self, threshold: float = DEDUP_THRESHOLD, num_perm: int = DEDUP_NUM_PERM,
+                 shingle_size: int = DEDUP_SHINGLE_SIZE):
+        self.threshold = threshold
+        self.hasher = MinHasher(num_perm, shingle_size)
+        self.bands, self.rows = _lsh_params(threshold, num_perm)
+        self._buckets = [defaultdict(list) for _ in range(self.bands)]
+        self._signatures: Dict[Hashable, np.ndarray] = {}
+
+    def _band_keys(self, signature: np.ndarray):
+        for band in range(self.bands):
+            yield band, signature[band * self.rows:(band + 1) * self.rows].tobytes()
+
+    def add(self, key: Hashable, text: str) -> Optional[Hashable]:
+        """Index a document, return the key it duplicates or None."""
+        signature = self.hasher.signature(text)
+        if signature is None:
+            return None
+
+        candidates = []
+        for band, band_key in self._band_keys(signature):
+            for candidate in self._buckets[band].get(band_key, ()):
+                if candidate not in candidates:
+                    candidates.append(candidate)
+        for candidate in candidates:
+            if estimate_jaccard(signature, self._signatures[candidate]) >= self.threshold:
+                return candidate
+
+        self._signatures[key] = signature
+        for band, band_key in self._band_keys(signature):
+            self._buckets[band][band_key].append(key)
+        return None
+
+
+def dedup_texts(texts: List[Optional[str]], threshold: float = DEDUP_THRESHOLD
+                ) -> Tuple[List[Optional[str]], Dict[int, List[int]]]:
+    """
+    Keep one representative per cluster of near-duplicate texts.
+
+    The longest text of a cluster is kept as its representative since it is
+    usually the most complete copy of a syndicated story.
+
+    Args:
+        texts: extracted page contents, None entries are ignored
+        threshold: estimated Jaccard similarity at which two pages are duplicates
+
+    Returns:
+        (texts aligned with the input with duplicates replaced by None,
+         mapping of representative index to the indexes it replaced)
+    """
+    index = NearDuplicateIndex(threshold)
+    kept = list(texts)
+    clusters: Dict[int, List[int]] = {}
+
+    order = sorted((i for i, text in enumerate(texts) if text), key=lambda i: len(texts[i]), reverse=True)
+    for i in order:
+        duplicate_of = index.add(i, texts[i])
+        if duplicate_of is not None:
+            kept[i] = None
+            clusters.setdefault(duplicate_of, []).append(i)
+
+    dropped = sum(len(members) for members in clusters.values())
+    logger.info(f"Near-duplicate detection: {len(order)} pages, {dropped} dropped, threshold={threshold}")
+    return kept, clusters
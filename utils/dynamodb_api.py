@@ -1,34 +1,87 @@
-import boto3
+import asyncio
 from datetime import datetime
 import logging
+from typing import Dict, List, Optional, Tuple
 from dotenv import load_dotenv
-# from ..config.setting import AWS_ACCESS_KEY_ID,AWS_SECRET_ACCESS_KEY,AWS_REGION,DYNAMODB_TABLE_NAME
-from config.setting import AWS_ACCESS_KEY_ID,AWS_SECRET_ACCESS_KEY,AWS_REGION,DYNAMODB_TABLE_NAME
-# Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+# from .aws_clients import get_aws_client
+# from .rate_limit import call, acall, ThrottledError
+# from ..config.setting import AWS_REGION,DYNAMODB_TABLE_NAME
+from utils.aws_clients import get_aws_client
+from utils.rate_limit import call, acall, ThrottledError
+from config.setting import AWS_REGION,DYNAMODB_TABLE_NAME
 logger = logging.getLogger(__name__)
 
 
+# 首次使用时创建，导入本模块时不加载boto3
+_serializer = None
+_deserializer = None
+
+# DynamoDB limits per batch request
+BATCH_WRITE_SIZE = 25
+BATCH_GET_SIZE = 100
+
+
+def _serialize(values: dict) -> dict:
+    global _serializer
+    if _serializer is None:
+        from boto3.dynamodb.types import TypeSerializer
+        _serializer = TypeSerializer()
+    return {k: _serializer.serialize(v) for k, v in values.items()}
+
+
+def _deserialize(item: dict) -> dict:
+    global _deserializer
+    if _deserializer is None:
+        from boto3.dynamodb.types import TypeDeserializer
+        _deserializer = TypeDeserializer()
+    return {k: _deserializer.deserialize(v) for k, v in item.items()}
+
+
 class DynamoDBHandler:
+    # 文章由两个分支分别写入，两部分都写入后complete才会被置为true
+    ARTICLE_PARTS = ("text", "image")
+    # 由图片部分写入的字段
+    IMAGE_FIELDS = ("image_url", "image_variants")
+
     def __init__(self):
         """
         Initialize DynamoDB handler with AWS credentials from settings
+
+        Uses the process-wide low-level client, which unlike a Table resource
+        is thread-safe, so creating a handler per graph run is cheap.
         """
         logger.debug("Initializing DynamoDBHandler")
         try:
-            self.dynamodb = boto3.resource(
-                'dynamodb',
-                aws_access_key_id=AWS_ACCESS_KEY_ID,
-                aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
-                region_name=AWS_REGION
-            )
+            self.client = get_aws_client('dynamodb')
             self.table_name = DYNAMODB_TABLE_NAME
-            self.table = self.dynamodb.Table(self.table_name)
-            logger.info(f"DynamoDBHandler initialized for table: {self.table_name} in region: {AWS_REGION}")
+            logger.debug(f"DynamoDBHandler initialized for table: {self.table_name} in region: {AWS_REGION}")
         except Exception as e:
             logger.error(f"Failed to initialize DynamoDB client: {str(e)}")
             raise
 
+    @staticmethod
+    def _key(topic_id: str, date: str) -> dict:
+        return _serialize({'topic_id': topic_id, 'date': date})
+
+    def _article_item(self, topic_id: str, topic_name: str, date: str, title: str,
+                      content: str, web_links: list, image_url: str = None) -> dict:
+        item = {
+            'topic_id': topic_id,
+            'date': date,
+            'title': title,
+            'content': content,
+            'topic_name': topic_name,
+            'web_links': web_links if web_links else [],
+            'created_at': datetime.now().isoformat()
+        }
+        if image_url:
+            logger.debug(f"Article includes image URL: {image_url}")
+            item['image_url'] = image_url
+        # 整篇文章一次写入，两部分都已存在
+        item['parts'] = set(self.ARTICLE_PARTS)
+        item['complete'] = True
+        return item
+
     def save_article(self, topic_id: str, topic_name: str, date: str, title: str, 
                     content: str, web_links: list, image_url: str = None) -> bool:
         """
@@ -52,22 +105,12 @@ class DynamoDBHandler:
             return False
             
         logger.info(f"Saving article with topic_id: {topic_id}, title: '{title[:30]}...'")
+        # 客户端创建时已加载boto3，这里只是取得异常类型
+        import boto3
         
         try:
             # Prepare item for DynamoDB
-            item = {
-                'topic_id': topic_id,
-                'date': date,
-                'title': title,
-                'content': content,
-                'topic_name': topic_name,
-                'web_links': web_links if web_links else [],
-                'created_at': datetime.now().isoformat()
-            }
-            
-            if image_url:
-                logger.debug(f"Article includes image URL: {image_url}")
-                item['image_url'] = image_url
+            item = self._article_item(topic_id, topic_name, date, title, content, web_links, image_url)
             
             # Content size logging
             content_size = len(content)
@@ -75,7 +118,7 @@ class DynamoDBHandler:
             
             # Save to DynamoDB
             logger.debug(f"Putting item into DynamoDB table: {self.table_name}")
-            self.table.put_item(Item=item)
+            call("dynamodb", self.client.put_item, TableName=self.table_name, Item=_serialize(item))
             
             logger.info(f"Successfully saved article '{title[:30]}...' to DynamoDB")
             return True
@@ -89,6 +132,163 @@ class DynamoDBHandler:
             logger.error(f"Failed to save article to DynamoDB: {str(e)}", exc_info=True)
             return False
             
+    async def asave_article(self, **kwargs) -> bool:
+        """
+        save_article的异步版本，boto3没有asyncio接口，在线程池中执行
+        """
+        return await asyncio.to_thread(self.save_article, **kwargs)
+
+    def _update_part(self, topic_id: str, date: str, part: str, fields: dict, run_id: str) -> Optional[dict]:
+        """
+        以条件update_item写入文章的一部分字段
+
+        同一次运行(run_id相同)的部分累加到parts集合中；新一次运行的第一个部分
+        会重置parts和complete，避免当天之前运行留下的部分被误认为已完成。
+
+        Returns:
+            dict: 更新后的完整item，失败返回None
+        """
+        now = datetime.now().isoformat()
+        names = {"#parts": "parts", "#run_id": "run_id", "#created_at": "created_at", "#updated_at": "updated_at"}
+        values = {":part": {part}, ":run_id": run_id, ":now": now}
+        assignments = ["#created_at = if_not_exists(#created_at, :now)", "#updated_at = :now"]
+        for i, (name, value) in enumerate(fields.items()):
+            names[f"#f{i}"] = name
+            values[f":v{i}"] = value
+            assignments.append(f"#f{i} = :v{i}")
+
+        # 同一次运行：把本部分加入parts
+        same_run = {
+            "UpdateExpression": "SET " + ", ".join(assignments) + " ADD #parts :part",
+            "ConditionExpression": "#run_id = :run_id",
+            "ExpressionAttributeNames": names,
+            "ExpressionAttributeValues": values,
+        }
+        # 新一次运行的第一个部分：重置parts和complete，并删除本次没有写入的图片字段，
+        # 否则图片生成失败的重跑会带着上一次运行的图片发布
+        stale = [field for field in self.IMAGE_FIELDS if field not in fields]
+        new_run_names = {**names, "#complete": "complete", **{f"#r{i}": field for i, field in enumerate(stale)}}
+        remove = " REMOVE " + ", ".join(f"#r{i}" for i in range(len(stale))) if stale else ""
+        new_run = {
+            "UpdateExpression": "SET " + ", ".join(assignments + ["#parts = :part", "#run_id = :run_id", "#complete = :false"]) + remove,
+            "ConditionExpression": "attribute_not_exists(#run_id) OR #run_id <> :run_id",
+            "ExpressionAttributeNames": new_run_names,
+            "ExpressionAttributeValues": {**values, ":false": False},
+        }
+
+        # 另一个分支可能在两次尝试之间写入，所以最后再按同一次运行重试一次
+        for request in (same_run, new_run, same_run):
+            try:
+                response = call("dynamodb", self.client.update_item,
+                    TableName=self.table_name,
+                    Key=self._key(topic_id, date),
+                    ReturnValues="ALL_NEW",
+                    UpdateExpression=request["UpdateExpression"],
+                    ConditionExpression=request["ConditionExpression"],
+                    ExpressionAttributeNames=request["ExpressionAttributeNames"],
+                    ExpressionAttributeValues=_serialize(request["ExpressionAttributeValues"])
+                )
+                return _deserialize(response["Attributes"])
+            except self.client.exceptions.ConditionalCheckFailedException:
+                continue
+            except Exception as e:
+                logger.error(f"Failed to save {part} part of article {topic_id}/{date}: {str(e)}")
+                return None
+        logger.error(f"Conditional update of {part} part of article {topic_id}/{date} kept failing")
+        return None
+
+    def _mark_complete(self, topic_id: str, date: str, run_id: str) -> bool:
+        """当同一次运行的所有部分都已写入时，把complete置为true"""
+        parts = {f":p{i}": part for i, part in enumerate(self.ARTICLE_PARTS)}
+        try:
+            call("dynamodb", self.client.update_item,
+                TableName=self.table_name,
+                Key=self._key(topic_id, date),
+                UpdateExpression="SET #complete = :true",
+                ConditionExpression="#run_id = :run_id AND " + " AND ".join(f"contains(#parts, {p})" for p in parts),
+                ExpressionAttributeNames={"#complete": "complete", "#run_id": "run_id", "#parts": "parts"},
+                ExpressionAttributeValues=_serialize({":true": True, ":run_id": run_id, **parts})
+            )
+            logger.info(f"Article {topic_id}/{date} is complete")
+            return True
+        except self.client.exceptions.ConditionalCheckFailedException:
+            return False
+        except Exception as e:
+            logger.error(f"Failed to mark article {topic_id}/{date} complete: {str(e)}")
+            return False
+
+    def _save_part(self, topic_id: str, date: str, part: str, fields: dict, run_id: str) -> Optional[dict]:
+        item = self._update_part(topic_id, date, part, fields, run_id)
+        if item is not None and set(self.ARTICLE_PARTS) <= set(item.get("parts", ())):
+            item["complete"] = self._mark_complete(topic_id, date, run_id) or bool(item.get("complete"))
+        return item
+
+    def save_article_text(self, topic_id: str, topic_name: str, date: str, title: str,
+                          content: str, web_links: list, run_id: str) -> Optional[dict]:
+        """
+        写入文章的标题和内容，不等待图片分支
+
+        Args:
+            topic_id (str): 主题ID
+            topic_name (str): 主题名称
+            date (str): 日期
+            title (str): 文章标题
+            content (str): 文章内容
+            web_links (list): 参考网站链接列表
+            run_id (str): 本次运行的ID，两个分支必须相同
+
+        Returns:
+            dict: 更新后的item，其中complete表示两部分是否都已写入，失败则返回None
+        """
+        if not all([topic_id, date, title, content]):
+            logger.error("Missing required fields for article save")
+            return None
+
+        logger.info(f"Saving article text with topic_id: {topic_id}, title: '{title[:30]}...'")
+        return self._save_part(topic_id, date, "text", {
+            'title': title,
+            'content': content,
+            'topic_name': topic_name,
+            'web_links': web_links if web_links else [],
+        }, run_id)
+
+    def save_article_image(self, topic_id: str, date: str, image_url: Optional[str], run_id: str,
+                           image_variants: Optional[Dict[str, str]] = None) -> Optional[dict]:
+        """
+        写入文章的图片URL，图片生成失败时也会记录该部分已完成
+
+        Args:
+            topic_id (str): 主题ID
+            date (str): 日期
+            image_url (str, optional): S3图片URL
+            run_id (str): 本次运行的ID，两个分支必须相同
+            image_variants (dict, optional): 版本名 -> S3 URL，如full、w256、w512
+
+        Returns:
+            dict: 更新后的item，其中complete表示两部分是否都已写入，失败则返回None
+        """
+        if not topic_id or not date:
+            logger.error("Missing required fields for article image save")
+            return None
+
+        logger.info(f"Saving article image with topic_id: {topic_id}, image_url: {image_url}")
+        fields = {'image_url': image_url} if image_url else {}
+        if image_variants:
+            fields['image_variants'] = image_variants
+        return self._save_part(topic_id, date, "image", fields, run_id)
+
+    async def asave_article_text(self, **kwargs) -> Optional[dict]:
+        """
+        save_article_text的异步版本，在线程池中执行
+        """
+        return await asyncio.to_thread(self.save_article_text, **kwargs)
+
+    async def asave_article_image(self, **kwargs) -> Optional[dict]:
+        """
+        save_article_image的异步版本，在线程池中执行
+        """
+        return await asyncio.to_thread(self.save_article_image, **kwargs)
+
     def get_article(self, topic_id: str, date: str) -> dict:
         """
         从DynamoDB获取文章
@@ -105,18 +305,17 @@ class DynamoDBHandler:
             return None
             
         logger.info(f"Retrieving article with topic_id: {topic_id}, date: {date}")
+        import boto3
         
         try:
-            response = self.table.get_item(
-                Key={
-                    'topic_id': topic_id,
-                    'date': date
-                }
+            response = call("dynamodb", self.client.get_item,
+                TableName=self.table_name,
+                Key=self._key(topic_id, date)
             )
             
             if 'Item' in response:
                 logger.info(f"Article found and retrieved successfully")
-                return response['Item']
+                return _deserialize(response['Item'])
             else:
                 logger.warning(f"No article found with topic_id: {topic_id}, date: {date}")
                 return None
@@ -126,4 +325,147 @@ class DynamoDBHandler:
             return None
         except Exception as e:
             logger.error(f"Failed to retrieve article from DynamoDB: {str(e)}")
-            return None 
\ No newline at end of file
+            return None
+
+    async def aget_article(self, topic_id: str, date: str) -> dict:
+        """
+        get_article的异步版本，boto3没有asyncio接口，在线程池中执行
+        """
+        return await asyncio.to_thread(self.get_article, topic_id, date)
+
+    def _write_requests(self, articles: List[dict]) -> List[dict]:
+        requests = []
+        for article in articles:
+            if not all([article.get('topic_id'), article.get('date'), article.get('title'), article.get('content')]):
+                logger.error(f"Missing required fields for article save, skipping {article.get('topic_id')}")
+                continue
+            requests.append({'PutRequest': {'Item': _serialize(self._article_item(**article))}})
+        return requests
+
+    def _unprocessed_writes(self, pending: List[dict], response: dict):
+        # 未处理的条目说明表正在限流，抛出ThrottledError交给rate_limit退避重试，下次只发送剩余条目
+        pending[:] = response.get('UnprocessedItems', {}).get(self.table_name, [])
+        if pending:
+            raise ThrottledError(f"{len(pending)} articles unprocessed")
+
+    def save_articles(self, articles: List[dict]) -> bool:
+        """
+        批量保存文章，每次batch_write_item最多写入25条，未处理的条目经rate_limit退避重试
+
+        Args:
+            articles (list): 每个元素是save_article的参数字典
+
+        Returns:
+            bool: 是否全部保存成功
+        """
+        requests = self._write_requests(articles)
+        logger.info(f"Batch saving {len(requests)} articles to DynamoDB")
+        try:
+            for start in range(0, len(requests), BATCH_WRITE_SIZE):
+                pending = requests[start:start + BATCH_WRITE_SIZE]
+
+                def write():
+                    response = self.client.batch_write_item(RequestItems={self.table_name: pending})
+                    self._unprocessed_writes(pending, response)
+
+                call("dynamodb", write)
+            return len(requests) == len(articles)
+
+        except ThrottledError as e:
+            logger.error(f"Gave up on unprocessed articles: {str(e)}")
+            return False
+        except Exception as e:
+            logger.error(f"Failed to batch save articles to DynamoDB: {str(e)}", exc_info=True)
+            return False
+
+    async def asave_articles(self, articles: List[dict]) -> bool:
+        """
+        save_articles的异步版本，请求在线程池中执行，重试的退避在事件循环上等待
+        """
+        requests = self._write_requests(articles)
+        logger.info(f"Batch saving {len(requests)} articles to DynamoDB")
+        try:
+            for start in range(0, len(requests), BATCH_WRITE_SIZE):
+                pending = requests[start:start + BATCH_WRITE_SIZE]
+
+                async def write():
+                    response = await asyncio.to_thread(self.client.batch_write_item,
+                                                       RequestItems={self.table_name: pending})
+                    self._unprocessed_writes(pending, response)
+
+                await acall("dynamodb", write)
+            return len(requests) == len(articles)
+
+        except ThrottledError as e:
+            logger.error(f"Gave up on unprocessed articles: {str(e)}")
+            return False
+        except Exception as e:
+            logger.error(f"Failed to batch save articles to DynamoDB: {str(e)}", exc_info=True)
+            return False
+
+    def _collect_articles(self, pending: dict, response: dict, articles: Dict[Tuple[str, str], dict]):
+        for item in response.get('Responses', {}).get(self.table_name, []):
+            article = _deserialize(item)
+            articles[(article['topic_id'], article['date'])] = article
+        # 同save_articles，未处理的键交给rate_limit退避重试
+        pending.clear()
+        pending.update(response.get('UnprocessedKeys') or {})
+        if pending:
+            raise ThrottledError(f"{len(pending[self.table_name]['Keys'])} keys unprocessed")
+
+    def get_articles(self, keys: List[Tuple[str, str]]) -> Dict[Tuple[str, str], dict]:
+        """
+        批量获取文章，每次batch_get_item最多读取100条，未处理的键经rate_limit退避重试
+
+        Args:
+            keys (list): (topic_id, date)元组列表
+
+        Returns:
+            dict: (topic_id, date) -> 文章数据，不存在的文章不在结果中
+        """
+        unique_keys = list(dict.fromkeys(keys))
+        articles = {}
+        logger.info(f"Batch retrieving {len(unique_keys)} articles from DynamoDB")
+        try:
+            for start in range(0, len(unique_keys), BATCH_GET_SIZE):
+                pending = {self.table_name: {'Keys': [self._key(topic_id, date)
+                                                      for topic_id, date in unique_keys[start:start + BATCH_GET_SIZE]]}}
+
+                def read():
+                    self._collect_articles(pending, self.client.batch_get_item(RequestItems=pending), articles)
+
+                try:
+                    call("dynamodb", read)
+                except ThrottledError:
+                    logger.error("Gave up on unprocessed keys, returning partial result")
+            return articles
+
+        except Exception as e:
+            logger.error(f"Failed to batch retrieve articles from DynamoDB: {str(e)}")
+            return articles
+
+    async def aget_articles(self, keys: List[Tuple[str, str]]) -> Dict[Tuple[str, str], dict]:
+        """
+        get_articles的异步版本，请求在线程池中执行，重试的退避在事件循环上等待
+        """
+        unique_keys = list(dict.fromkeys(keys))
+        articles = {}
+        logger.info(f"Batch retrieving {len(unique_keys)} articles from DynamoDB")
+        try:
+            for start in range(0, len(unique_keys), BATCH_GET_SIZE):
+                pending = {self.table_name: {'Keys': [self._key(topic_id, date)
+                                                      for topic_id, date in unique_keys[start:start + BATCH_GET_SIZE]]}}
+
+                async def read():
+                    response = await asyncio.to_thread(self.client.batch_get_item, RequestItems=pending)
+                    self._collect_articles(pending, response, articles)
+
+                try:
+                    await acall("dynamodb", read)
+                except ThrottledError:
+                    logger.error("Gave up on unprocessed keys, returning partial result")
+            return articles
+
+        except Exception as e:
+            logger.error(f"Failed to batch retrieve articles from DynamoDB: {str(e)}")
+            return articles
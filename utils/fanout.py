@@ -0,0 +1,209 @@
+import asyncio
+import logging
+import math
+import threading
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+# from ..config.setting import FETCH_QUORUM, FETCH_DEADLINE, FETCH_HEDGE_PERCENTILE
+# from ..config.setting import DRAFT_QUORUM, DRAFT_DEADLINE, DRAFT_HEDGE_PERCENTILE, HEDGE_MIN_SAMPLES
+from config.setting import FETCH_QUORUM, FETCH_DEADLINE, FETCH_HEDGE_PERCENTILE
+from config.setting import DRAFT_QUORUM, DRAFT_DEADLINE, DRAFT_HEDGE_PERCENTILE, HEDGE_MIN_SAMPLES
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class FanoutPolicy:
+    # proceed once this many members succeeded, None waits for all of them
+    quorum: Optional[int] = None
+    # seconds after the first member was submitted at which to proceed with what is done
+    deadline: Optional[float] = None
+    # send a duplicate request for members running longer than this latency
+    # percentile (0-1] of recent successful members, None disables hedging
+    hedge_percentile: Optional[float] = None
+    # successful samples needed before hedging starts
+    hedge_min_samples: int = HEDGE_MIN_SAMPLES
+
+    @property
+    def active(self) -> bool:
+        return self.quorum is not None or self.deadline is not None or self.hedge_percentile is not None
+
+
+FETCH_POLICY = FanoutPolicy(quorum=FETCH_QUORUM, deadline=FETCH_DEADLINE, hedge_percentile=FETCH_HEDGE_PERCENTILE)
+DRAFT_POLICY = FanoutPolicy(quorum=DRAFT_QUORUM, deadline=DRAFT_DEADLINE, hedge_percentile=DRAFT_HEDGE_PERCENTILE)
+
+
+class LatencyTracker:
+    """Sliding window of recent successful latencies of one fan-out stage."""
+
+    def __init__(self, window: int = 200):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, q: float, min_samples: int) -> Optional[float]:
+        with self._lock:
+            if len(self._samples) < min_samples:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))]
+
+
+_trackers: Dict[str, LatencyTracker] = {}
+_trackers_lock = threading.Lock()
+
+
+def get_tracker(name: str) -> LatencyTracker:
+    """Return the latency tracker of a fan-out stage, shared by every topic in the process."""
+    with _trackers_lock:
+        if name not in _trackers:
+            _trackers[name] = LatencyTracker()
+        return _trackers[name]
+
+
+def _not_none(result: Any) -> bool:
+    return result is not None
+
+
+class Fanout:
+    """
+    Run a group of coroutines under a quorum/deadline/hedging policy.
+
+    Members are submitted as factories so a straggler can be started again as
+    a hedged duplicate; the first attempt of a member to succeed wins and the
+    other one is cancelled. wait() returns as soon as the quorum is reached,
+    the deadline expires or every member finished, and cancels whatever is
+    still running before returning, so late results are never leaked.
+    """
+
+    def __init__(self, policy: FanoutPolicy, name: str, is_success: Callable[[Any], bool] = _not_none):
+        self.policy = policy
+        self.name = name
+        self.is_success = is_success
+        self.tracker = get_tracker(name)
+        self._loop = asyncio.get_running_loop()
+        # the deadline counts from the first member, not from construction, so
+        # work done before the first submit (e.g. fetching pages) is not charged
+        self._started: Optional[float] = None
+        self._factories: List[Callable[[], Awaitable[Any]]] = []
+        self._results: List[Any] = []
+        self._attempts: Dict[int, List[asyncio.Future]] = {}
+        self._task_info: Dict[asyncio.Future, tuple] = {}
+        self.hedged = 0
+
+    def submit(self, factory: Callable[[], Awaitable[Any]]) -> int:
+        """Start a member and return its index in the results of wait()."""
+        index = len(self._factories)
+        if self._started is None:
+            self._started = self._loop.time()
+        self._factories.append(factory)
+        self._results.append(None)
+        self._start(index)
+        return index
+
+    def _start(self, index: int):
+        task = asyncio.ensure_future(self._factories[index]())
+        self._attempts.setdefault(index, []).append(task)
+        self._task_info[task] = (index, self._loop.time())
+
+    def _hedge(self, threshold: float, finished: set):
+        now = self._loop.time()
+        for index, attempts in self._attempts.items():
+            if index in finished or len(attempts) > 1:
+                continue
+            started = self._task_info[attempts[0]][1]
+            if now - started >= threshold:
+                logger.info(f"{self.name}: hedging member {index} after {now - started:.1f}s")
+                self._start(index)
+                self.hedged += 1
+
+    async def wait(self) -> List[Any]:
+        """Wait according to the policy, results are None for members that did not succeed in time."""
+        total = len(self._factories)
+        quorum = min(self.policy.quorum, total) if self.policy.quorum else total
+        finished = set()
+        successes = 0
+        try:
+            while successes < quorum:
+                pending = [task for task in self._task_info if not task.done()]
+                if not pending:
+                    break
+
+                now = self._loop.time()
+                timeout = None
+                if self.policy.deadline is not None:
+                    timeout = self._started + self.policy.deadline - now
+                    if timeout <= 0:
+                        logger.warning(f"{self.name}: deadline of {self.policy.deadline}s reached with "
+                                       f"{successes}/{total} members done")
+                        break
+
+                threshold = None
+                if self.policy.hedge_percentile is not None:
+                    threshold = self.tracker.percentile(self.policy.hedge_percentile, self.policy.hedge_min_samples)
+                if threshold is not None:
+                    self._hedge(threshold, finished)
+                    # wake up again when the next single-attempt member crosses the threshold
+                    next_hedges = [self._task_info[attempts[0]][1] + threshold - now
+                                   for index, attempts in self._attempts.items()
+                                   if index not in finished and len(attempts) == 1]
+                    if next_hedges:
+                        timeout = max(0.0, min(next_hedges)) if timeout is None else min(timeout, max(0.0, min(next_hedges)))
+                    pending = [task for task in self._task_info if not task.done()]
+
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    index, started = self._task_info[task]
+                    if index in finished:
+                        continue
+                    result = None
+                    if not task.cancelled():
+                        if task.exception() is not None:
+                            logger.debug(f"{self.name}: member {index} failed: {task.exception()}")
+                        else:
+                            result = task.result()
+                    if self.is_success(result):
+                        self.tracker.record(self._loop.time() - started)
+                        self._results[index] = result
+                        finished.add(index)
+                        successes += 1
+                        for sibling in self._attempts[index]:
+                            if sibling is not task:
+                                sibling.cancel()
+                    elif all(attempt.done() for attempt in self._attempts[index]):
+                        # keep the last failed result, e.g. None from a failed fetch
+                        self._results[index] = result
+                        finished.add(index)
+        finally:
+            leftovers = [task for task in self._task_info if not task.done()]
+            for task in leftovers:
+                task.cancel()
+            if leftovers:
+                await asyncio.gather(*leftovers, return_exceptions=True)
+                logger.info(f"{self.name}: cancelled {len(leftovers)} late members")
+
+        return list(self._results)
+
+
+async def run_fanout(factories: List[Callable[[], Awaitable[Any]]], policy: FanoutPolicy, name: str,
+                     is_success: Callable[[Any], bool] = _not_none) -> List[Any]:
+    """
+    Run factories under a fan-out policy and return their results in submission order.
+
+    Args:
+        factories: zero-argument callables returning a coroutine
+        policy: quorum, deadline and hedging settings
+        name: stage name, also selects the latency tracker used for hedging
+        is_success: whether a result counts towards the quorum
+
+    Returns:
+        list of results aligned with factories, None for members that did not finish
+    """
+    fanout = Fanout(policy, name, is_success)
+    for factory in factories:
+        fanout.submit(factory)
+    return await fanout.wait()
@@ -0,0 +1,100 @@
+import asyncio
+import logging
+import threading
+import weakref
+from typing import TYPE_CHECKING, Optional
+# from ..config.setting import FETCH_MAX_CONNECTIONS, FETCH_MAX_PER_HOST, FETCH_DNS_CACHE_TTL, FETCH_KEEPALIVE_TIMEOUT, FETCH_TIMEOUT
+from config.setting import FETCH_MAX_CONNECTIONS, FETCH_MAX_PER_HOST, FETCH_DNS_CACHE_TTL, FETCH_KEEPALIVE_TIMEOUT, FETCH_TIMEOUT
+
+if TYPE_CHECKING:
+    import aiohttp
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (compatible; news_agent/0.1)",
+    "Accept": "text/html,application/xhtml+xml;q=0.9,*/*;q=0.8",
+}
+
+
+class FetchClient:
+    """
+    Long-lived aiohttp sessions shared by every page fetch in the process.
+
+    The connector keeps TCP/TLS connections alive between requests, caches DNS
+    lookups and caps both the total number of connections and the number of
+    connections per publisher host. An aiohttp session is bound to the event
+    loop it was created on, so each loop gets its own session: the runner's
+    loop, the daemon's loop and the throwaway loops of sync nodes never close
+    or replace each other's session. aiohttp itself is imported with the
+    first session.
+    """
+
+    def __init__(self, limit: int = FETCH_MAX_CONNECTIONS, limit_per_host: int = FETCH_MAX_PER_HOST,
+                 dns_cache_ttl: int = FETCH_DNS_CACHE_TTL, keepalive_timeout: float = FETCH_KEEPALIVE_TIMEOUT,
+                 timeout: float = FETCH_TIMEOUT):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.dns_cache_ttl = dns_cache_ttl
+        self.keepalive_timeout = keepalive_timeout
+        self.timeout = timeout
+        # session of each event loop, an entry goes away with its loop
+        self._sessions: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, aiohttp.ClientSession]" = \
+            weakref.WeakKeyDictionary()
+        # loops of different threads look up and add sessions at the same time
+        self._lock = threading.Lock()
+
+    async def session(self) -> "aiohttp.ClientSession":
+        """Return the session of the running loop, creating it if needed."""
+        import aiohttp
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            session = self._sessions.get(loop)
+        if session is not None and not session.closed:
+            return session
+
+        # nothing is awaited between the check above and the assignment below,
+        # so concurrent callers on the same loop cannot create two sessions
+        connector = aiohttp.TCPConnector(
+            limit=self.limit,
+            limit_per_host=self.limit_per_host,
+            ttl_dns_cache=self.dns_cache_ttl,
+            keepalive_timeout=self.keepalive_timeout,
+        )
+        session = aiohttp.ClientSession(
+            connector=connector,
+            headers=DEFAULT_HEADERS,
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+        )
+        with self._lock:
+            self._sessions[loop] = session
+        logger.info(f"Created fetch client: limit={self.limit}, limit_per_host={self.limit_per_host}, "
+                    f"dns_cache_ttl={self.dns_cache_ttl}s")
+        return session
+
+    async def close(self):
+        """Close the session of the running loop and release its pooled connections."""
+        with self._lock:
+            session = self._sessions.pop(asyncio.get_running_loop(), None)
+        if session is not None and not session.closed:
+            await session.close()
+            logger.info("Closed fetch client")
+
+
+_fetch_client: Optional[FetchClient] = None
+_fetch_client_lock = threading.Lock()
+
+
+def get_fetch_client() -> FetchClient:
+    """Return the process-wide fetch client."""
+    global _fetch_client
+    with _fetch_client_lock:
+        if _fetch_client is None:
+            _fetch_client = FetchClient()
+        return _fetch_client
+
+
+async def close_fetch_client():
+    """Close the fetch session of the running loop, call once before the event loop shuts down."""
+    if _fetch_client is not None:
+        await _fetch_client.close()
@@ -0,0 +1,204 @@
+import asyncio
+import io
+import logging
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, List, Optional, Sequence, Tuple
+# from ..config.setting import IMAGE_FORMAT, IMAGE_QUALITY, IMAGE_THUMBNAIL_WIDTHS
+# from ..config.setting import IMAGE_EXECUTOR, IMAGE_MAX_WORKERS
+from config.setting import IMAGE_FORMAT, IMAGE_QUALITY, IMAGE_THUMBNAIL_WIDTHS
+from config.setting import IMAGE_EXECUTOR, IMAGE_MAX_WORKERS
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+IMAGE_FORMATS = {
+    # format: (Pillow format name, file extension, content type)
+    "webp": ("WEBP", "webp", "image/webp"),
+    "jpeg": ("JPEG", "jpg", "image/jpeg"),
+}
+IMAGE_EXECUTOR_KINDS = ("process", "thread", "inline")
+# leading bytes of the encoded formats: (signature, file extension, content type)
+IMAGE_SIGNATURES = (
+    (b"\x89PNG\r\n\x1a\n", "png", "image/png"),
+    (b"\xff\xd8\xff", "jpg", "image/jpeg"),
+    (b"GIF87a", "gif", "image/gif"),
+    (b"GIF89a", "gif", "image/gif"),
+)
+
+
+@dataclass
+class ImageVariant:
+    # "full" for the re-encoded original, "w<width>" for thumbnails
+    name: str
+    width: int
+    extension: str
+    content_type: str
+    data: bytes
+
+
+def sniff_image_type(image_bytes: bytes) -> Tuple[str, str]:
+    """
+    File extension and content type of encoded image bytes, read from their signature.
+
+    Args:
+        image_bytes: encoded image
+
+    Returns:
+        (extension, content type), PNG, what the image model returns, when the format is unknown
+    """
+    if image_bytes[:4] == b"RIFF" and image_bytes[8:12] == b"WEBP":
+        return "webp", "image/webp"
+    for signature, extension, content_type in IMAGE_SIGNATURES:
+        if image_bytes.startswith(signature):
+            return extension, content_type
+    return "png", "image/png"
+
+
+def _encode(image: "Image.Image", fmt: str, quality: int) -> bytes:
+    pil_format = IMAGE_FORMATS[fmt][0]
+    if pil_format == "JPEG" and image.mode != "RGB":
+        # JPEG has no alpha channel
+        image = image.convert("RGB")
+    buffer = io.BytesIO()
+    image.save(buffer, pil_format, quality=quality, optimize=True)
+    return buffer.getvalue()
+
+
+def encode_variants(image_bytes: bytes, fmt: str = IMAGE_FORMAT, quality: int = IMAGE_QUALITY,
+                    widths: Sequence[int] = IMAGE_THUMBNAIL_WIDTHS) -> List[ImageVariant]:
+    """
+    Re-encode an image and render its thumbnails, module level so it can run in a worker process.
+
+    Args:
+        image_bytes: source image, any format Pillow reads
+        fmt: output format, "webp" or "jpeg"
+        quality: encoder quality (1-100)
+        widths: thumbnail widths, widths not smaller than the source are skipped
+
+    Returns:
+        the full-size variant followed by one variant per thumbnail width
+    """
+    if fmt not in IMAGE_FORMATS:
+        raise ValueError(f"Unknown image format '{fmt}', expected one of {tuple(IMAGE_FORMATS)}")
+    _, extension, content_type = IMAGE_FORMATS[fmt]
+    # imported here, Pillow is only loaded by the process that encodes
+    from PIL import Image
+
+    with Image.open(io.BytesIO(image_bytes)) as source:
+        source.load()
+        if source.mode not in ("RGB", "RGBA"):
+            source = source.convert("RGBA" if "A" in source.getbands() else "RGB")
+        variants = [ImageVariant("full", source.width, extension, content_type, _encode(source, fmt, quality))]
+        for width in sorted(set(widths)):
+            if width >= source.width:
+                continue
+            height = max(1, round(source.height * width / source.width))
+            thumbnail = source.resize((width, height), Image.LANCZOS)
+            variants.append(ImageVariant(f"w{width}", width, extension, content_type, _encode(thumbnail, fmt, quality)))
+    return variants
+
+
+_image_executors = {}
+
+
+def get_image_executor(kind: str = IMAGE_EXECUTOR) -> Optional[Executor]:
+    """
+    Return the shared executor used for image encoding.
+
+    Args:
+        kind: "process" (default, encoding is CPU bound), "thread", or "inline".
+              Worker processes are started with forkserver like the extract executor
+
+    Returns:
+        Executor instance, None for inline encoding
+    """
+    if kind not in IMAGE_EXECUTOR_KINDS:
+        raise ValueError(f"Unknown image executor '{kind}', expected one of {IMAGE_EXECUTOR_KINDS}")
+    if kind == "inline":
+        return None
+    if kind not in _image_executors:
+        if kind == "process":
+            # not fork: by now the process runs threads whose locks a forked child would inherit
+            method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            _image_executors[kind] = ProcessPoolExecutor(max_workers=IMAGE_MAX_WORKERS,
+                                                         mp_context=multiprocessing.get_context(method))
+        else:
+            _image_executors[kind] = ThreadPoolExecutor(max_workers=IMAGE_MAX_WORKERS,
+                                                        thread_name_prefix="image")
+        logger.info(f"Created {kind} image executor with max_workers={IMAGE_MAX_WORKERS or 'default'}")
+    return _image_executors[kind]
+
+
+def shutdown_image_executor():
+    """Shut down every image executor created by get_image_executor."""
+    while _image_executors:
+        kind, executor = _image_executors.popitem()
+        executor.shutdown(wait=True)
+        logger.info(f"Shut down {kind} image executor")
+
+
+def _log_variants(source_size: int, variants: List[ImageVariant]):
+    sizes = ", ".join(f"{v.name}={len(v.data)}" for v in variants)
+    logger.info(f"Encoded {len(variants)} image variants from {source_size} bytes: {sizes}")
+
+
+def process_image(image_bytes: bytes) -> List[ImageVariant]:
+    """
+    Encode an image into its variants on the image executor.
+
+    Args:
+        image_bytes: generated image
+
+    Returns:
+        list of ImageVariant, empty if encoding failed
+    """
+    if not image_bytes:
+        logger.error("No image data provided for processing")
+        return []
+    try:
+        executor = get_image_executor()
+        if executor is None:
+            variants = encode_variants(image_bytes)
+        else:
+            variants = executor.submit(encode_variants, image_bytes).result()
+    except Exception as e:
+        logger.error(f"Failed to process image: {str(e)}", exc_info=True)
+        return []
+    _log_variants(len(image_bytes), variants)
+    return variants
+
+
+async def aprocess_image(image_bytes: bytes) -> List[ImageVariant]:
+    """process_image without blocking the event loop."""
+    if not image_bytes:
+        logger.error("No image data provided for processing")
+        return []
+    try:
+        executor = get_image_executor()
+        if executor is None:
+            variants = encode_variants(image_bytes)
+        else:
+            variants = await asyncio.get_running_loop().run_in_executor(executor, encode_variants, image_bytes)
+    except Exception as e:
+        logger.error(f"Failed to process image: {str(e)}", exc_info=True)
+        return []
+    _log_variants(len(image_bytes), variants)
+    return variants
+
+
+def download_image(image_url: str) -> Optional[bytes]:
+    """Download an image to re-encode it, used when the generator only returned a URL."""
+    if not image_url:
+        return None
+    import requests
+    try:
+        response = requests.get(image_url, timeout=10)
+        response.raise_for_status()
+        return response.content
+    except requests.RequestException as e:
+        logger.error(f"Failed to download image from {image_url}: {str(e)}")
+        return None
@@ -0,0 +1,112 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Dict, Optional
+# from ..config.setting import LLM_CACHE_ENABLED, LLM_CACHE_PATH, LLM_CACHE_TTL, LLM_CACHE_MAX_ENTRIES
+from config.setting import LLM_CACHE_ENABLED, LLM_CACHE_PATH, LLM_CACHE_TTL, LLM_CACHE_MAX_ENTRIES
+
+logger = logging.getLogger(__name__)
+
+
+def make_key(model: str, params: Dict[str, Any], prompt: Any) -> str:
+    """Hash of everything that determines an LLM response."""
+    payload = json.dumps({"model": model, "params": params, "prompt": prompt},
+                         sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """
+    Exact-match cache of LLM responses stored in SQLite.
+
+    Responses are stored as text under make_key(model, params, prompt), callers
+    serialize structured output themselves. Entries older than ttl are ignored
+    and purged, and the least recently used entries are evicted once the cache
+    holds more than max_entries. Hits and misses are counted per call site.
+    """
+
+    def __init__(self, path: str = LLM_CACHE_PATH, ttl: float = LLM_CACHE_TTL,
+                 max_entries: int = LLM_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._stats = defaultdict(lambda: {"hits": 0, "misses": 0})
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    call_site TEXT NOT NULL,
+                    response TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses(last_access)")
+            self._conn.execute("DELETE FROM responses WHERE created_at < ?", (time.time() - ttl,))
+        logger.info(f"LLMResponseCache initialized at {path}, ttl={ttl}s, max_entries={max_entries}")
+
+    def get(self, call_site: str, key: str) -> Optional[str]:
+        """Return the cached response for a key, None on miss."""
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT response FROM responses WHERE key = ? AND created_at >= ?",
+                (key, now - self.ttl)
+            ).fetchone()
+            if row is not None:
+                self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            self._stats[call_site]["hits" if row is not None else "misses"] += 1
+        if row is not None:
+            logger.debug(f"LLM cache hit for {call_site}")
+            return row[0]
+        return None
+
+    def put(self, call_site: str, key: str, response: str):
+        """Store a successful response."""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, call_site, response, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, call_site, response, now, now)
+            )
+            count = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            if count > self.max_entries:
+                self._conn.execute(
+                    "DELETE FROM responses WHERE key IN "
+                    "(SELECT key FROM responses ORDER BY last_access LIMIT ?)",
+                    (count - self.max_entries,)
+                )
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Hits, misses and hit rate per call site."""
+        with self._lock:
+            return {
+                call_site: {**counts, "hit_rate": counts["hits"] / (counts["hits"] + counts["misses"])}
+                for call_site, counts in self._stats.items()
+            }
+
+
+_llm_cache: Optional[LLMResponseCache] = None
+_llm_cache_lock = threading.Lock()
+
+
+def get_llm_cache() -> Optional[LLMResponseCache]:
+    """Return the process-wide LLM response cache, None if LLM_CACHE_ENABLED is off."""
+    global _llm_cache
+    if not LLM_CACHE_ENABLED:
+        return None
+    with _llm_cache_lock:
+        if _llm_cache is None:
+            _llm_cache = LLMResponseCache()
+    return _llm_cache
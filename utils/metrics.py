@@ -0,0 +1,467 @@
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+# from ..config.setting import METRICS_ENABLED
+from config.setting import METRICS_ENABLED
+
+logger = logging.getLogger(__name__)
+
+
+# In-process metrics of graph nodes and provider calls.
+#
+# Everything is aggregated into counters and histograms labelled by node,
+# topic and provider, rendered in the Prometheus text format, and also
+# collected per batch into a JSON RunReport while a run_report() is active.
+# With METRICS_ENABLED=false every record_* function returns immediately and
+# node wrappers are not installed at all.
+
+# seconds, from a cached page lookup to a slow image generation
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+# topic of the node being run, inherited by the provider calls it makes
+current_topic: ContextVar[Optional[str]] = ContextVar("current_topic", default=None)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_values(labelnames: Sequence[str], labels: dict) -> Tuple[str, ...]:
+    return tuple("" if labels.get(name) is None else str(labels[name]) for name in labelnames)
+
+
+def _format_labels(labelnames: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = _label_values(self.labelnames, labels)
+        with self._lock:
+            self._values[key] += amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value:g}")
+        return lines
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [count per bucket..., count above the last bucket, sum]
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = _label_values(self.labelnames, labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            values = self._values.get(key)
+            if values is None:
+                values = self._values[key] = [0.0] * (len(self.buckets) + 2)
+            values[index] += 1
+            values[-1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, values in sorted(self._values.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, values):
+                    cumulative += count
+                    le = 'le="%g"' % bound
+                    lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative:g}")
+                cumulative += values[len(self.buckets)]
+                le = 'le="+Inf"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative:g}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {values[-1]:g}")
+                lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative:g}")
+        return lines
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        metric = Counter(name, documentation, labelnames)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        return "\n".join(line for metric in self.metrics for line in metric.render()) + "\n"
+
+    def clear(self):
+        for metric in self.metrics:
+            metric.clear()
+
+
+REGISTRY = Registry()
+
+NODE_DURATION = REGISTRY.histogram(
+    "news_node_duration_seconds", "Wall time of graph nodes.", ("node", "topic", "status"))
+NODE_QUEUE_WAIT = REGISTRY.histogram(
+    "news_node_queue_wait_seconds", "Time a node waited between becoming runnable and starting.", ("node", "topic"))
+PROVIDER_DURATION = REGISTRY.histogram(
+    "news_provider_request_seconds", "Duration of each outbound call attempt.", ("provider", "outcome"))
+PROVIDER_QUEUE_WAIT = REGISTRY.histogram(
+    "news_provider_queue_wait_seconds", "Time spent waiting for the provider rate limiter.", ("provider",))
+PROVIDER_RETRIES = REGISTRY.counter(
+    "news_provider_retries_total", "Outbound calls retried after a transient failure.", ("provider",))
+PROVIDER_THROTTLED = REGISTRY.counter(
+    "news_provider_throttled_total", "Outbound calls rejected with 429 or a throttling error.", ("provider",))
+LLM_TOKENS = REGISTRY.counter(
+    "news_llm_tokens_total", "LLM tokens reported by the provider.", ("provider", "call_site", "topic", "kind"))
+FETCH_BYTES = REGISTRY.counter(
+    "news_fetch_bytes_total", "Bytes of publisher pages downloaded.", ("topic",))
+EXTRACTIONS = REGISTRY.counter(
+    "news_extractions_total", "Page extractions by outcome.", ("topic", "outcome"))
+
+
+def _percentile(samples: List[float], q: float) -> Optional[float]:
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 4)
+
+
+def _summary(samples: List[float]) -> dict:
+    return {
+        "count": len(samples),
+        "total": round(sum(samples), 4),
+        "p50": _percentile(samples, 0.5),
+        "p95": _percentile(samples, 0.95),
+        "max": round(max(samples), 4) if samples else None,
+    }
+
+
+class RunReport:
+    """Raw observations of one batch, summarized per topic and per provider by to_dict."""
+
+    def __init__(self, name: Optional[str] = None):
+        self.name = name
+        self.started_at = time.time()
+        self.finished_at: Optional[float] = None
+        self._lock = threading.Lock()
+        self._topics = defaultdict(lambda: {
+            "run_id": None,
+            "nodes": defaultdict(lambda: {"seconds": [], "queue_wait": [], "errors": 0}),
+            "llm_tokens": defaultdict(lambda: {"prompt": 0, "completion": 0}),
+            "fetch_bytes": 0,
+            "extractions": defaultdict(int),
+        })
+        self._providers = defaultdict(lambda: {"seconds": [], "queue_wait": [], "errors": 0,
+                                               "retries": 0, "throttled": 0})
+
+    def add_node(self, topic, run_id, node, seconds, queue_wait, ok):
+        with self._lock:
+            entry = self._topics[topic]
+            entry["run_id"] = run_id or entry["run_id"]
+            stats = entry["nodes"][node]
+            stats["seconds"].append(seconds)
+            if queue_wait is not None:
+                stats["queue_wait"].append(queue_wait)
+            stats["errors"] += 0 if ok else 1
+
+    def add_provider(self, provider, seconds=None, queue_wait=None, error=False, retry=False, throttled=False):
+        with self._lock:
+            stats = self._providers[provider]
+            if seconds is not None:
+                stats["seconds"].append(seconds)
+            if queue_wait is not None:
+                stats["queue_wait"].append(queue_wait)
+            stats["errors"] += int(error)
+            stats["retries"] += int(retry)
+            stats["throttled"] += int(throttled)
+
+    def add_tokens(self, topic, call_site, prompt, completion):
+        with self._lock:
+            tokens = self._topics[topic]["llm_tokens"][call_site]
+            tokens["prompt"] += prompt
+            tokens["completion"] += completion
+
+    def add_fetch(self, topic, size):
+        with self._lock:
+            self._topics[topic]["fetch_bytes"] += size
+
+    def add_extraction(self, topic, outcome):
+        with self._lock:
+            self._topics[topic]["extractions"][outcome] += 1
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            topics = {}
+            for topic, entry in self._topics.items():
+                extractions = dict(entry["extractions"])
+                attempted = sum(extractions.values())
+                topics[topic] = {
+                    "run_id": entry["run_id"],
+                    # time spent inside nodes, parallel branches add up
+                    "node_seconds": round(sum(sum(n["seconds"]) for n in entry["nodes"].values()), 4),
+                    "nodes": {node: {**_summary(stats["seconds"]), "errors": stats["errors"],
+                                     "queue_wait": _summary(stats["queue_wait"])}
+                              for node, stats in entry["nodes"].items()},
+                    "llm_tokens": {call_site: dict(tokens) for call_site, tokens in entry["llm_tokens"].items()},
+                    "fetch_bytes": entry["fetch_bytes"],
+                    "extractions": extractions,
+                    "extraction_success_rate": round(extractions.get("success", 0) / attempted, 4) if attempted else None,
+                }
+            providers = {provider: {**_summary(stats["seconds"]), "queue_wait": _summary(stats["queue_wait"]),
+                                    "errors": stats["errors"], "retries": stats["retries"],
+                                    "throttled": stats["throttled"]}
+                         for provider, stats in self._providers.items()}
+        finished_at = self.finished_at or time.time()
+        return {
+            "name": self.name,
+            "started_at": self.started_at,
+            "elapsed_seconds": round(finished_at - self.started_at, 4),
+            "llm_tokens": {
+                "prompt": sum(t["prompt"] for topic in topics.values() for t in topic["llm_tokens"].values()),
+                "completion": sum(t["completion"] for topic in topics.values() for t in topic["llm_tokens"].values()),
+            },
+            "topics": topics,
+            "providers": providers,
+        }
+
+    def write(self, path: str):
+        """Write the report as JSON."""
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+
+
+_report: ContextVar[Optional[RunReport]] = ContextVar("run_report", default=None)
+
+
+@contextmanager
+def run_report(name: Optional[str] = None) -> Iterator[RunReport]:
+    """Collect everything recorded in this context (and the tasks and threads it starts) into a RunReport."""
+    report = RunReport(name)
+    token = _report.set(report)
+    try:
+        yield report
+    finally:
+        report.finished_at = time.time()
+        _report.reset(token)
+
+
+class _StepClock:
+    """
+    When each superstep of a topic's graph finished.
+
+    A node of step N becomes runnable when the last node of step N-1
+    finishes, so its queue wait is its start minus that time. The first
+    node is measured from mark_submitted.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._submitted: Dict[str, float] = {}
+        self._ends: Dict[str, Dict[int, float]] = {}
+
+    def submitted(self, key: str, at: float):
+        with self._lock:
+            self._submitted[key] = at
+            self._ends.pop(key, None)
+
+    def ready(self, key: str, step: Optional[int]) -> Optional[float]:
+        with self._lock:
+            ends = self._ends.get(key, {})
+            if step is not None and step - 1 in ends:
+                return ends[step - 1]
+            if not ends:
+                return self._submitted.get(key)
+            return None
+
+    def finished(self, key: str, step: Optional[int], at: float):
+        if step is None:
+            return
+        with self._lock:
+            ends = self._ends.setdefault(key, {})
+            ends[step] = max(ends.get(step, at), at)
+            for old in [s for s in ends if s < step - 1]:
+                del ends[old]
+
+
+_steps = _StepClock()
+
+
+def mark_submitted(topic: str):
+    """Record that a topic's run was queued, its first node's queue wait is measured from here."""
+    if METRICS_ENABLED:
+        _steps.submitted(topic, time.monotonic())
+
+
+@contextmanager
+def track_node(state, config: Optional[dict] = None):
+    """
+    Time a graph node and make its topic the label of everything recorded inside.
+
+    Args:
+        state: the node input, its "topic" and "run_id" label the measurement
+        config: the RunnableConfig langgraph passes to the node
+    """
+    metadata = (config or {}).get("metadata", {})
+    node = metadata.get("langgraph_node", "unknown")
+    step = metadata.get("langgraph_step")
+    topic = state.get("topic") if isinstance(state, dict) else None
+    run_id = state.get("run_id") if isinstance(state, dict) else None
+    key = topic or ""
+    start = time.monotonic()
+    ready = _steps.ready(key, step)
+    queue_wait = max(0.0, start - ready) if ready is not None else None
+    token = current_topic.set(topic)
+    ok = False
+    try:
+        yield
+        ok = True
+    finally:
+        current_topic.reset(token)
+        end = time.monotonic()
+        _steps.finished(key, step, end)
+        NODE_DURATION.observe(end - start, node=node, topic=topic, status="ok" if ok else "error")
+        if queue_wait is not None:
+            NODE_QUEUE_WAIT.observe(queue_wait, node=node, topic=topic)
+        report = _report.get()
+        if report is not None:
+            report.add_node(topic, run_id, node, end - start, queue_wait, ok)
+
+
+def _base_provider(provider: str) -> str:
+    # per-host limiters such as fetch:example.com are aggregated per provider
+    return provider.split(":", 1)[0]
+
+
+def record_provider_call(provider: str, seconds: float, queue_wait: float, ok: bool):
+    if not METRICS_ENABLED:
+        return
+    provider = _base_provider(provider)
+    PROVIDER_DURATION.observe(seconds, provider=provider, outcome="ok" if ok else "error")
+    PROVIDER_QUEUE_WAIT.observe(queue_wait, provider=provider)
+    report = _report.get()
+    if report is not None:
+        report.add_provider(provider, seconds, queue_wait, error=not ok)
+
+
+def record_retry(provider: str, throttled: bool):
+    if not METRICS_ENABLED:
+        return
+    provider = _base_provider(provider)
+    PROVIDER_RETRIES.inc(provider=provider)
+    if throttled:
+        PROVIDER_THROTTLED.inc(provider=provider)
+    report = _report.get()
+    if report is not None:
+        report.add_provider(provider, retry=True, throttled=throttled)
+
+
+def record_tokens(provider: str, call_site: str, prompt_tokens: int, completion_tokens: int):
+    if not METRICS_ENABLED:
+        return
+    topic = current_topic.get()
+    LLM_TOKENS.inc(prompt_tokens, provider=provider, call_site=call_site, topic=topic, kind="prompt")
+    LLM_TOKENS.inc(completion_tokens, provider=provider, call_site=call_site, topic=topic, kind="completion")
+    report = _report.get()
+    if report is not None:
+        report.add_tokens(topic, call_site, prompt_tokens, completion_tokens)
+
+
+def record_fetch(size: int):
+    if not METRICS_ENABLED:
+        return
+    topic = current_topic.get()
+    FETCH_BYTES.inc(size, topic=topic)
+    report = _report.get()
+    if report is not None:
+        report.add_fetch(topic, size)
+
+
+def record_extraction(outcome: str):
+    """outcome is "success", "empty" (nothing extracted), "failed" (extractor raised) or "no_html"."""
+    if not METRICS_ENABLED:
+        return
+    topic = current_topic.get()
+    EXTRACTIONS.inc(topic=topic, outcome=outcome)
+    report = _report.get()
+    if report is not None:
+        report.add_extraction(topic, outcome)
+
+
+def render_prometheus() -> str:
+    """Current metrics in the Prometheus text exposition format."""
+    return REGISTRY.render()
+
+
+def write_prometheus(path: str):
+    """Write the metrics for the node_exporter textfile collector, atomically."""
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(render_prometheus())
+    os.replace(tmp_path, path)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+
+def serve_metrics(port: int, host: str = "0.0.0.0") -> ThreadingHTTPServer:
+    """Serve /metrics for Prometheus scraping from a daemon thread."""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    logger.info(f"Serving metrics on http://{host}:{port}/metrics")
+    return server
@@ -0,0 +1,197 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional
+# from .url_utils import canonicalize_url
+# from ..config.setting import PAGE_CACHE_ENABLED, PAGE_CACHE_DIR, PAGE_CACHE_TTL, PAGE_CACHE_MAX_BYTES
+from utils.url_utils import canonicalize_url
+from config.setting import PAGE_CACHE_ENABLED, PAGE_CACHE_DIR, PAGE_CACHE_TTL, PAGE_CACHE_MAX_BYTES
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CachedPage:
+    url: str
+    content_hash: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+    fetched_at: float
+    # still within the TTL, can be served without revalidation
+    fresh: bool
+
+
+def content_hash(html: str) -> str:
+    """Hash of the page body, used as the blob name."""
+    return hashlib.sha256(html.encode("utf-8", errors="replace")).hexdigest()
+
+
+class PageCache:
+    """
+    On-disk, content-addressed cache of fetched pages.
+
+    An SQLite index maps each canonical URL to the hash of its body and the
+    validators (ETag / Last-Modified) needed for a conditional GET. Bodies and
+    their trafilatura extraction are stored as files named after the content
+    hash, so syndicated URLs with the same body share one blob. When the pages
+    and their extractions together exceed max_bytes the least recently used
+    blobs are evicted.
+    """
+
+    def __init__(self, cache_dir: str = PAGE_CACHE_DIR, ttl: float = PAGE_CACHE_TTL,
+                 max_bytes: int = PAGE_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(os.path.join(cache_dir, "blobs"), exist_ok=True)
+        self._conn = sqlite3.connect(os.path.join(cache_dir, "index.db"), check_same_thread=False)
+        self._conn.executescript("""
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS pages (
+                url_key TEXT PRIMARY KEY,
+                content_hash TEXT NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                fetched_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS blobs (
+                content_hash TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                last_access REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS blobs_last_access ON blobs(last_access);
+        """)
+        logger.info(f"PageCache initialized at {cache_dir}, ttl={ttl}s, max_bytes={max_bytes}")
+
+    def _blob_path(self, digest: str, suffix: str) -> str:
+        return os.path.join(self.cache_dir, "blobs", digest[:2], f"{digest}.{suffix}")
+
+    def _write_file(self, path: str, data: str):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _read_file(self, path: str) -> Optional[str]:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def lookup(self, url: str) -> Optional[CachedPage]:
+        """Return the cache entry for a URL, None if the URL was never cached."""
+        url_key = canonicalize_url(url)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT content_hash, etag, last_modified, fetched_at FROM pages WHERE url_key = ?",
+                (url_key,)
+            ).fetchone()
+        if row is None:
+            return None
+        digest, etag, last_modified, fetched_at = row
+        return CachedPage(url=url_key, content_hash=digest, etag=etag, last_modified=last_modified,
+                          fetched_at=fetched_at, fresh=time.time() - fetched_at < self.ttl)
+
+    def get_html(self, digest: str) -> Optional[str]:
+        """Return the cached body for a content hash and mark it as recently used."""
+        html = self._read_file(self._blob_path(digest, "html"))
+        if html is not None:
+            with self._lock, self._conn:
+                self._conn.execute("UPDATE blobs SET last_access = ? WHERE content_hash = ?",
+                                   (time.time(), digest))
+        return html
+
+    def put(self, url: str, html: str, etag: Optional[str] = None, last_modified: Optional[str] = None) -> str:
+        """Store a freshly downloaded page and return its content hash."""
+        digest = content_hash(html)
+        path = self._blob_path(digest, "html")
+        wrote = not os.path.exists(path)
+        if wrote:
+            self._write_file(path, html)
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pages (url_key, content_hash, etag, last_modified, fetched_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (canonicalize_url(url), digest, etag, last_modified, now)
+            )
+            self._add_blob(digest, len(html.encode("utf-8", errors="replace")) if wrote else 0, now)
+        self.evict()
+        return digest
+
+    def revalidated(self, url: str, etag: Optional[str] = None, last_modified: Optional[str] = None):
+        """Restart the TTL of a URL after the server answered 304 Not Modified."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE pages SET fetched_at = ?, etag = COALESCE(?, etag), "
+                "last_modified = COALESCE(?, last_modified) WHERE url_key = ?",
+                (time.time(), etag, last_modified, canonicalize_url(url))
+            )
+
+    def get_text(self, digest: str) -> Optional[str]:
+        """Return the cached extraction result for a content hash."""
+        return self._read_file(self._blob_path(digest, "txt"))
+
+    def put_text(self, digest: str, text: str):
+        """Store the extraction result next to the raw page, counted in the size of its blob."""
+        path = self._blob_path(digest, "txt")
+        if os.path.exists(path):
+            return
+        self._write_file(path, text)
+        with self._lock, self._conn:
+            # also creates the row when the page itself was never stored or already evicted
+            self._add_blob(digest, len(text.encode("utf-8", errors="replace")), time.time())
+        self.evict()
+
+    def _add_blob(self, digest: str, size: int, now: float):
+        # size is the sum of the blob's .html and .txt files, each counted when it is written
+        self._conn.execute(
+            "INSERT INTO blobs (content_hash, size, last_access) VALUES (?, ?, ?) "
+            "ON CONFLICT(content_hash) DO UPDATE SET size = size + excluded.size, last_access = excluded.last_access",
+            (digest, size, now)
+        )
+
+    def evict(self):
+        """Remove least recently used blobs until the cache fits in max_bytes."""
+        with self._lock, self._conn:
+            total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            evicted = 0
+            for digest, size in self._conn.execute(
+                    "SELECT content_hash, size FROM blobs ORDER BY last_access").fetchall():
+                if total <= self.max_bytes:
+                    break
+                for suffix in ("html", "txt"):
+                    try:
+                        os.remove(self._blob_path(digest, suffix))
+                    except FileNotFoundError:
+                        pass
+                self._conn.execute("DELETE FROM blobs WHERE content_hash = ?", (digest,))
+                self._conn.execute("DELETE FROM pages WHERE content_hash = ?", (digest,))
+                total -= size
+                evicted += 1
+        logger.info(f"Evicted {evicted} pages from page cache")
+
+
+_page_cache: Optional[PageCache] = None
+_page_cache_lock = threading.Lock()
+
+
+def get_page_cache() -> Optional[PageCache]:
+    """Return the process-wide page cache, None if PAGE_CACHE_ENABLED is off."""
+    global _page_cache
+    if not PAGE_CACHE_ENABLED:
+        return None
+    # first called from to_thread workers of concurrent fetches
+    with _page_cache_lock:
+        if _page_cache is None:
+            _page_cache = PageCache()
+        return _page_cache
@@ -0,0 +1,95 @@
+import logging
+import re
+from typing import Dict, Iterable, List, Tuple
+import numpy as np
+# from .tokens import count_tokens, split_by_tokens
+from utils.tokens import count_tokens, split_by_tokens
+
+logger = logging.getLogger(__name__)
+
+_WORD_RE = re.compile(r"\w+")
+
+
+def _words(text: str) -> List[str]:
+    return _WORD_RE.findall(text.lower())
+
+
+def split_passages(text: str) -> List[str]:
+    """Split extracted text into non-empty paragraphs."""
+    return [p.strip() for p in re.split(r"\n+", text) if p.strip()]
+
+
+def bm25_scores(passages: List[str], query_terms: Iterable[str], k1: float = 1.5, b: float = 0.75) -> np.ndarray:
+    """
+    BM25 score of every passage against the query terms.
+
+    Passages are treated as the documents of the collection, so terms that
+    appear in every paragraph of the page weigh less. The term frequency
+    matrix only covers the query vocabulary and is scored in one numpy pass.
+    """
+    terms = list(dict.fromkeys(term for query in query_terms for term in _words(query)))
+    if not passages or not terms:
+        return np.zeros(len(passages))
+
+    term_index = {term: i for i, term in enumerate(terms)}
+    tf = np.zeros((len(passages), len(terms)))
+    lengths = np.zeros(len(passages))
+    for row, passage in enumerate(passages):
+        words = _words(passage)
+        lengths[row] = len(words)
+        for word in words:
+            column = term_index.get(word)
+            if column is not None:
+                tf[row, column] += 1
+
+    df = np.count_nonzero(tf, axis=0)
+    idf = np.log1p((len(passages) - df + 0.5) / (df + 0.5))
+    norm = k1 * (1 - b + b * lengths / max(lengths.mean(), 1.0))
+    return ((tf * (k1 + 1)) / (tf + norm[:, None]) * idf).sum(axis=1)
+
+
+def trim_to_budget(text: str, query_terms: Iterable[str], budget: int) -> Tuple[str, Dict[str, int]]:
+    """
+    Keep the passages most relevant to the query within a token budget.
+
+    Passages are taken by descending BM25 score until the budget is spent and
+    are returned in their original order. Passages that share no term with
+    the query are dropped, unless no passage matches at all, in which case
+    the leading passages are kept.
+
+    Args:
+        text: extracted page content
+        query_terms: topic name and keywords
+        budget: maximum number of tokens to keep
+
+    Returns:
+        (trimmed text, {"original_tokens": ..., "trimmed_tokens": ...})
+    """
+    original_tokens = count_tokens(text)
+    if original_tokens <= budget:
+        return text, {"original_tokens": original_tokens, "trimmed_tokens": original_tokens}
+
+    passages = split_passages(text)
+    scores = bm25_scores(passages, query_terms)
+    if np.any(scores > 0):
+        # stable sort keeps the earlier passage first on ties
+        order = [i for i in np.argsort(-scores, kind="stable") if scores[i] > 0]
+    else:
+        order = list(range(len(passages)))
+
+    selected, used = [], 0
+    for i in order:
+        tokens = count_tokens(passages[i])
+        if used + tokens > budget:
+            continue
+        selected.append(i)
+        used += tokens
+
+    if selected:
+        trimmed = "\n".join(passages[i] for i in sorted(selected))
+    else:
+        # even the best passage is over budget, keep its leading chunk
+        trimmed = split_by_tokens(passages[order[0]], budget)[0]
+    trimmed_tokens = count_tokens(trimmed)
+    logger.debug(f"Trimmed content from {original_tokens} to {trimmed_tokens} tokens")
+    return trimmed, {"original_tokens": original_tokens, "trimmed_tokens": trimmed_tokens}
@@ -1,24 +1,295 @@
-from openai import OpenAI
+import asyncio
+import base64
 import logging
-# from ..config.setting import OPENAI_API_KEY
-from config.setting import OPENAI_API_KEY
+import threading
+import weakref
+from typing import TYPE_CHECKING, Dict, Optional, Union
+# from ..config.setting import OPENAI_API_KEY, OPENAI_MAX_CONNECTIONS, OPENAI_MAX_KEEPALIVE, OPENAI_TIMEOUT
+# from .llm_cache import get_llm_cache, make_key
+# from .metrics import record_tokens
+# from .rate_limit import call, acall
+from config.setting import OPENAI_API_KEY, OPENAI_MAX_CONNECTIONS, OPENAI_MAX_KEEPALIVE, OPENAI_TIMEOUT
+from utils.llm_cache import get_llm_cache, make_key
+from utils.metrics import record_tokens
+from utils.rate_limit import call, acall
+
+if TYPE_CHECKING:
+    from openai import OpenAI, AsyncOpenAI
 
-# Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-client = OpenAI(api_key=OPENAI_API_KEY)
 model = "gpt-4o-mini"
 
-def generate_news_image(news_text):
+# prefix of the news text each call reads
+IMAGE_DESCRIPTION_CHARS = 500
+TITLE_CHARS = 1000
+
+# the clients are built on first use, importing openai takes about half a second
+_client: Optional["OpenAI"] = None
+_client_lock = threading.Lock()
+# async client of each event loop, an entry goes away with its loop
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncOpenAI]" = weakref.WeakKeyDictionary()
+
+
+def _limits():
+    import httpx
+    return httpx.Limits(max_connections=OPENAI_MAX_CONNECTIONS, max_keepalive_connections=OPENAI_MAX_KEEPALIVE)
+
+
+def get_client() -> "OpenAI":
+    """Return the OpenAI client shared by the synchronous calls."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            from openai import OpenAI, DefaultHttpxClient
+            # retries are done by the "openai" limiter of utils.rate_limit
+            _client = OpenAI(api_key=OPENAI_API_KEY, timeout=OPENAI_TIMEOUT, max_retries=0,
+                             http_client=DefaultHttpxClient(limits=_limits()))
+        return _client
+
+
+def __getattr__(name: str):
+    # client used to be built at import
+    if name == "client":
+        return get_client()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def get_async_client() -> "AsyncOpenAI":
+    """
+    Return the AsyncOpenAI client shared by the image description, title and
+    image calls, so they reuse one pool of keep-alive connections.
+
+    httpx connections are bound to the event loop that opened them, so every
+    loop gets its own client and loops never replace each other's client.
+    """
+    loop = asyncio.get_running_loop()
+    with _client_lock:
+        async_client = _async_clients.get(loop)
+        if async_client is None:
+            from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+            # a client whose loop closed without close_async_client cannot be closed any more
+            for stale in [other for other in _async_clients if other.is_closed()]:
+                logger.warning("Dropping the async OpenAI client of a closed event loop")
+                del _async_clients[stale]
+            async_client = AsyncOpenAI(
+                api_key=OPENAI_API_KEY,
+                timeout=OPENAI_TIMEOUT,
+                max_retries=0,
+                http_client=DefaultAsyncHttpxClient(limits=_limits())
+            )
+            _async_clients[loop] = async_client
+            logger.info(f"Created async OpenAI client: max_connections={OPENAI_MAX_CONNECTIONS}")
+        return async_client
+
+
+async def close_async_client():
+    """
+    Close the async client of the running loop and cancel its prefetches that
+    were never picked up, call once before the event loop shuts down.
+    """
+    loop = asyncio.get_running_loop()
+    with _client_lock:
+        async_client = _async_clients.pop(loop, None)
+    with _inflight_lock:
+        tasks = [_inflight.pop(key) for key in [key for key in _inflight if key[0] is loop]]
+    for task in tasks:
+        task.cancel()
+    if async_client is not None:
+        await async_client.close()
+
+
+def _record_usage(call_site: str, response):
+    if response.usage is not None:
+        record_tokens("openai", call_site, response.usage.prompt_tokens, response.usage.completion_tokens)
+
+
+def _chat_completion(call_site: str, **request) -> str:
+    """client.chat.completions.create behind the LLM response cache, returns the message content."""
+    cache = get_llm_cache()
+    key = make_key(request["model"], {k: v for k, v in request.items() if k not in ("model", "messages")},
+                   request["messages"])
+    cached = cache.get(call_site, key) if cache is not None else None
+    if cached is not None:
+        return cached
+    response = call("openai", get_client().chat.completions.create, **request)
+    _record_usage(call_site, response)
+    content = response.choices[0].message.content
+    if cache is not None and content:
+        cache.put(call_site, key, content)
+    return content
+
+
+async def _achat_completion(call_site: str, **request) -> str:
+    """Async version of _chat_completion."""
+    cache = get_llm_cache()
+    key = make_key(request["model"], {k: v for k, v in request.items() if k not in ("model", "messages")},
+                   request["messages"])
+    cached = await asyncio.to_thread(cache.get, call_site, key) if cache is not None else None
+    if cached is not None:
+        return cached
+    response = await acall("openai", get_async_client().chat.completions.create, **request)
+    _record_usage(call_site, response)
+    content = response.choices[0].message.content
+    if cache is not None and content:
+        await asyncio.to_thread(cache.put, call_site, key, content)
+    return content
+
+
+def _image_description_messages(truncated_text):
+    return [
+        {
+            "role": "system",
+            "content": "你是一个专业的新闻图片描述专家。请基于新闻内容，生成一个简短的图片描述（不超过100字），用于AI生成新闻配图。描述要具体且富有视觉细节。"
+        },
+        {
+            "role": "user",
+            "content": f"请为以下新闻生成简短的图片描述：\n\n{truncated_text}"
+        }
+    ]
+
+
+def _title_messages(truncated_text):
+    return [
+        {
+            "role": "system",
+            "content": "You are a professional news editor. Please generate a concise and appealing headline for the news content (within 20 characters)."
+        },
+        {
+            "role": "user",
+            "content": f"Please generate a headline for the following news:\n\n{truncated_text}"
+        }
+    ]
+
+def _truncate(news_text: str, limit: int) -> str:
+    return news_text[:limit] + ("..." if len(news_text) > limit else "")
+
+
+async def _adescribe_image(truncated_text: str) -> str:
+    return await _achat_completion(
+        "image_description",
+        model=model,
+        messages=_image_description_messages(truncated_text),
+        max_tokens=200
+    )
+
+
+async def _atitle(truncated_text: str) -> str:
+    return (await _achat_completion(
+        "generate_title",
+        model=model,
+        messages=_title_messages(truncated_text),
+    )).strip()
+
+
+# call site: (prefix length, coroutine function)
+_PREFETCHABLE = {
+    "image_description": (IMAGE_DESCRIPTION_CHARS, _adescribe_image),
+    "generate_title": (TITLE_CHARS, _atitle),
+}
+# calls started by prefetch, keyed by (loop, call site, truncated text)
+_inflight: Dict[tuple, asyncio.Task] = {}
+_inflight_lock = threading.Lock()
+_MAX_INFLIGHT = 64
+
+
+def _prune_inflight():
+    # called with _inflight_lock held: tasks of closed loops can never be picked up,
+    # and finished results that were never picked up are still in the LLM cache
+    full = len(_inflight) >= _MAX_INFLIGHT
+    for key in [key for key, task in _inflight.items() if key[0].is_closed() or (full and task.done())]:
+        del _inflight[key]
+
+
+def prefetch(partial_text: str, final: bool = False):
+    """
+    Start the image description and title calls whose input is already known.
+
+    Each call only reads a prefix of the news text, so a call can start as
+    soon as that prefix is complete, while the rest of the combined draft is
+    still being generated. agenerate_news_image and agenerate_title pick up
+    the running call instead of issuing a new one. Must be called from the
+    event loop.
+
+    Args:
+        partial_text: the news text generated so far
+        final: partial_text is the whole text, so shorter prefixes are final too
+
+    Returns:
+        the keys of the calls for partial_text, for discard_prefetches
+    """
+    loop = asyncio.get_running_loop()
+    keys = []
+    for call_site, (limit, request) in _PREFETCHABLE.items():
+        if not final and len(partial_text) <= limit:
+            continue
+        key = (loop, call_site, _truncate(partial_text, limit))
+        keys.append(key)
+        with _inflight_lock:
+            if key in _inflight:
+                continue
+            _prune_inflight()
+            logger.debug(f"Prefetching {call_site}")
+            _inflight[key] = loop.create_task(request(key[2]))
+    return keys
+
+
+def discard_prefetches(keys):
+    """
+    Cancel the prefetched calls that will never be picked up, e.g. those
+    started from the text of a failed stream attempt.
+
+    Args:
+        keys: keys returned by prefetch
+    """
+    with _inflight_lock:
+        tasks = [_inflight.pop(key) for key in keys if key in _inflight]
+    for task in tasks:
+        if not task.done():
+            task.cancel()
+        elif not task.cancelled():
+            # retrieve the error so it is not logged as never retrieved
+            task.exception()
+
+
+async def _aprefetched(call_site: str, truncated_text: str) -> str:
+    with _inflight_lock:
+        task = _inflight.pop((asyncio.get_running_loop(), call_site, truncated_text), None)
+    if task is not None:
+        logger.debug(f"Using prefetched {call_site}")
+        return await task
+    return await _PREFETCHABLE[call_site][1](truncated_text)
+
+
+def _image_request(image_prompt: str, response_format: str) -> dict:
+    return dict(
+        model="dall-e-3",
+        prompt=image_prompt,
+        size="1024x1024",
+        quality="standard",
+        n=1,
+        response_format=response_format,
+    )
+
+
+def _image_result(image_response, response_format: str) -> Union[str, bytes]:
+    image = image_response.data[0]
+    if response_format == "b64_json":
+        return base64.b64decode(image.b64_json)
+    return image.url
+
+
+def generate_news_image(news_text, response_format: str = "url") -> Optional[Union[str, bytes]]:
     """
     Generate a news image based on the news content.
     
     Args:
         news_text (str): The news article text
+        response_format (str): "url" for a temporary URL, "b64_json" to receive
+                               the PNG bytes in the response and skip the download
         
     Returns:
-        str: URL of the generated image or None if failed
+        str | bytes: URL of the generated image, or its bytes for "b64_json", None if failed
     """
     if not news_text:
         logger.error("No news text provided for image generation")
@@ -27,45 +298,30 @@ def generate_news_image(news_text):
     logger.info("Starting news image generation process")
     
     # Truncate text to avoid token limits
-    truncated_text = news_text[:500] + ("..." if len(news_text) > 500 else "")
+    truncated_text = _truncate(news_text, IMAGE_DESCRIPTION_CHARS)
     logger.debug(f"Truncated news text to {len(truncated_text)} characters")
     
     try:
         # 1. Generate image description using GPT
         logger.debug("Generating image description using language model")
-        prompt_response = client.chat.completions.create(
+        image_prompt = _chat_completion(
+            "image_description",
             model=model,
-            messages=[
-                {
-                    "role": "system",
-                    "content": "你是一个专业的新闻图片描述专家。请基于新闻内容，生成一个简短的图片描述（不超过100字），用于AI生成新闻配图。描述要具体且富有视觉细节。"
-                },
-                {
-                    "role": "user",
-                    "content": f"请为以下新闻生成简短的图片描述：\n\n{truncated_text}"
-                }
-            ],
+            messages=_image_description_messages(truncated_text),
             max_tokens=200  # 限制输出长度
         )
-        
-        image_prompt = prompt_response.choices[0].message.content
         logger.debug(f"Generated image description: '{image_prompt[:50]}...'")
 
         # 2. Use the prompt to generate an image
         logger.info("Generating image using DALL-E model")
-        image_client = OpenAI(api_key=OPENAI_API_KEY)
-        image_response = image_client.images.generate(
-            model="dall-e-3",
-            prompt=image_prompt,
-            size="1024x1024",
-            quality="standard",
-            n=1,
-        )
+        # a timed out generation may still be billed, so it is only retried when throttled or not sent
+        image_response = call("openai", get_client().images.generate, idempotent=False,
+                              **_image_request(image_prompt, response_format))
         
-        image_url = image_response.data[0].url
+        image = _image_result(image_response, response_format)
         logger.info("Image generated successfully")
-        logger.debug(f"Image URL: {image_url}")
-        return image_url
+        logger.debug(f"Image: {image if isinstance(image, str) else f'{len(image)} bytes'}")
+        return image
         
     except Exception as e:
         logger.error(f"Error generating image: {str(e)}")
@@ -91,27 +347,87 @@ def generate_title(news_text: str) -> str:
     
     try:
         # Truncate news text to avoid token limits
-        truncated_text = news_text[:1000] + ("..." if len(news_text) > 1000 else "")
+        truncated_text = _truncate(news_text, TITLE_CHARS)
         logger.debug(f"Truncated news text to {len(truncated_text)} characters for title generation")
         
-        response = client.chat.completions.create(
+        title = _chat_completion(
+            "generate_title",
             model=model,
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are a professional news editor. Please generate a concise and appealing headline for the news content (within 20 characters)."
-                },
-                {
-                    "role": "user",
-                    "content": f"Please generate a headline for the following news:\n\n{truncated_text}"
-                }
-            ],
-        )
+            messages=_title_messages(truncated_text),
+        ).strip()
+        logger.info(f"Title generated successfully: '{title}'")
+        return title
         
-        title = response.choices[0].message.content.strip()
+    except Exception as e:
+        logger.error(f"Error generating title: {str(e)}")
+        return "Untitled News Article"
+
+
+async def agenerate_news_image(news_text, response_format: str = "url") -> Optional[Union[str, bytes]]:
+    """
+    Async version of generate_news_image using the shared AsyncOpenAI client,
+    reusing the image description started by prefetch if there is one.
+    
+    Args:
+        news_text (str): The news article text
+        response_format (str): "url" or "b64_json", see generate_news_image
+        
+    Returns:
+        str | bytes: URL of the generated image, or its bytes for "b64_json", None if failed
+    """
+    if not news_text:
+        logger.error("No news text provided for image generation")
+        return None
+        
+    logger.info("Starting news image generation process")
+    
+    truncated_text = _truncate(news_text, IMAGE_DESCRIPTION_CHARS)
+    
+    try:
+        logger.debug("Generating image description using language model")
+        image_prompt = await _aprefetched("image_description", truncated_text)
+        logger.debug(f"Generated image description: '{image_prompt[:50]}...'")
+
+        logger.info("Generating image using DALL-E model")
+        image_response = await acall("openai", get_async_client().images.generate, idempotent=False,
+                                     **_image_request(image_prompt, response_format))
+        
+        image = _image_result(image_response, response_format)
+        logger.info("Image generated successfully")
+        logger.debug(f"Image: {image if isinstance(image, str) else f'{len(image)} bytes'}")
+        return image
+        
+    except Exception as e:
+        logger.error(f"Error generating image: {str(e)}")
+        if 'image_prompt' in locals():
+            logger.error(f"Prompt used: {image_prompt}")
+        return None
+
+
+async def agenerate_title(news_text: str) -> str:
+    """
+    Async version of generate_title using the shared AsyncOpenAI client,
+    reusing the title started by prefetch if there is one.
+    
+    Args:
+        news_text (str): The news article text
+        
+    Returns:
+        str: Generated title or default message if failed
+    """
+    if not news_text:
+        logger.error("No news text provided for title generation")
+        return "Untitled News Article"
+    
+    logger.info("Starting title generation")
+    
+    try:
+        truncated_text = _truncate(news_text, TITLE_CHARS)
+        
+        title = await _aprefetched("generate_title", truncated_text)
         logger.info(f"Title generated successfully: '{title}'")
         return title
         
     except Exception as e:
         logger.error(f"Error generating title: {str(e)}")
-        return "Untitled News Article"
\ No newline at end of file
+        return "Untitled News Article"
@@ -0,0 +1,432 @@
+import asyncio
+import logging
+import random
+import threading
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Dict, Optional
+# from .metrics import record_provider_call, record_retry
+# from ..config.setting import RATE_LIMIT_ENABLED, RATE_LIMITS, RATE_LIMIT_MAX_SCOPES
+# from ..config.setting import RETRY_MAX_ATTEMPTS, RETRY_BASE_DELAY, RETRY_MAX_DELAY
+from utils.metrics import record_provider_call, record_retry
+from config.setting import RATE_LIMIT_ENABLED, RATE_LIMITS, RATE_LIMIT_MAX_SCOPES
+from config.setting import RETRY_MAX_ATTEMPTS, RETRY_BASE_DELAY, RETRY_MAX_DELAY
+
+logger = logging.getLogger(__name__)
+
+
+# Shared rate limiting and retries for every outbound provider.
+#
+# Each provider (google_cse, deepseek, openai, fetch, s3, dynamodb) gets a
+# request bucket, an optional LLM token bucket and an adaptive concurrency
+# limit. The concurrency limit grows by one slot per window of successes and
+# halves on a 429/throttling error, so a batch settles just under the quota
+# instead of hammering it. Retries use exponential backoff with full jitter,
+# never wait less than Retry-After, and only repeat non-idempotent calls when
+# the request cannot have reached the server.
+
+# HTTP statuses worth retrying for idempotent calls
+RETRYABLE_STATUSES = {408, 429, 500, 502, 503, 504}
+# botocore error codes that mean the caller is over its quota
+THROTTLING_CODES = {
+    "Throttling", "ThrottlingException", "ThrottledException", "RequestThrottled",
+    "RequestThrottledException", "TooManyRequestsException", "RequestLimitExceeded",
+    "ProvisionedThroughputExceededException", "SlowDown", "BandwidthLimitExceeded",
+}
+# transport errors, matched by class name so no client library has to be imported
+TRANSIENT_ERRORS = {
+    "TimeoutError", "ConnectionError", "ClientConnectionError", "ClientPayloadError",
+    "ServerDisconnectedError", "Timeout", "ReadTimeout", "ReadTimeoutError",
+    "APIConnectionError", "APITimeoutError", "TransportError", "RemoteProtocolError",
+    "EndpointConnectionError", "ConnectTimeoutError", "ResponseStreamingError",
+}
+# the subset raised before the request was sent, safe to retry for any call
+NOT_SENT_ERRORS = {
+    "ClientConnectorError", "ConnectError", "ConnectTimeout", "ConnectTimeoutError",
+    "EndpointConnectionError", "ConnectionRefusedError", "NewConnectionError",
+}
+
+
+class ThrottledError(Exception):
+    """Raised by a call the provider accepted only in part, e.g. unprocessed batch items, to retry the rest."""
+
+
+@dataclass(frozen=True)
+class ProviderLimits:
+    # requests per second, None for unlimited
+    requests_per_second: Optional[float] = None
+    # LLM tokens per minute, None for unlimited
+    tokens_per_minute: Optional[float] = None
+    # upper bound of the adaptive concurrency limit
+    max_concurrency: int = 8
+    min_concurrency: int = 1
+
+
+@dataclass
+class RetryDecision:
+    retry: bool
+    # the provider said the caller is over its quota
+    throttled: bool = False
+    retry_after: Optional[float] = None
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket refilled at rate tokens per second.
+
+    reserve takes the tokens immediately and returns how long the caller has
+    to wait for them, so sync and async callers share one bucket and a request
+    larger than the capacity simply waits longer instead of never fitting.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float = 1.0) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= amount
+            return -self._tokens / self.rate if self._tokens < 0 else 0.0
+
+
+class AdaptiveConcurrency:
+    """
+    Concurrency limit adapted with AIMD: +1 slot after limit successes,
+    halved on throttling at most once per second so one burst of 429s only
+    counts once. Threads and coroutines of any event loop can wait on it.
+    """
+
+    def __init__(self, max_limit: int, min_limit: int = 1):
+        self.max_limit = max(1, max_limit)
+        self.min_limit = max(1, min(min_limit, self.max_limit))
+        self.limit = float(self.max_limit)
+        self.in_flight = 0
+        self._last_decrease = 0.0
+        self._waiters = deque()
+        self._lock = threading.Lock()
+
+    def _grant(self) -> bool:
+        if self.in_flight < int(self.limit):
+            self.in_flight += 1
+            return True
+        return False
+
+    def _wake(self):
+        # hand free slots to waiters in FIFO order, called with the lock held
+        while self._waiters and self.in_flight < int(self.limit):
+            waiter = self._waiters.popleft()
+            self.in_flight += 1
+            if isinstance(waiter, threading.Event):
+                waiter.set()
+            else:
+                loop, future = waiter
+                loop.call_soon_threadsafe(self._resolve, future)
+
+    def _resolve(self, future: asyncio.Future):
+        if future.done():
+            # the waiter was cancelled after the slot was handed over
+            self.release()
+        else:
+            future.set_result(None)
+
+    def acquire(self):
+        with self._lock:
+            if self._grant():
+                return
+            event = threading.Event()
+            self._waiters.append(event)
+        event.wait()
+
+    async def aacquire(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._grant():
+                return
+            future = loop.create_future()
+            waiter = (loop, future)
+            self._waiters.append(waiter)
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self._lock:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+
+    def release(self):
+        with self._lock:
+            self.in_flight -= 1
+            self._wake()
+
+    def on_success(self):
+        with self._lock:
+            if self.limit < self.max_limit:
+                self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+                self._wake()
+
+    def on_throttle(self) -> bool:
+        with self._lock:
+            now = time.monotonic()
+            if now - self._last_decrease < 1.0:
+                return False
+            self._last_decrease = now
+            self.limit = max(self.min_limit, self.limit / 2)
+            return True
+
+
+def _status(exc: BaseException) -> Optional[int]:
+    # openai/httpx: status_code, aiohttp: status, requests: response.status_code
+    for attr in ("status_code", "status"):
+        value = getattr(exc, attr, None)
+        if isinstance(value, int):
+            return value
+    response = getattr(exc, "response", None)
+    if isinstance(response, dict):
+        # botocore ClientError
+        return response.get("ResponseMetadata", {}).get("HTTPStatusCode")
+    value = getattr(response, "status_code", None)
+    return value if isinstance(value, int) else None
+
+
+def _headers(exc: BaseException):
+    headers = getattr(exc, "headers", None)
+    if headers is None:
+        response = getattr(exc, "response", None)
+        if isinstance(response, dict):
+            headers = response.get("ResponseMetadata", {}).get("HTTPHeaders")
+        else:
+            headers = getattr(response, "headers", None)
+    return headers or {}
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a Retry-After header, given as seconds or an HTTP date."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+def _error_names(exc: BaseException) -> set:
+    return {cls.__name__ for cls in type(exc).__mro__}
+
+
+def classify(exc: BaseException, idempotent: bool = True) -> RetryDecision:
+    """
+    Decide whether a failed call should be retried.
+
+    Args:
+        exc: exception raised by the call
+        idempotent: whether repeating a call that reached the server is harmless
+
+    Returns:
+        RetryDecision, throttled is set for 429 and provider throttling errors
+    """
+    response = getattr(exc, "response", None)
+    code = response.get("Error", {}).get("Code") if isinstance(response, dict) else None
+    status = _status(exc)
+    headers = _headers(exc) if status is not None else {}
+    retry_after = parse_retry_after(headers.get("Retry-After") or headers.get("retry-after"))
+    if status == 429 or code in THROTTLING_CODES or isinstance(exc, ThrottledError):
+        # a throttled request was rejected, not executed
+        return RetryDecision(True, True, retry_after)
+
+    names = _error_names(exc)
+    if names & NOT_SENT_ERRORS:
+        return RetryDecision(True)
+    if not idempotent:
+        return RetryDecision(False)
+    if status is not None:
+        return RetryDecision(status in RETRYABLE_STATUSES, retry_after=retry_after)
+    return RetryDecision(bool(names & TRANSIENT_ERRORS) or isinstance(exc, asyncio.TimeoutError))
+
+
+def backoff_delay(attempt: int, retry_after: Optional[float] = None,
+                  base: float = RETRY_BASE_DELAY, cap: float = RETRY_MAX_DELAY) -> float:
+    """Exponential backoff with full jitter, never shorter than Retry-After."""
+    delay = random.uniform(0, min(cap, base * 2 ** attempt))
+    if retry_after is not None:
+        delay = max(delay, min(retry_after, cap))
+    return delay
+
+
+class RateLimiter:
+    """Request/token buckets, adaptive concurrency and retries of one provider."""
+
+    def __init__(self, name: str, limits: ProviderLimits, max_attempts: int = RETRY_MAX_ATTEMPTS):
+        self.name = name
+        self.limits = limits
+        self.max_attempts = max(1, max_attempts)
+        rps = limits.requests_per_second
+        tpm = limits.tokens_per_minute
+        # allow a one second burst of requests and a full minute of tokens
+        self.requests = TokenBucket(rps, max(1.0, rps)) if rps else None
+        self.tokens = TokenBucket(tpm / 60.0, tpm) if tpm else None
+        self.concurrency = AdaptiveConcurrency(limits.max_concurrency, limits.min_concurrency)
+        # set by Retry-After, holds back every caller whether or not the provider has a request bucket
+        self._paused_until = 0.0
+        self._pause_lock = threading.Lock()
+
+    def pause(self, seconds: float):
+        """Hold every caller of this provider back for seconds, e.g. after a Retry-After."""
+        with self._pause_lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def _reserve(self, tokens: int) -> float:
+        wait = self.requests.reserve() if self.requests is not None else 0.0
+        if tokens and self.tokens is not None:
+            wait = max(wait, self.tokens.reserve(tokens))
+        with self._pause_lock:
+            return max(wait, self._paused_until - time.monotonic())
+
+    def _after_failure(self, exc: BaseException, attempt: int, idempotent: bool) -> Optional[float]:
+        """Record a failed attempt, returns the delay before the next one or None to give up."""
+        decision = classify(exc, idempotent)
+        if decision.throttled:
+            if self.concurrency.on_throttle():
+                logger.warning(f"{self.name} throttled, concurrency limit now {int(self.concurrency.limit)}")
+            if decision.retry_after:
+                self.pause(decision.retry_after)
+        if not decision.retry or attempt + 1 >= self.max_attempts:
+            return None
+        record_retry(self.name, decision.throttled)
+        delay = backoff_delay(attempt, decision.retry_after)
+        logger.warning(f"{self.name} call failed ({type(exc).__name__}: {str(exc)[:200]}), "
+                       f"retry {attempt + 1}/{self.max_attempts - 1} in {delay:.2f}s")
+        return delay
+
+    def call(self, fn: Callable[..., Any], *args, idempotent: bool = True, tokens: int = 0, **kwargs) -> Any:
+        """
+        Call fn under this provider's limits, retrying transient failures.
+
+        Args:
+            fn: the outbound call, invoked again on every attempt
+            idempotent: False for calls with side effects, retried only when not sent or throttled
+            tokens: estimated LLM tokens of the call, drawn from the token bucket
+
+        Returns:
+            the result of fn, the last exception is raised once retries are exhausted
+        """
+        for attempt in range(self.max_attempts):
+            queued = time.monotonic()
+            wait = self._reserve(tokens)
+            if wait > 0:
+                time.sleep(wait)
+            self.concurrency.acquire()
+            started = time.monotonic()
+            error = None
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                error = e
+            finally:
+                # also on KeyboardInterrupt and cancellation, which are not Exceptions
+                self.concurrency.release()
+            if error is not None:
+                record_provider_call(self.name, time.monotonic() - started, started - queued, ok=False)
+                delay = self._after_failure(error, attempt, idempotent)
+                if delay is None:
+                    raise error
+                time.sleep(delay)
+                continue
+            self.concurrency.on_success()
+            record_provider_call(self.name, time.monotonic() - started, started - queued, ok=True)
+            return result
+
+    async def acall(self, fn: Callable[..., Awaitable[Any]], *args, idempotent: bool = True,
+                    tokens: int = 0, **kwargs) -> Any:
+        """Async version of call, fn is a coroutine function called on every attempt."""
+        for attempt in range(self.max_attempts):
+            queued = time.monotonic()
+            wait = self._reserve(tokens)
+            if wait > 0:
+                await asyncio.sleep(wait)
+            await self.concurrency.aacquire()
+            started = time.monotonic()
+            error = None
+            try:
+                result = await fn(*args, **kwargs)
+            except Exception as e:
+                error = e
+            finally:
+                # a cancelled call (fan-out leftovers, run timeouts) must give its slot back
+                self.concurrency.release()
+            if error is not None:
+                record_provider_call(self.name, time.monotonic() - started, started - queued, ok=False)
+                delay = self._after_failure(error, attempt, idempotent)
+                if delay is None:
+                    raise error
+                await asyncio.sleep(delay)
+                continue
+            self.concurrency.on_success()
+            record_provider_call(self.name, time.monotonic() - started, started - queued, ok=True)
+            return result
+
+
+_limiters: Dict[str, RateLimiter] = {}
+# limiters of scoped providers such as "fetch:<host>", least recently used first
+_scoped_limiters: "OrderedDict[str, RateLimiter]" = OrderedDict()
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(provider: str) -> RateLimiter:
+    """
+    Return the process-wide limiter of a provider, configured from RATE_LIMITS.
+
+    A provider "name:scope", e.g. "fetch:example.com", gets its own limiter
+    with the limits of "name", so one host throttling does not slow the others.
+    At most RATE_LIMIT_MAX_SCOPES idle scoped limiters are kept, the least
+    recently used ones are dropped beyond that so a long-running daemon
+    fetching from ever new hosts does not grow without bound. With RATE_LIMIT_ENABLED=false the
+    limiter still retries but has no buckets and a concurrency limit too high
+    to matter.
+    """
+    scoped = ":" in provider
+    limiters = _scoped_limiters if scoped else _limiters
+    with _limiters_lock:
+        limiter = limiters.get(provider)
+        if limiter is None:
+            if RATE_LIMIT_ENABLED:
+                limits = RATE_LIMITS.get(provider) or RATE_LIMITS.get(provider.split(":", 1)[0], {})
+            else:
+                limits = {"max_concurrency": 1 << 20}
+            limiter = limiters[provider] = RateLimiter(provider, ProviderLimits(**limits))
+            logger.debug(f"Created rate limiter for {provider}: {limits}")
+        if scoped:
+            _scoped_limiters.move_to_end(provider)
+            if len(_scoped_limiters) > RATE_LIMIT_MAX_SCOPES:
+                for name in list(_scoped_limiters):
+                    if len(_scoped_limiters) <= RATE_LIMIT_MAX_SCOPES:
+                        break
+                    # a host with calls in flight would get a second limiter with fresh slots
+                    if name != provider and _scoped_limiters[name].concurrency.in_flight == 0:
+                        del _scoped_limiters[name]
+        return limiter
+
+
+def call(provider: str, fn: Callable[..., Any], *args, idempotent: bool = True, tokens: int = 0, **kwargs) -> Any:
+    """get_limiter(provider).call(...), see RateLimiter.call."""
+    return get_limiter(provider).call(fn, *args, idempotent=idempotent, tokens=tokens, **kwargs)
+
+
+async def acall(provider: str, fn: Callable[..., Awaitable[Any]], *args, idempotent: bool = True,
+                tokens: int = 0, **kwargs) -> Any:
+    """get_limiter(provider).acall(...), see RateLimiter.call."""
+    return await get_limiter(provider).acall(fn, *args, idempotent=idempotent, tokens=tokens, **kwargs)
@@ -1,39 +1,94 @@
-import boto3
-import requests
+import asyncio
+import io
 from dotenv import load_dotenv
 import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import logging
+from typing import Dict, List
 
-# from ..config.setting import AWS_ACCESS_KEY_ID,AWS_SECRET_ACCESS_KEY,AWS_REGION,AWS_BUCKET_NAME
-from config.setting import AWS_ACCESS_KEY_ID,AWS_SECRET_ACCESS_KEY,AWS_REGION,AWS_BUCKET_NAME
-# Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+# from .aws_clients import get_aws_client
+# from .rate_limit import call
+# from ..config.setting import AWS_REGION,AWS_BUCKET_NAME
+# from ..config.setting import S3_MULTIPART_THRESHOLD,S3_MULTIPART_CHUNKSIZE,S3_MAX_CONCURRENCY
+from utils.aws_clients import get_aws_client
+from utils.rate_limit import call
+from config.setting import AWS_REGION,AWS_BUCKET_NAME
+from config.setting import S3_MULTIPART_THRESHOLD,S3_MULTIPART_CHUNKSIZE,S3_MAX_CONCURRENCY
 logger = logging.getLogger(__name__)
 
+_transfer_config = None
+
+
+def _get_transfer_config():
+    # upload_fileobj reads the source in chunks and switches to a multipart upload above the threshold;
+    # built on first use like the client, so importing this module does not load boto3
+    global _transfer_config
+    if _transfer_config is None:
+        from boto3.s3.transfer import TransferConfig
+        _transfer_config = TransferConfig(
+            multipart_threshold=S3_MULTIPART_THRESHOLD,
+            multipart_chunksize=S3_MULTIPART_CHUNKSIZE,
+            max_concurrency=S3_MAX_CONCURRENCY
+        )
+    return _transfer_config
+
 
 class S3Handler:
     def __init__(self):
         """
         maybe use aws config file for better security
+
+        The boto3 client is shared by every handler in the process, so creating
+        a handler per graph run is cheap.
         """
         logger.debug("Initializing S3Handler")
         try:
-            self.s3_client = boto3.client(
-                's3',
-                aws_access_key_id=AWS_ACCESS_KEY_ID,
-                aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
-                region_name=AWS_REGION
-            )
+            self.s3_client = get_aws_client('s3')
             self.bucket_name = AWS_BUCKET_NAME
-            logger.info(f"S3Handler initialized for bucket: {self.bucket_name} in region: {AWS_REGION}")
+            logger.debug(f"S3Handler initialized for bucket: {self.bucket_name} in region: {AWS_REGION}")
         except Exception as e:
             logger.error(f"Failed to initialize S3 client: {str(e)}")
             raise
 
+    @staticmethod
+    def _normalize_key(s3_key: str) -> str:
+        # 确保s3_key格式正确
+        if not s3_key.startswith('images/'):
+            logger.debug(f"Modified S3 key from {s3_key} to images/{s3_key}")
+            return f"images/{s3_key}"
+        return s3_key
+
+    def _upload_stream(self, stream, s3_key: str, content_type: str) -> str:
+        """通过托管传输把文件对象分块上传到S3，返回公开访问URL"""
+        s3_key = self._normalize_key(s3_key)
+        logger.debug(f"Uploading to S3 bucket {self.bucket_name} with key {s3_key}")
+        self.s3_client.upload_fileobj(
+            stream,
+            self.bucket_name,
+            s3_key,
+            ExtraArgs={'ContentType': content_type},
+            Config=_get_transfer_config()
+        )
+        url = self.get_public_url(s3_key)
+        logger.info(f"Image uploaded successfully to S3: {url}")
+        return url
+
+    def _copy_from_url(self, image_url: str, s3_key: str) -> str:
+        import requests
+        logger.debug(f"Streaming image from {image_url}")
+        with requests.get(image_url, stream=True, timeout=10) as response:
+            response.raise_for_status()
+            content_type = response.headers.get('content-type', 'image/jpeg')
+            # 按Content-Encoding解压后再上传
+            response.raw.decode_content = True
+            return self._upload_stream(response.raw, s3_key, content_type)
+
     def upload_image(self, image_url: str, s3_key: str, date_str: str = None) -> str:
         """
         从URL下载图片并上传到S3
+
+        下载以流的方式分块读取并直接交给托管上传，不在内存中保留整个文件
         
         Args:
             image_url (str): 图片的URL
@@ -48,41 +103,13 @@ class S3Handler:
             return None
             
         logger.info(f"Attempting to upload image from {image_url} to S3")
+        # 客户端创建时已加载boto3，这里只是取得异常类型
+        import boto3
+        import requests
         
         try:
-            # 下载图片
-            logger.debug(f"Downloading image from {image_url}")
-            response = requests.get(image_url, timeout=10)
-            response.raise_for_status()
-            image_content = response.content
-            content_type = response.headers.get('content-type', 'image/jpeg')
-            
-            logger.debug(f"Image downloaded successfully: {len(image_content)} bytes, type: {content_type}")
-
-            # 确保s3_key格式正确
-            if not s3_key.startswith('images/'):
-                original_key = s3_key
-                s3_key = f"images/{s3_key}"
-                logger.debug(f"Modified S3 key from {original_key} to {s3_key}")
-
-            # 上传到S3，移除ACL参数
-            logger.debug(f"Uploading to S3 bucket {self.bucket_name} with key {s3_key}")
-            self.s3_client.put_object(
-                Bucket=self.bucket_name,
-                Key=s3_key,
-                Body=image_content,
-                ContentType=content_type
-            )
-
-            # 生成公开访问的URL
-            region = AWS_REGION
-            if region == 'us-east-1':
-                url = f"https://{self.bucket_name}.s3.amazonaws.com/{s3_key}"
-            else:
-                url = f"https://{self.bucket_name}.s3.{region}.amazonaws.com/{s3_key}"
-
-            logger.info(f"Image uploaded successfully to S3: {url}")
-            return url
+            # 已读取的下载流无法重放，所以重试时下载和上传一起重新执行
+            return call("s3", self._copy_from_url, image_url, s3_key)
 
         except requests.RequestException as e:
             logger.error(f"Failed to download image from {image_url}: {str(e)}")
@@ -97,6 +124,94 @@ class S3Handler:
             logger.error(f"Unexpected error uploading image to S3: {str(e)}", exc_info=True)
             return None
 
+    async def aupload_image(self, image_url: str, s3_key: str, date_str: str = None) -> str:
+        """
+        upload_image的异步版本：boto3的托管上传只接受同步文件对象，
+        所以流式下载和上传一起在线程池中执行
+        
+        Args:
+            image_url (str): 图片的URL
+            s3_key (str): 在S3中保存的文件路径和名称
+            date_str (str, optional): 日期字符串，用于文件夹组织
+
+        Returns:
+            str: S3中的公开访问URL
+        """
+        return await asyncio.to_thread(self.upload_image, image_url, s3_key, date_str)
+
+    def upload_image_bytes(self, image_bytes: bytes, s3_key: str, content_type: str = 'image/png') -> str:
+        """
+        直接上传生成的图片数据，省去从临时URL再下载一次
+
+        Args:
+            image_bytes (bytes): 图片数据
+            s3_key (str): 在S3中保存的文件路径和名称
+            content_type (str): 图片的MIME类型，DALL-E返回PNG
+
+        Returns:
+            str: S3中的公开访问URL
+        """
+        if not image_bytes:
+            logger.error("No image data provided")
+            return None
+
+        logger.info(f"Uploading {len(image_bytes)} bytes of image data to S3")
+        import boto3
+        try:
+            # BytesIO只是对已有数据的视图，不会再复制一份；每次重试使用新的BytesIO
+            return call("s3", lambda: self._upload_stream(io.BytesIO(image_bytes), s3_key, content_type))
+        except boto3.exceptions.S3UploadFailedError as e:
+            logger.error(f"S3 upload failed for key {s3_key}: {str(e)}")
+            return None
+        except boto3.exceptions.Boto3Error as e:
+            logger.error(f"AWS S3 error: {str(e)}")
+            return None
+        except Exception as e:
+            logger.error(f"Unexpected error uploading image to S3: {str(e)}", exc_info=True)
+            return None
+
+    async def aupload_image_bytes(self, image_bytes: bytes, s3_key: str, content_type: str = 'image/png') -> str:
+        """
+        upload_image_bytes的异步版本，在线程池中执行
+        """
+        return await asyncio.to_thread(self.upload_image_bytes, image_bytes, s3_key, content_type)
+
+    @staticmethod
+    def _variant_key(key_prefix: str, variant) -> str:
+        # 原图尺寸使用key_prefix本身，缩略图加上宽度后缀
+        suffix = "" if variant.name == "full" else f"_{variant.name}"
+        return f"{key_prefix}{suffix}.{variant.extension}"
+
+    def upload_variants(self, variants: List, key_prefix: str) -> Dict[str, str]:
+        """
+        并发上传同一张图片的各个版本
+
+        Args:
+            variants (list): utils.image_processing.ImageVariant列表
+            key_prefix (str): 不带扩展名的S3路径，如images/{topic}/{date}
+
+        Returns:
+            dict: 版本名 -> 公开访问URL，上传失败的版本不在结果中
+        """
+        if not variants:
+            return {}
+        with ThreadPoolExecutor(max_workers=len(variants)) as executor:
+            urls = list(executor.map(
+                lambda v: self.upload_image_bytes(v.data, self._variant_key(key_prefix, v), v.content_type),
+                variants
+            ))
+        return {v.name: url for v, url in zip(variants, urls) if url}
+
+    async def aupload_variants(self, variants: List, key_prefix: str) -> Dict[str, str]:
+        """
+        upload_variants的异步版本
+        """
+        urls = await asyncio.gather(*[
+            self.aupload_image_bytes(v.data, self._variant_key(key_prefix, v), v.content_type)
+            for v in variants
+        ])
+        return {v.name: url for v, url in zip(variants, urls) if url}
+
     def get_public_url(self, s3_key: str) -> str:
         """
         获取S3对象的公开访问URL
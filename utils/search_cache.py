@@ -0,0 +1,146 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict
+from typing import Dict, List, Optional, Tuple
+# from ..config.setting import SEARCH_CACHE_BACKEND, SEARCH_CACHE_TTL, SEARCH_CACHE_PATH, SEARCH_CACHE_MAX_ENTRIES
+from config.setting import SEARCH_CACHE_BACKEND, SEARCH_CACHE_TTL, SEARCH_CACHE_PATH, SEARCH_CACHE_MAX_ENTRIES
+
+logger = logging.getLogger(__name__)
+
+SearchKey = Tuple[str, str, int, int]
+
+
+def make_key(query: str, date_restrict: str, num_results: int, start_index: int) -> SearchKey:
+    """Cache key of a Custom Search call."""
+    return (query, date_restrict, num_results, start_index)
+
+
+class SearchCache:
+    """
+    Base class of the search result caches.
+
+    Subclasses implement _get and _set on serialized result lists; this class
+    handles the TTL bookkeeping and the hit/miss counters. Only successful
+    responses should be stored, errors are never cached.
+    """
+
+    def __init__(self, ttl: float = SEARCH_CACHE_TTL):
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._stats_lock = threading.Lock()
+
+    def _get(self, key: SearchKey) -> Optional[Tuple[float, str]]:
+        raise NotImplementedError
+
+    def _set(self, key: SearchKey, stored_at: float, payload: str):
+        raise NotImplementedError
+
+    def get(self, key: SearchKey) -> Optional[List[dict]]:
+        """Return the cached results for a key as dicts, None on miss or expiry."""
+        entry = self._get(key)
+        hit = entry is not None and time.time() - entry[0] < self.ttl
+        with self._stats_lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return json.loads(entry[1]) if hit else None
+
+    def set(self, key: SearchKey, results: list):
+        """Store the results (SearchResult dataclasses) of a successful call."""
+        self._set(key, time.time(), json.dumps([asdict(result) for result in results]))
+
+    def stats(self) -> Dict[str, float]:
+        """Hit/miss counters of this cache."""
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / total if total else 0.0}
+
+
+class MemorySearchCache(SearchCache):
+    """In-process search cache, lost when the process exits, holding at most max_entries (LRU)."""
+
+    def __init__(self, ttl: float = SEARCH_CACHE_TTL, max_entries: int = SEARCH_CACHE_MAX_ENTRIES):
+        super().__init__(ttl)
+        self.max_entries = max(1, max_entries)
+        self._entries: "OrderedDict[SearchKey, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def _set(self, key, stored_at, payload):
+        with self._lock:
+            self._entries[key] = (stored_at, payload)
+            self._entries.move_to_end(key)
+            # a long-lived process (the daemon) must not grow forever, expired or not
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class SQLiteSearchCache(SearchCache):
+    """Search cache stored in an SQLite file, shared by reruns and processes."""
+
+    def __init__(self, path: str = SEARCH_CACHE_PATH, ttl: float = SEARCH_CACHE_TTL):
+        super().__init__(ttl)
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS search_results (
+                    query TEXT NOT NULL,
+                    date_restrict TEXT NOT NULL,
+                    num_results INTEGER NOT NULL,
+                    start_index INTEGER NOT NULL,
+                    stored_at REAL NOT NULL,
+                    payload TEXT NOT NULL,
+                    PRIMARY KEY (query, date_restrict, num_results, start_index)
+                )
+            """)
+            self._conn.execute("DELETE FROM search_results WHERE stored_at < ?", (time.time() - ttl,))
+
+    def _get(self, key):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT stored_at, payload FROM search_results "
+                "WHERE query = ? AND date_restrict = ? AND num_results = ? AND start_index = ?",
+                key
+            ).fetchone()
+
+    def _set(self, key, stored_at, payload):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO search_results "
+                "(query, date_restrict, num_results, start_index, stored_at, payload) VALUES (?, ?, ?, ?, ?, ?)",
+                (*key, stored_at, payload)
+            )
+
+
+_search_cache: Optional[SearchCache] = None
+
+
+def get_search_cache() -> Optional[SearchCache]:
+    """Return the process-wide search cache configured by SEARCH_CACHE_BACKEND, None if disabled."""
+    global _search_cache
+    if _search_cache is None:
+        if SEARCH_CACHE_BACKEND == "memory":
+            _search_cache = MemorySearchCache()
+        elif SEARCH_CACHE_BACKEND == "sqlite":
+            _search_cache = SQLiteSearchCache()
+        elif SEARCH_CACHE_BACKEND != "none":
+            raise ValueError(f"Unknown search cache backend '{SEARCH_CACHE_BACKEND}', "
+                             f"expected 'memory', 'sqlite' or 'none'")
+        if _search_cache is not None:
+            logger.info(f"Using {SEARCH_CACHE_BACKEND} search cache with ttl={SEARCH_CACHE_TTL}s")
+    return _search_cache
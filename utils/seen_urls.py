@@ -0,0 +1,97 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Iterable, Optional, Set
+# from ..config.setting import SEEN_URLS_PATH, SEEN_URLS_RETENTION_DAYS
+# from .url_utils import canonicalize_url
+from config.setting import SEEN_URLS_PATH, SEEN_URLS_RETENTION_DAYS
+from utils.url_utils import canonicalize_url
+
+logger = logging.getLogger(__name__)
+
+
+class SeenUrlIndex:
+    """
+    Source URLs already used by a published article, per topic, in an SQLite file.
+
+    URLs are compared in their canonical form (utils.url_utils.canonicalize_url),
+    the same form web_search returns. Entries older than the retention are
+    dropped when the index is opened.
+    """
+
+    def __init__(self, path: str = SEEN_URLS_PATH, retention_days: float = SEEN_URLS_RETENTION_DAYS):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS seen_urls (
+                    topic_id TEXT NOT NULL,
+                    url TEXT NOT NULL,
+                    date TEXT NOT NULL,
+                    stored_at REAL NOT NULL,
+                    PRIMARY KEY (topic_id, url)
+                )
+            """)
+            deleted = self._conn.execute("DELETE FROM seen_urls WHERE stored_at < ?",
+                                         (time.time() - retention_days * 24 * 3600,)).rowcount
+        if deleted:
+            logger.info(f"Pruned {deleted} seen URLs older than {retention_days} days")
+
+    @staticmethod
+    def _canonical(urls: Iterable[str]) -> Set[str]:
+        return {canonicalize_url(url) for url in urls if url}
+
+    def seen(self, topic_id: str, urls: Iterable[str]) -> Set[str]:
+        """
+        Return the urls that an earlier article of the topic already used.
+
+        Args:
+            topic_id: topic of the run
+            urls: candidate source URLs
+
+        Returns:
+            the subset of urls, as given, that is in the index
+        """
+        urls = list(urls)
+        canonical = {url: canonicalize_url(url) for url in urls if url}
+        if not canonical:
+            return set()
+        with self._lock:
+            placeholders = ", ".join("?" * len(set(canonical.values())))
+            rows = self._conn.execute(
+                f"SELECT url FROM seen_urls WHERE topic_id = ? AND url IN ({placeholders})",
+                (topic_id, *set(canonical.values()))
+            ).fetchall()
+        known = {row[0] for row in rows}
+        return {url for url, key in canonical.items() if key in known}
+
+    def add(self, topic_id: str, urls: Iterable[str], date: str):
+        """Record the source URLs of the topic's article of date."""
+        rows = [(topic_id, url, date, time.time()) for url in self._canonical(urls)]
+        if not rows:
+            return
+        with self._lock, self._conn:
+            # a URL keeps the date of the first article that used it
+            self._conn.executemany(
+                "INSERT INTO seen_urls (topic_id, url, date, stored_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(topic_id, url) DO UPDATE SET stored_at = excluded.stored_at",
+                rows
+            )
+
+
+_seen_urls: Optional[SeenUrlIndex] = None
+_seen_urls_lock = threading.Lock()
+
+
+def get_seen_urls() -> SeenUrlIndex:
+    """Return the process-wide seen-URL index at SEEN_URLS_PATH."""
+    global _seen_urls
+    with _seen_urls_lock:
+        if _seen_urls is None:
+            _seen_urls = SeenUrlIndex()
+            logger.info(f"Using seen-URL index at {SEEN_URLS_PATH}")
+        return _seen_urls
@@ -0,0 +1,113 @@
+import logging
+import re
+from typing import List
+# from ..config.setting import TOKENIZER_ENCODING
+from config.setting import TOKENIZER_ENCODING
+
+logger = logging.getLogger(__name__)
+
+# rough characters per token, used when the tiktoken encoding cannot be loaded
+CHARS_PER_TOKEN = 4
+
+_encoding = None
+_encoding_loaded = False
+
+
+def _get_encoding():
+    """Load the tiktoken encoding once, None if it is unavailable (e.g. offline)."""
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        _encoding_loaded = True
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding(TOKENIZER_ENCODING)
+        except Exception as e:
+            logger.warning(f"Failed to load tokenizer {TOKENIZER_ENCODING}, estimating tokens from length: {str(e)}")
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    """
+    Count the tokens of a text.
+
+    DeepSeek does not publish its tokenizer, so an OpenAI encoding is used as
+    a close estimate.
+    """
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is None:
+        return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def split_by_tokens(text: str, budget: int) -> List[str]:
+    """
+    Split a text into chunks of at most budget tokens.
+
+    Paragraph boundaries are preferred, then sentence boundaries, and a single
+    oversized sentence is cut by words.
+    """
+    if count_tokens(text) <= budget:
+        return [text]
+
+    chunks = []
+    current, current_tokens = [], 0
+
+    def flush():
+        nonlocal current, current_tokens
+        if current:
+            chunks.append("\n".join(current))
+        current, current_tokens = [], 0
+
+    for paragraph in re.split(r"\n\s*\n|\n", text):
+        pieces = [paragraph] if count_tokens(paragraph) <= budget else re.split(r"(?<=[.!?。！？])\s+", paragraph)
+        for piece in pieces:
+            tokens = count_tokens(piece)
+            if tokens > budget:
+                # no boundary left, cut by words
+                flush()
+                chunks.extend(_cut_words(piece.split(), tokens, budget))
+                continue
+            # one token for the newline that joins the pieces
+            separator = 1 if current else 0
+            if current_tokens + separator + tokens > budget:
+                flush()
+                separator = 0
+            current.append(piece)
+            current_tokens += separator + tokens
+    flush()
+    return [chunk for chunk in chunks if chunk.strip()]
+
+
+def _cut_words(words: List[str], tokens: int, budget: int) -> List[str]:
+    """Cut words into equal runs, shortening the runs until the largest one fits the budget."""
+    step = max(1, len(words) * budget // tokens)
+    while True:
+        chunks = [" ".join(words[start:start + step]) for start in range(0, len(words), step)]
+        largest = max(count_tokens(chunk) for chunk in chunks)
+        if largest <= budget or step == 1:
+            return chunks
+        step = max(1, min(step - 1, step * budget // largest))
+
+
+def pack_by_tokens(texts: List[str], budget: int) -> List[List[str]]:
+    """
+    Greedily pack texts, in order, into groups of at most budget tokens.
+
+    A text larger than the budget is split with split_by_tokens first, so no
+    content is dropped.
+    """
+    groups = []
+    current, current_tokens = [], 0
+    for text in texts:
+        for piece in split_by_tokens(text, budget):
+            tokens = count_tokens(piece)
+            if current and current_tokens + tokens > budget:
+                groups.append(current)
+                current, current_tokens = [], 0
+            current.append(piece)
+            current_tokens += tokens
+    if current:
+        groups.append(current)
+    return groups
@@ -0,0 +1,96 @@
+from urllib.parse import parse_qs, parse_qsl, unquote, urlencode, urlsplit, urlunsplit
+
+# query parameters that only track the click and never change the page
+TRACKING_PARAMS = {
+    "fbclid", "gclid", "dclid", "msclkid", "yclid", "mc_cid", "mc_eid",
+    "igshid", "ref_src", "ref_url", "cmpid", "_hsenc", "_hsmi", "ocid",
+}
+TRACKING_PREFIXES = ("utm_", "ga_", "pk_", "mtm_")
+
+DEFAULT_PORTS = {"http": "80", "https": "443"}
+
+# redirector hosts that carry the target URL in a query parameter
+REDIRECTOR_PARAMS = {
+    "www.google.com": ("q", "url"),
+    "google.com": ("q", "url"),
+    "l.facebook.com": ("u",),
+    "lm.facebook.com": ("u",),
+    "duckduckgo.com": ("uddg",),
+    "out.reddit.com": ("url",),
+    "l.messenger.com": ("u",),
+}
+
+
+def _is_tracking_param(name: str) -> bool:
+    name = name.lower()
+    return name in TRACKING_PARAMS or name.startswith(TRACKING_PREFIXES)
+
+
+def resolve_redirector(url: str) -> str:
+    """
+    Unwrap links that go through a known redirector.
+
+    Only redirectors that carry the target in the URL itself are handled, no
+    request is sent. Nested redirectors are unwrapped up to a few levels.
+
+    Args:
+        url: URL that may point at a redirector
+
+    Returns:
+        target URL, or the input unchanged if it is not a known redirector
+    """
+    for _ in range(3):
+        try:
+            parts = urlsplit(url)
+        except ValueError:
+            return url
+        host = (parts.hostname or "").lower()
+        target = None
+        if host in REDIRECTOR_PARAMS and parts.path in ("/url", "/l.php", "/l/", "/redirect", "/", ""):
+            query = parse_qs(parts.query)
+            for name in REDIRECTOR_PARAMS[host]:
+                if query.get(name) and query[name][0].startswith(("http://", "https://")):
+                    target = query[name][0]
+                    break
+        elif host == "r.search.yahoo.com" and "/RU=" in parts.path:
+            # https://r.search.yahoo.com/_ylt=.../RU=<quoted url>/RK=2/RS=...
+            target = unquote(parts.path.split("/RU=", 1)[1].split("/", 1)[0])
+        if not target or target == url:
+            return url
+        url = target
+    return url
+
+
+def canonicalize_url(url: str) -> str:
+    """
+    Normalize a URL so that links to the same page compare equal.
+
+    Lowercases scheme and host, drops default ports, userinfo, fragments and
+    tracking query parameters, and sorts the remaining query parameters. The
+    result is a comparison key, fetch the original URL.
+
+    Args:
+        url: URL to normalize
+
+    Returns:
+        canonical URL, or the input unchanged if it cannot be parsed
+    """
+    if not url:
+        return url
+    try:
+        parts = urlsplit(url.strip())
+        # raises ValueError for a malformed or out-of-range port
+        port = parts.port
+    except ValueError:
+        return url
+
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    netloc = host
+    if port and DEFAULT_PORTS.get(scheme) != str(port):
+        netloc = f"{host}:{port}"
+
+    query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if not _is_tracking_param(k)]
+    path = parts.path or "/"
+
+    return urlunsplit((scheme, netloc, path, urlencode(sorted(query)), ""))
@@ -1,10 +1,22 @@
 import asyncio
-import aiohttp
-import trafilatura
 import logging
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import AsyncIterator, List, Optional, Tuple, Union
+from urllib.parse import urlsplit
+# from .http_client import get_fetch_client
+# from .page_cache import get_page_cache, content_hash
+# from .fanout import FanoutPolicy, FETCH_POLICY, run_fanout
+# from .rate_limit import acall, RETRYABLE_STATUSES
+# from .metrics import record_fetch, record_extraction
+# from ..config.setting import FETCH_TIMEOUT, EXTRACT_EXECUTOR, EXTRACT_MAX_WORKERS
+from utils.http_client import get_fetch_client
+from utils.page_cache import get_page_cache, content_hash
+from utils.fanout import FanoutPolicy, FETCH_POLICY, run_fanout
+from utils.rate_limit import acall, RETRYABLE_STATUSES
+from utils.metrics import record_fetch, record_extraction
+from config.setting import FETCH_TIMEOUT, EXTRACT_EXECUTOR, EXTRACT_MAX_WORKERS
 
-# Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 """
@@ -12,26 +24,73 @@ add more package for web parsing
 in case of trafilatura is not working
 which seems failed a lot of times
 """
+async def _get_page(session, url, headers):
+    # raises on retryable statuses so the limiter sees them, returns (status, headers, html)
+    import aiohttp
+    async with session.get(url, headers=headers, timeout=aiohttp.ClientTimeout(total=FETCH_TIMEOUT)) as response:
+        if response.status in RETRYABLE_STATUSES:
+            response.raise_for_status()
+        html = None
+        if response.status == 200:
+            # text() decodes the body read here instead of reading it again
+            record_fetch(len(await response.read()))
+            html = await response.text()
+        return response.status, response.headers, html
+
+def _lookup_cached(cache, url):
+    # blocking sqlite and blob reads, run off the event loop
+    cached = cache.lookup(url)
+    cached_html = cache.get_html(cached.content_hash) if cached is not None else None
+    return cached, cached_html
+
 async def fetch_html(session, url):
     """
     Fetch HTML content from a URL.
     
     Args:
-        session: aiohttp client session
+        session: aiohttp client session, None to use the shared fetch client
         url: Target URL to fetch
         
     Returns:
         HTML content as string or None if failed
     """
+    cache = get_page_cache()
+    cached, cached_html = await asyncio.to_thread(_lookup_cached, cache, url) if cache is not None else (None, None)
+    if cached_html is not None and cached.fresh:
+        logger.debug(f"Page cache hit for {url}")
+        return cached_html
+
+    # revalidate a stale copy with a conditional GET
+    headers = {}
+    if cached_html is not None:
+        if cached.etag:
+            headers["If-None-Match"] = cached.etag
+        if cached.last_modified:
+            headers["If-Modified-Since"] = cached.last_modified
+
+    if session is None:
+        session = await get_fetch_client().session()
+    # imported here, the session above already loaded it
+    import aiohttp
     try:
-        async with session.get(url, timeout=30) as response:
-            if response.status != 200:
-                logger.error(f"Failed to fetch {url}: HTTP {response.status}")
-                return None
-                
-            logger.debug(f"Successfully fetched {url}")
-            html = await response.text()
-            return html
+        # each publisher host has its own limiter, 429/5xx responses are retried
+        status, response_headers, html = await acall(f"fetch:{urlsplit(url).hostname}", _get_page,
+                                                     session, url, headers)
+        if status == 304 and cached_html is not None:
+            logger.debug(f"Page not modified since last fetch: {url}")
+            await asyncio.to_thread(cache.revalidated, url, response_headers.get("ETag"),
+                                    response_headers.get("Last-Modified"))
+            return cached_html
+
+        if status != 200:
+            logger.error(f"Failed to fetch {url}: HTTP {status}")
+            return None
+            
+        logger.debug(f"Successfully fetched {url}")
+        if cache is not None:
+            await asyncio.to_thread(cache.put, url, html, response_headers.get("ETag"),
+                                    response_headers.get("Last-Modified"))
+        return html
     except aiohttp.ClientError as e:
         logger.error(f"Connection error for {url}: {str(e)}")
         return None
@@ -42,50 +101,193 @@ async def fetch_html(session, url):
         logger.error(f"Failed to fetch {url}: {str(e)}")
         return None
 
-async def fetch_and_extract(urls):
+EXTRACT_EXECUTOR_KINDS = ("process", "thread", "inline")
+
+_extract_executors = {}
+
+
+def extract_text(html: str) -> Optional[str]:
+    """Extract the main text of a page, module level so it can run in a worker process."""
+    # imported on first use, it takes a tenth of a second and only extraction needs it
+    import trafilatura
+    return trafilatura.extract(html)
+
+
+def get_extract_executor(kind: str = EXTRACT_EXECUTOR) -> Optional[Executor]:
+    """
+    Return the shared executor used for trafilatura extraction.
+    
+    Args:
+        kind: "process" (default, parallel across cores), "thread", or "inline" to
+              extract on the event loop thread, which is handy in tests. Worker
+              processes are started with forkserver (spawn where unavailable), so
+              a script using them needs an `if __name__ == "__main__":` guard
+        
+    Returns:
+        Executor instance, None for inline extraction
+    """
+    if kind not in EXTRACT_EXECUTOR_KINDS:
+        raise ValueError(f"Unknown extract executor '{kind}', expected one of {EXTRACT_EXECUTOR_KINDS}")
+    if kind == "inline":
+        return None
+    if kind not in _extract_executors:
+        if kind == "process":
+            # the pool starts lazily in a process already running threads (to_thread workers,
+            # boto3, metrics), and a forked child can deadlock on a lock held at fork time
+            method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            _extract_executors[kind] = ProcessPoolExecutor(max_workers=EXTRACT_MAX_WORKERS,
+                                                           mp_context=multiprocessing.get_context(method))
+        else:
+            _extract_executors[kind] = ThreadPoolExecutor(max_workers=EXTRACT_MAX_WORKERS,
+                                                          thread_name_prefix="extract")
+        logger.info(f"Created {kind} extract executor with max_workers={EXTRACT_MAX_WORKERS or 'default'}")
+    return _extract_executors[kind]
+
+
+def shutdown_extract_executor():
+    """Shut down every extract executor created by get_extract_executor."""
+    while _extract_executors:
+        kind, executor = _extract_executors.popitem()
+        executor.shutdown(wait=True)
+        logger.info(f"Shut down {kind} extract executor")
+
+
+async def extract_html(url: str, html: Optional[str], executor: Optional[Executor] = None) -> Optional[str]:
+    """
+    Extract main text content from HTML without blocking the event loop.
+    
+    Args:
+        url: URL the HTML was fetched from, used for logging
+        html: HTML content, None if the fetch failed
+        executor: executor to run trafilatura in, None to run inline
+        
+    Returns:
+        Extracted text or None if failed
+    """
+    if html is None:
+        logger.warning(f"No HTML content available for {url}")
+        record_extraction("no_html")
+        return None
+
+    # a cached extraction of the same body skips parsing entirely
+    cache = get_page_cache()
+    digest = content_hash(html) if cache is not None else None
+    if cache is not None:
+        text = await asyncio.to_thread(cache.get_text, digest)
+        if text is not None:
+            logger.debug(f"Extraction cache hit for {url}")
+            record_extraction("success")
+            return text
+
+    try:
+        if executor is None:
+            text = extract_text(html)
+        else:
+            text = await asyncio.get_running_loop().run_in_executor(executor, extract_text, html)
+    except Exception as e:
+        logger.error(f"Error during content extraction for {url}: {str(e)}")
+        record_extraction("failed")
+        return None
+
+    if text is None:
+        logger.warning(f"Content extraction failed for {url}")
+        record_extraction("empty")
+        return None
+    record_extraction("success")
+    if cache is not None:
+        await asyncio.to_thread(cache.put_text, digest, text)
+    logger.debug(f"Successfully extracted {len(text)} characters from {url}")
+    return text
+
+
+async def fetch_and_extract(urls, executor: Union[str, Executor, None] = None,
+                            policy: FanoutPolicy = FETCH_POLICY) -> List[Optional[str]]:
     """
     Fetch HTML from multiple URLs and extract main text content.
     
+    Each page is handed to the extract executor as soon as its download
+    finishes, so parsing overlaps with the remaining fetches. With a quorum
+    or deadline in the policy, pages still loading when it is met are
+    cancelled and returned as None.
+    
     Args:
         urls: List of URLs to process
+        executor: extract executor or its kind ("process", "thread", "inline"),
+                  defaults to the EXTRACT_EXECUTOR setting
+        policy: quorum, deadline and hedging of the fetches, defaults to the FETCH_* settings
         
     Returns:
-        List of extracted text contents, None for failed extractions
+        List of extracted text contents aligned with urls, None for failed extractions
     """
     if not urls:
         logger.warning("No URLs provided for extraction")
         return []
         
     logger.info(f"Starting to fetch and extract content from {len(urls)} URLs")
+
+    if executor is None or isinstance(executor, str):
+        executor = get_extract_executor(executor or EXTRACT_EXECUTOR)
     
-    async with aiohttp.ClientSession() as session:
-        # Concurrently execute all URL fetch tasks
-        tasks = [fetch_html(session, url) for url in urls if url != "" and url != None]
-        html_contents = await asyncio.gather(*tasks)
-    
-    extracted_texts = []
-    success_count = 0
-    
-    for url, html in zip(urls, html_contents):
-        if html is None:
-            logger.warning(f"No HTML content available for {url}")
-            extracted_texts.append(None)
-            continue
-            
-        # Use trafilatura.extract to extract main text content
-        try:
-            text = trafilatura.extract(html)
-            if text is None:
-                logger.warning(f"Content extraction failed for {url}")
-                extracted_texts.append(None)
-            else:
-                success_count += 1
-                logger.debug(f"Successfully extracted {len(text)} characters from {url}")
-                extracted_texts.append(text)
-        except Exception as e:
-            logger.error(f"Error during content extraction for {url}: {str(e)}")
-            extracted_texts.append(None)
+    # Reuse the pooled session, the connector caps total and per-host connections
+    session = await get_fetch_client().session()
+
+    async def process(url):
+        if url == "" or url is None:
+            return None
+        html = await fetch_html(session, url)
+        return await extract_html(url, html, executor)
+
+    # results stay in the same order as urls
+    extracted_texts = await run_fanout([lambda url=url: process(url) for url in urls], policy, "fetch")
     
+    success_count = sum(text is not None for text in extracted_texts)
     logger.info(f"Completed extraction: {success_count} successful, {len(urls) - success_count} failed")
-    return extracted_texts
+    return list(extracted_texts)
+
 
+async def iter_fetch_and_extract(urls, executor: Union[str, Executor, None] = None,
+                                 deadline: Optional[float] = FETCH_POLICY.deadline
+                                 ) -> AsyncIterator[Tuple[int, str, Optional[str]]]:
+    """
+    Fetch and extract multiple URLs, yielding each page as soon as it is ready.
+    
+    Args:
+        urls: List of URLs to process
+        executor: extract executor or its kind ("process", "thread", "inline"),
+                  defaults to the EXTRACT_EXECUTOR setting
+        deadline: seconds after which pages still loading are cancelled and
+                  not yielded, None waits for every page
+        
+    Yields:
+        (index, url, text) tuples in completion order, text is None for failed pages
+    """
+    if not urls:
+        logger.warning("No URLs provided for extraction")
+        return
+
+    if executor is None or isinstance(executor, str):
+        executor = get_extract_executor(executor or EXTRACT_EXECUTOR)
+
+    session = await get_fetch_client().session()
+
+    async def process(index, url):
+        if url == "" or url is None:
+            return index, url, None
+        html = await fetch_html(session, url)
+        return index, url, await extract_html(url, html, executor)
+
+    tasks = [asyncio.ensure_future(process(index, url)) for index, url in enumerate(urls)]
+    success_count = 0
+    try:
+        for next_done in asyncio.as_completed(tasks, timeout=deadline):
+            index, url, text = await next_done
+            if text is not None:
+                success_count += 1
+            yield index, url, text
+    except asyncio.TimeoutError:
+        logger.warning(f"Fetch deadline of {deadline}s reached, dropping {sum(not t.done() for t in tasks)} pages")
+    finally:
+        # the consumer may stop early, do not leave fetches running
+        for task in tasks:
+            task.cancel()
+        logger.info(f"Completed streaming extraction: {success_count} successful, {len(urls) - success_count} failed")
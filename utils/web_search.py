@@ -1,16 +1,30 @@
-import requests
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 import logging
-from typing import List
-# from ..config.setting import GOOGLE_API_KEY,GOOGLE_CSE_ID
-from config.setting import GOOGLE_API_KEY,GOOGLE_CSE_ID
+from typing import TYPE_CHECKING, Iterable, List, Optional, Tuple
+# from ..config.setting import GOOGLE_API_KEY,GOOGLE_CSE_ID,GOOGLE_API_BASE_URL
+# from ..config.setting import SEARCH_RESULTS_PER_QUERY, SEARCH_PAGES_PER_QUERY, SEARCH_MAX_REQUESTS, SEARCH_MAX_WORKERS
+# from ..config.topic import get_topic
+# from .http_client import get_fetch_client
+# from .url_utils import canonicalize_url, resolve_redirector
+# from .search_cache import SearchCache, get_search_cache, make_key
+# from .rate_limit import call, acall
+from config.setting import GOOGLE_API_KEY,GOOGLE_CSE_ID,GOOGLE_API_BASE_URL
+from config.setting import SEARCH_RESULTS_PER_QUERY, SEARCH_PAGES_PER_QUERY, SEARCH_MAX_REQUESTS, SEARCH_MAX_WORKERS
+from config.topic import get_topic
+from utils.http_client import get_fetch_client
+from utils.url_utils import canonicalize_url, resolve_redirector
+from utils.search_cache import SearchCache, get_search_cache, make_key
+from utils.rate_limit import call, acall
+
+if TYPE_CHECKING:
+    import requests
 
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 
 
-GOOGLE_API_BASE_URL = 'https://www.googleapis.com/customsearch/v1'
 DEFAULT_DATE_RESTRICT = 'd1'  
 
 
@@ -21,17 +35,82 @@ class SearchResult:
     snippet: str
 
 
+_session: Optional["requests.Session"] = None
+
+
+def _get_session() -> "requests.Session":
+    """Return the process-wide requests session used for Custom Search calls."""
+    global _session
+    if _session is None:
+        # requests and aiohttp are imported when they are first used, not with this module
+        import requests
+        from requests.adapters import HTTPAdapter
+        session = requests.Session()
+        # keep one warm connection per search worker
+        session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=SEARCH_MAX_WORKERS))
+        _session = session
+    return _session
+
+
 class GoogleSearchClient:
 
     
-    def __init__(self):
+    def __init__(self, session: Optional["requests.Session"] = None, cache: Optional[SearchCache] = None):
         self.api_key = GOOGLE_API_KEY
         self.cse_id = GOOGLE_CSE_ID
+        self.session = session or _get_session()
+        # defaults to the cache selected by SEARCH_CACHE_BACKEND, None when it is "none"
+        self.cache = cache if cache is not None else get_search_cache()
         
         # if not self.api_key or not self.cse_id:
         #     logger.error("未找到Google API凭证")
         #     raise ValueError("Google API credentials not found in environment variables")
     
+    def _build_params(self, query: str, date_restrict: str, num_results: int, start_index: int) -> dict:
+        return {
+            'key': self.api_key,
+            'cx': self.cse_id,
+            'q': query,
+            'dateRestrict': date_restrict,
+            'num': num_results,
+            'start': start_index
+        }
+
+    def _cached(self, key) -> Optional[List[SearchResult]]:
+        if self.cache is None:
+            return None
+        cached = self.cache.get(key)
+        if cached is None:
+            return None
+        logger.info(f"search cache hit '{key[0]}', {len(cached)} results")
+        return [SearchResult(**item) for item in cached]
+
+    @staticmethod
+    def _parse_items(payload: dict) -> List[SearchResult]:
+        results_list = []
+        for item in payload.get('items', []):
+            # Maybe add addtion log here for robustness and debug
+            result = SearchResult(
+                title=item.get('title', ''),
+                link=item.get('link', ''),
+                snippet=item.get('snippet', '')
+            )
+            results_list.append(result)
+        return results_list
+
+    def _request(self, params: dict) -> dict:
+        response = self.session.get(GOOGLE_API_BASE_URL, params=params, timeout=10)
+        response.raise_for_status()
+        return response.json()
+
+    async def _arequest(self, params: dict) -> dict:
+        import aiohttp
+        session = await get_fetch_client().session()
+        async with session.get(GOOGLE_API_BASE_URL, params=params,
+                               timeout=aiohttp.ClientTimeout(total=10)) as response:
+            response.raise_for_status()
+            return await response.json()
+    
     def search(self, query: str, date_restrict: str = DEFAULT_DATE_RESTRICT, 
                num_results: int = 2, start_index: int = 1) -> List[SearchResult]:
         """执行Google搜索并返回结果。
@@ -43,38 +122,23 @@ class GoogleSearchClient:
             start_index: 结果的起始索引（用于分页）
             
         Returns:
-            搜索结果列表
-            
-        Raises:
-            ValueError: 如果API凭证无效
-            RequestException: 如果API请求失败
+            搜索结果列表，请求失败时返回空列表（失败结果不会被缓存）
         """
-        params = {
-            'key': self.api_key,
-            'cx': self.cse_id,
-            'q': query,
-            'dateRestrict': date_restrict,
-            'num': num_results,
-            'start': start_index
-        }
+        key = make_key(query, date_restrict, num_results, start_index)
+        cached = self._cached(key)
+        if cached is not None:
+            return cached
+
+        params = self._build_params(query, date_restrict, num_results, start_index)
+        import requests
         
         try:
-            response = requests.get(GOOGLE_API_BASE_URL, params=params, timeout=10)
-            response.raise_for_status() 
-            
-            results_list = []
-            results = response.json().get('items', [])
-            
-            for item in results:
-                # Maybe add addtion log here for robustness and debug
-                result = SearchResult(
-                    title=item.get('title', ''),
-                    link=item.get('link', ''),
-                    snippet=item.get('snippet', '')
-                )
-                results_list.append(result)
+            # rate limited and retried on 429/5xx, see utils/rate_limit.py
+            results_list = self._parse_items(call("google_cse", self._request, params))
             
             logger.info(f"search success '{query}', find {len(results_list)} results")
+            if self.cache is not None:
+                self.cache.set(key, results_list)
             return results_list
             
         except requests.exceptions.RequestException as e:
@@ -84,6 +148,56 @@ class GoogleSearchClient:
                 logger.error(f"timeout error: {str(e)}")
             else:
                 logger.error(f"google search error: {str(e)}")
+            return []
+
+    async def asearch(self, query: str, date_restrict: str = DEFAULT_DATE_RESTRICT,
+                      num_results: int = 2, start_index: int = 1) -> List[SearchResult]:
+        """search的异步版本，使用aiohttp发送请求。
+        
+        Args:
+            query: 搜索查询词
+            date_restrict: 日期限制 (例如: 'd1'表示过去一天)
+            num_results: 返回的最大结果数
+            start_index: 结果的起始索引（用于分页）
+            
+        Returns:
+            搜索结果列表，请求失败时返回空列表（失败结果不会被缓存）
+        """
+        key = make_key(query, date_restrict, num_results, start_index)
+        # the sqlite backend would block the loop on every keyword of the fan-out
+        cached = await asyncio.to_thread(self._cached, key)
+        if cached is not None:
+            return cached
+
+        params = self._build_params(query, date_restrict, num_results, start_index)
+        import aiohttp
+        
+        try:
+            results_list = self._parse_items(await acall("google_cse", self._arequest, params))
+            
+            logger.info(f"search success '{query}', find {len(results_list)} results")
+            if self.cache is not None:
+                await asyncio.to_thread(self.cache.set, key, results_list)
+            return results_list
+            
+        except asyncio.TimeoutError as e:
+            logger.error(f"timeout error: {str(e)}")
+        except aiohttp.ClientConnectionError as e:
+            logger.error(f"connection error: {str(e)}")
+        except aiohttp.ClientError as e:
+            logger.error(f"google search error: {str(e)}")
+        return []
+
+_client: Optional[GoogleSearchClient] = None
+
+
+def get_search_client() -> GoogleSearchClient:
+    """Return the process-wide search client."""
+    global _client
+    if _client is None:
+        _client = GoogleSearchClient()
+    return _client
+
 
 def search(topic: str) -> List[SearchResult]:
     """执行Google搜索的旧函数（为了向后兼容）。
@@ -94,5 +208,131 @@ def search(topic: str) -> List[SearchResult]:
     Returns:
         搜索结果列表
     """
-    client = GoogleSearchClient()
-    return client.search(query=topic)
\ No newline at end of file
+    return get_search_client().search(query=topic)
+
+
+async def asearch(topic: str) -> List[SearchResult]:
+    """search的异步版本。
+    
+    Args:
+        topic: 搜索查询词
+        
+    Returns:
+        搜索结果列表
+    """
+    return await get_search_client().asearch(query=topic)
+
+
+def build_topic_queries(topic: str) -> List[str]:
+    """
+    Build the search queries for a topic.
+    
+    Topics defined in config.topic.TOPICS get one query per keyword on top of
+    the topic query, ad hoc topics only get the topic query.
+    """
+    queries = ["news about " + topic]
+    topic_config = get_topic(topic)
+    if topic_config is not None:
+        queries += [f"{keyword} news" for keyword in topic_config.get("keywords", [])]
+    # drop repeated queries but keep their order
+    return list(dict.fromkeys(queries))
+
+
+def plan_requests(queries: Iterable[str], num_results: int = SEARCH_RESULTS_PER_QUERY,
+                  pages: int = SEARCH_PAGES_PER_QUERY, max_requests: int = SEARCH_MAX_REQUESTS
+                  ) -> List[Tuple[str, int]]:
+    """
+    Spread the request budget over queries and result pages.
+    
+    The first page of every query is planned before any deeper page, so a
+    small budget still covers as many queries as possible.
+    
+    Returns:
+        list of (query, start_index) pairs, at most max_requests long
+    """
+    queries = list(queries)
+    plan = [(query, 1 + page * num_results) for page in range(pages) for query in queries]
+    return plan[:max_requests]
+
+
+def merge_results(result_lists: Iterable[List[SearchResult]]) -> List[SearchResult]:
+    """
+    Merge result lists, unwrapping redirectors and dropping duplicate URLs.
+    
+    Results are compared by their canonical URL (tracking parameters, fragments
+    and default ports removed) and the first result for every canonical URL is
+    kept. Its link stays as the publisher gave it, since servers may depend on
+    the query order or encoding the canonical form rewrites.
+    """
+    merged = {}
+    for results in result_lists:
+        for result in results:
+            if not result.link:
+                continue
+            link = resolve_redirector(result.link)
+            key = canonicalize_url(link)
+            if key not in merged:
+                merged[key] = SearchResult(title=result.title, link=link, snippet=result.snippet)
+    return list(merged.values())
+
+
+def search_many(queries: Iterable[str], num_results: int = SEARCH_RESULTS_PER_QUERY,
+                pages: int = SEARCH_PAGES_PER_QUERY, max_requests: int = SEARCH_MAX_REQUESTS,
+                max_workers: int = SEARCH_MAX_WORKERS) -> List[SearchResult]:
+    """
+    Run several queries concurrently and return the merged, deduplicated results.
+    
+    Args:
+        queries: search queries
+        num_results: results requested per API call
+        pages: result pages requested per query
+        max_requests: maximum number of API calls
+        max_workers: maximum number of API calls in flight
+        
+    Returns:
+        deduplicated search results in query order
+    """
+    plan = plan_requests(queries, num_results, pages, max_requests)
+    if not plan:
+        return []
+    client = get_search_client()
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="search") as executor:
+        result_lists = list(executor.map(
+            lambda item: client.search(query=item[0], num_results=num_results, start_index=item[1]), plan))
+
+    results = merge_results(result_lists)
+    logger.info(f"search_many: {len(plan)} requests, {sum(len(r) for r in result_lists)} results, "
+                f"{len(results)} unique")
+    return results
+
+
+async def asearch_many(queries: Iterable[str], num_results: int = SEARCH_RESULTS_PER_QUERY,
+                       pages: int = SEARCH_PAGES_PER_QUERY, max_requests: int = SEARCH_MAX_REQUESTS,
+                       max_workers: int = SEARCH_MAX_WORKERS) -> List[SearchResult]:
+    """search_many的异步版本。"""
+    plan = plan_requests(queries, num_results, pages, max_requests)
+    if not plan:
+        return []
+    client = get_search_client()
+    semaphore = asyncio.Semaphore(max_workers)
+
+    async def run(query, start_index):
+        async with semaphore:
+            return await client.asearch(query=query, num_results=num_results, start_index=start_index)
+
+    result_lists = await asyncio.gather(*[run(query, start_index) for query, start_index in plan])
+
+    results = merge_results(result_lists)
+    logger.info(f"asearch_many: {len(plan)} requests, {sum(len(r) for r in result_lists)} results, "
+                f"{len(results)} unique")
+    return results
+
+
+def search_topic(topic: str) -> List[SearchResult]:
+    """Search every query of a topic, see build_topic_queries."""
+    return search_many(build_topic_queries(topic))
+
+
+async def asearch_topic(topic: str) -> List[SearchResult]:
+    """search_topic的异步版本。"""
+    return await asearch_many(build_topic_queries(topic))